@@ -7,4 +7,6 @@ export interface WebsocketConsumerStatusMessage {
   message?: string
   document_id: number
   owner_id?: number
+  operation?: string
+  bulk_download?: string
 }
@@ -318,4 +318,30 @@ describe('ConsumerStatusService', () => {
       1
     )
   })
+
+  it('should ignore progress of other operations', () => {
+    consumerStatusService.connect()
+    server.send({
+      task_id: '1234',
+      filename: 'documents.zip',
+      current_progress: 50,
+      max_progress: 100,
+      status: 'WORKING',
+      operation: 'bulk_download',
+      bulk_download: 'abcdef',
+    })
+    server.send({
+      task_id: '5678',
+      filename: 'bulk_update',
+      current_progress: 50,
+      max_progress: 100,
+      status: 'WORKING',
+      operation: 'bulk_update',
+    })
+
+    consumerStatusService.disconnect()
+    expect(consumerStatusService.getConsumerStatusNotCompleted()).toHaveLength(
+      0
+    )
+  })
 })
@@ -155,6 +155,11 @@ export class ConsumerStatusService {
         return
       }
 
+      // progress of another operation, like a bulk edit, not of a document
+      if (statusMessage.operation) {
+        return
+      }
+
       let statusMessageGet = this.get(
         statusMessage.task_id,
         statusMessage.filename
@@ -3,14 +3,10 @@ import re
 import tempfile
 from dataclasses import dataclass
 from pathlib import Path
+from typing import TYPE_CHECKING
 from typing import Optional
 
 from django.conf import settings
-from pdf2image import convert_from_path
-from pdf2image.exceptions import PDFPageCountError
-from pikepdf import Page
-from pikepdf import Pdf
-from PIL import Image
 
 from documents.converters import convert_from_tiff_to_pdf
 from documents.data_models import ConsumableDocument
@@ -22,6 +18,10 @@ from documents.utils import copy_basic_file_stats
 from documents.utils import copy_file_with_basic_stats
 from documents.utils import maybe_override_pixel_limit
 
+if TYPE_CHECKING:
+    from pikepdf import Page
+    from PIL import Image
+
 logger = logging.getLogger("paperless.barcodes")
 
 
@@ -176,7 +176,7 @@ class BarcodePlugin(ConsumeTaskPlugin):
         self._tiff_conversion_done = True
 
     @staticmethod
-    def read_barcodes_zxing(image: Image.Image) -> list[str]:
+    def read_barcodes_zxing(image: "Image.Image") -> list[str]:
         barcodes = []
 
         import zxingcpp
@@ -192,7 +192,7 @@ class BarcodePlugin(ConsumeTaskPlugin):
         return barcodes
 
     @staticmethod
-    def read_barcodes_pyzbar(image: Image.Image) -> list[str]:
+    def read_barcodes_pyzbar(image: "Image.Image") -> list[str]:
         barcodes = []
 
         from pyzbar import pyzbar
@@ -220,6 +220,9 @@ class BarcodePlugin(ConsumeTaskPlugin):
         if self.barcodes:
             return
 
+        from pdf2image import convert_from_path
+        from pdf2image.exceptions import PDFPageCountError
+
         # No op if not a TIFF
         self.convert_from_tiff_to_pdf()
 
@@ -377,13 +380,15 @@ class BarcodePlugin(ConsumeTaskPlugin):
         These will need to be deleted later.
         """
 
+        from pikepdf import Pdf
+
         document_paths = []
         fname = self.input_doc.original_file.stem
         with Pdf.open(self.pdf_file) as input_pdf:
             # Start with an empty document
-            current_document: list[Page] = []
+            current_document: list["Page"] = []
             # A list of documents, ie a list of lists of pages
-            documents: list[list[Page]] = [current_document]
+            documents: list[list["Page"]] = [current_document]
 
             for idx, page in enumerate(input_pdf.pages):
                 # Keep building the new PDF as long as it is not a
@@ -1,12 +1,40 @@
+import json
+import logging
 import os
+import shutil
+import tempfile
+import time
+from collections.abc import Callable
+from collections.abc import Iterable
+from collections.abc import Iterator
+from datetime import timedelta
+from hashlib import sha256
+from pathlib import Path
+from typing import Final
+from typing import Optional
 from zipfile import ZipFile
+from zipfile import ZipInfo
 
+from django.conf import settings
+
+from documents.caching import CACHE_50_MINUTES
+from documents.file_responses import FILE_CHUNK_SIZE
 from documents.models import Document
 
+logger = logging.getLogger("paperless.bulk_download")
+
+# The name of the zip file, as sent to the client and in progress updates
+BULK_DOWNLOAD_FILENAME: Final[str] = "documents.zip"
+
+# How long a zip file is considered in progress, so it isn't built twice
+BULK_DOWNLOAD_BUILD_TIMEOUT: Final[int] = CACHE_50_MINUTES
+
 
 class BulkArchiveStrategy:
     def __init__(self, zipf: ZipFile, follow_formatting: bool = False):
         self.zipf = zipf
+        # Names of the files in the zip file, to keep them unique
+        self.filenames: set[str] = set()
         if follow_formatting:
             self.make_unique_filename = self._formatted_filepath
         else:
@@ -27,9 +55,10 @@ class BulkArchiveStrategy:
         counter = 0
         while True:
             filename = folder + doc.get_public_filename(archive, counter)
-            if filename in self.zipf.namelist():
+            if filename in self.filenames:
                 counter += 1
             else:
+                self.filenames.add(filename)
                 return filename
 
     def _formatted_filepath(
@@ -51,35 +80,189 @@ class BulkArchiveStrategy:
 
         return in_archive_path
 
-    def add_document(self, doc: Document):
+    def get_files(self, doc: Document) -> list[tuple[Path, str]]:
+        """
+        Returns the files of the document to add, with their names inside the
+        zip file
+        """
         raise NotImplementedError  # pragma: no cover
 
+    def add_document(self, doc: Document):
+        for path, arcname in self.get_files(doc):
+            self.zipf.write(path, arcname)
+
 
 class OriginalsOnlyStrategy(BulkArchiveStrategy):
-    def add_document(self, doc: Document):
-        self.zipf.write(doc.source_path, self.make_unique_filename(doc))
+    def get_files(self, doc: Document) -> list[tuple[Path, str]]:
+        return [(doc.source_path, self.make_unique_filename(doc))]
 
 
 class ArchiveOnlyStrategy(BulkArchiveStrategy):
-    def add_document(self, doc: Document):
+    def get_files(self, doc: Document) -> list[tuple[Path, str]]:
         if doc.has_archive_version:
-            self.zipf.write(
-                doc.archive_path,
-                self.make_unique_filename(doc, archive=True),
-            )
-        else:
-            self.zipf.write(doc.source_path, self.make_unique_filename(doc))
+            return [(doc.archive_path, self.make_unique_filename(doc, archive=True))]
+        return [(doc.source_path, self.make_unique_filename(doc))]
 
 
 class OriginalAndArchiveStrategy(BulkArchiveStrategy):
-    def add_document(self, doc: Document):
+    def get_files(self, doc: Document) -> list[tuple[Path, str]]:
+        files = []
         if doc.has_archive_version:
-            self.zipf.write(
-                doc.archive_path,
-                self.make_unique_filename(doc, archive=True, folder="archive/"),
+            files.append(
+                (
+                    doc.archive_path,
+                    self.make_unique_filename(doc, archive=True, folder="archive/"),
+                ),
             )
-
-        self.zipf.write(
-            doc.source_path,
-            self.make_unique_filename(doc, folder="originals/"),
+        files.append(
+            (doc.source_path, self.make_unique_filename(doc, folder="originals/")),
         )
+        return files
+
+
+class _ZipStream:
+    """
+    A write only file collecting what the zip file writes, until it is sent.
+    It can't seek, so the sizes and checksums of the files in the zip file
+    are written after their data
+    """
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def pop(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_archive(
+    documents: Iterable[Document],
+    strategy_class: type[BulkArchiveStrategy],
+    compression: int,
+    follow_formatting: bool = False,
+) -> Iterator[bytes]:
+    """
+    Yields the zip file of the given documents while it is written.  Files are
+    read in chunks, so only about one chunk is kept in memory at a time
+    """
+    stream = _ZipStream()
+    with ZipFile(stream, "w", compression) as zipf:
+        strategy = strategy_class(zipf, follow_formatting)
+        for doc in documents:
+            for path, arcname in strategy.get_files(doc):
+                info = ZipInfo.from_file(path, arcname)
+                info.compress_type = compression
+                with open(path, "rb") as source, zipf.open(info, "w") as target:
+                    while chunk := source.read(FILE_CHUNK_SIZE):
+                        target.write(chunk)
+                        if data := stream.pop():
+                            yield data
+                if data := stream.pop():
+                    yield data
+    yield stream.pop()
+
+
+STRATEGIES: Final[dict[str, type[BulkArchiveStrategy]]] = {
+    "archive": ArchiveOnlyStrategy,
+    "originals": OriginalsOnlyStrategy,
+    "both": OriginalAndArchiveStrategy,
+}
+
+
+def archive_key(
+    documents: list[Document],
+    content: str,
+    compression: int,
+    follow_formatting: bool,
+) -> str:
+    """
+    Returns the key of the zip file of the given documents.  It changes if a
+    file of a document changes, and also if a document is modified otherwise,
+    as the names of the files in the zip file depend on its fields
+    """
+    data = json.dumps(
+        [
+            [
+                [doc.pk, doc.checksum, doc.archive_checksum, doc.modified.isoformat()]
+                for doc in documents
+            ],
+            content,
+            compression,
+            follow_formatting,
+        ],
+    )
+    return sha256(data.encode()).hexdigest()
+
+
+def get_build_cache_key(key: str) -> str:
+    """
+    Returns the cache key marking the zip file with the given key as in
+    progress, holding the id of the task building it
+    """
+    return f"bulk_download_build_{key}"
+
+
+def get_archive_path(key: str) -> Path:
+    return Path(settings.BULK_DOWNLOAD_CACHE_DIR) / f"{key}.zip"
+
+
+def build_archive(
+    documents: list[Document],
+    content: str,
+    compression: int,
+    follow_formatting: bool,
+    target: Path,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> None:
+    """
+    Writes the zip file of the given documents to the target, calling the
+    progress callback with the number of documents added after each one.
+    The zip file appears completely or not at all
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=target.parent, prefix=".new-") as temp_dir:
+        new_path = Path(temp_dir) / target.name
+        with ZipFile(new_path, "w", compression) as zipf:
+            strategy = STRATEGIES[content](zipf, follow_formatting)
+            for current, doc in enumerate(documents, start=1):
+                strategy.add_document(doc)
+                if progress is not None:
+                    progress(current, len(documents))
+        new_path.replace(target)
+
+
+def remove_expired_archives(max_age: timedelta) -> int:
+    """
+    Removes the zip files which were not used for the given time, and what
+    is left of builds which failed.  Returns the number of removed zip files
+    """
+    directory = Path(settings.BULK_DOWNLOAD_CACHE_DIR)
+    if not directory.is_dir():
+        return 0
+
+    oldest = time.time() - max_age.total_seconds()
+    removed = 0
+    for path in directory.iterdir():
+        try:
+            if path.stat().st_mtime >= oldest:
+                continue
+        except FileNotFoundError:
+            continue
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            logger.debug(f"Removing expired bulk download {path.name}")
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
@@ -1,27 +1,32 @@
-import hashlib
 import itertools
 import logging
-import os
+import uuid
+from typing import Final
 from typing import Optional
 
 from celery import chord
-from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
 
-from documents.data_models import ConsumableDocument
-from documents.data_models import DocumentMetadataOverrides
-from documents.data_models import DocumentSource
+from documents.file_handling import deferred_file_removal
 from documents.models import Correspondent
 from documents.models import Document
 from documents.models import DocumentType
 from documents.models import StoragePath
-from documents.permissions import set_permissions_for_object
+from documents.permissions import set_permissions_for_objects
 from documents.tasks import bulk_update_documents
-from documents.tasks import consume_file
+from documents.tasks import merge_documents
+from documents.tasks import remove_deleted_document_files
+from documents.tasks import rotate_document
+from documents.tasks import split_document
+from documents.tasks import start_operation_counters
 from documents.tasks import update_document_archive_file
 
 logger = logging.getLogger("paperless.bulk_edit")
 
+# Number of deleted documents whose files are removed by one task
+FILE_REMOVAL_BATCH_SIZE: Final[int] = 500
+
 
 def set_correspondent(doc_ids, correspondent):
     if correspondent:
@@ -120,8 +125,18 @@ def modify_tags(doc_ids, add_tags, remove_tags):
     return "OK"
 
 
+def _queue_file_removal(documents: list[dict]) -> None:
+    for i in range(0, len(documents), FILE_REMOVAL_BATCH_SIZE):
+        remove_deleted_document_files.delay(
+            documents[i : i + FILE_REMOVAL_BATCH_SIZE],
+        )
+
+
 def delete(doc_ids):
-    Document.objects.filter(id__in=doc_ids).delete()
+    # The files are removed in batches by the workers, once the rows are gone
+    with deferred_file_removal() as documents, transaction.atomic():
+        Document.objects.filter(id__in=doc_ids).delete()
+        transaction.on_commit(lambda: _queue_file_removal(documents))
 
     from documents import index
 
@@ -144,16 +159,20 @@ def redo_ocr(doc_ids):
 def set_permissions(doc_ids, set_permissions, owner=None, merge=False):
     qs = Document.objects.filter(id__in=doc_ids)
 
-    if merge:
-        # If merging, only set owner for documents that don't have an owner
-        qs.filter(owner__isnull=True).update(owner=owner)
-    else:
-        qs.update(owner=owner)
-
-    for doc in qs:
-        set_permissions_for_object(permissions=set_permissions, object=doc, merge=merge)
+    with transaction.atomic():
+        if merge:
+            # If merging, only set owner for documents that don't have an owner
+            qs.filter(owner__isnull=True).update(owner=owner)
+        else:
+            qs.update(owner=owner)
+
+        set_permissions_for_objects(
+            permissions=set_permissions,
+            objects=qs.only("pk"),
+            merge=merge,
+        )
 
-    affected_docs = [doc.id for doc in qs]
+    affected_docs = list(qs.values_list("id", flat=True))
 
     bulk_update_documents.delay(document_ids=affected_docs)
 
@@ -161,134 +180,52 @@ def set_permissions(doc_ids, set_permissions, owner=None, merge=False):
 
 
 def rotate(doc_ids: list[int], degrees: int):
+    """
+    Queues rotating the given PDF documents, one task per document.  Returns
+    the id of the operation, sent with its progress
+    """
     logger.info(
         f"Attempting to rotate {len(doc_ids)} documents by {degrees} degrees.",
     )
     qs = Document.objects.filter(id__in=doc_ids)
-    affected_docs = []
-    import pikepdf
-
-    rotate_tasks = []
-    for doc in qs:
-        if doc.mime_type != "application/pdf":
-            logger.warning(
-                f"Document {doc.id} is not a PDF, skipping rotation.",
-            )
-            continue
-        try:
-            with pikepdf.open(doc.source_path, allow_overwriting_input=True) as pdf:
-                for page in pdf.pages:
-                    page.rotate(degrees, relative=True)
-                pdf.save()
-                doc.checksum = hashlib.md5(doc.source_path.read_bytes()).hexdigest()
-                doc.save()
-                rotate_tasks.append(
-                    update_document_archive_file.s(
-                        document_id=doc.id,
-                    ),
-                )
-                logger.info(
-                    f"Rotated document {doc.id} by {degrees} degrees",
-                )
-                affected_docs.append(doc.id)
-        except Exception as e:
-            logger.exception(f"Error rotating document {doc.id}: {e}")
+    affected_docs = list(
+        qs.filter(mime_type="application/pdf").values_list("id", flat=True),
+    )
+    for doc_id in set(qs.values_list("id", flat=True)) - set(affected_docs):
+        logger.warning(
+            f"Document {doc_id} is not a PDF, skipping rotation.",
+        )
 
+    operation_id = str(uuid.uuid4())
     if len(affected_docs) > 0:
-        bulk_update_task = bulk_update_documents.s(document_ids=affected_docs)
+        start_operation_counters(operation_id, "documents")
+        rotate_tasks = [
+            rotate_document.si(doc_id, degrees, operation_id, len(affected_docs))
+            for doc_id in affected_docs
+        ]
+        bulk_update_task = bulk_update_documents.si(document_ids=affected_docs)
         chord(header=rotate_tasks, body=bulk_update_task).delay()
 
-    return "OK"
+    return operation_id
 
 
 def merge(doc_ids: list[int], metadata_document_id: Optional[int] = None):
+    """
+    Queues merging the given documents into a single document.  Returns the
+    id of the task
+    """
     logger.info(
         f"Attempting to merge {len(doc_ids)} documents into a single document.",
     )
-    qs = Document.objects.filter(id__in=doc_ids)
-    affected_docs = []
-    import pikepdf
-
-    merged_pdf = pikepdf.new()
-    version = merged_pdf.pdf_version
-    # use doc_ids to preserve order
-    for doc_id in doc_ids:
-        doc = qs.get(id=doc_id)
-        try:
-            with pikepdf.open(str(doc.source_path)) as pdf:
-                version = max(version, pdf.pdf_version)
-                merged_pdf.pages.extend(pdf.pages)
-            affected_docs.append(doc.id)
-        except Exception as e:
-            logger.exception(
-                f"Error merging document {doc.id}, it will not be included in the merge: {e}",
-            )
-    if len(affected_docs) == 0:
-        logger.warning("No documents were merged")
-        return "OK"
-
-    filepath = os.path.join(
-        settings.SCRATCH_DIR,
-        f"{'_'.join([str(doc_id) for doc_id in doc_ids])[:100]}_merged.pdf",
-    )
-    merged_pdf.remove_unreferenced_resources()
-    merged_pdf.save(filepath, min_version=version)
-    merged_pdf.close()
-
-    if metadata_document_id:
-        metadata_document = qs.get(id=metadata_document_id)
-        if metadata_document is not None:
-            overrides = DocumentMetadataOverrides.from_document(metadata_document)
-            overrides.title = metadata_document.title + " (merged)"
-    else:
-        overrides = DocumentMetadataOverrides()
-
-    logger.info("Adding merged document to the task queue.")
-    consume_file.delay(
-        ConsumableDocument(
-            source=DocumentSource.ConsumeFolder,
-            original_file=filepath,
-        ),
-        overrides,
-    )
-
-    return "OK"
+    return merge_documents.delay(doc_ids, metadata_document_id).id
 
 
 def split(doc_ids: list[int], pages: list[list[int]]):
+    """
+    Queues splitting the document into documents of the given pages.  Returns
+    the id of the task
+    """
     logger.info(
         f"Attempting to split document {doc_ids[0]} into {len(pages)} documents",
     )
-    doc = Document.objects.get(id=doc_ids[0])
-    import pikepdf
-
-    try:
-        with pikepdf.open(doc.source_path) as pdf:
-            for idx, split_doc in enumerate(pages):
-                dst = pikepdf.new()
-                for page in split_doc:
-                    dst.pages.append(pdf.pages[page - 1])
-                filepath = os.path.join(
-                    settings.SCRATCH_DIR,
-                    f"{doc.id}_{split_doc[0]}-{split_doc[-1]}.pdf",
-                )
-                dst.remove_unreferenced_resources()
-                dst.save(filepath)
-                dst.close()
-
-                overrides = DocumentMetadataOverrides().from_document(doc)
-                overrides.title = f"{doc.title} (split {idx + 1})"
-                logger.info(
-                    f"Adding split document with pages {split_doc} to the task queue.",
-                )
-                consume_file.delay(
-                    ConsumableDocument(
-                        source=DocumentSource.ConsumeFolder,
-                        original_file=filepath,
-                    ),
-                    overrides,
-                )
-    except Exception as e:
-        logger.exception(f"Error splitting document {doc.id}: {e}")
-
-    return "OK"
+    return split_document.delay(doc_ids[0], pages).id
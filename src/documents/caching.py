@@ -1,10 +1,14 @@
 import logging
+import time
 from binascii import hexlify
+from collections.abc import Iterable
 from dataclasses import dataclass
+from hashlib import sha256
 from typing import TYPE_CHECKING
 from typing import Final
 from typing import Optional
 
+from django.conf import settings
 from django.core.cache import cache
 
 from documents.models import Document
@@ -37,6 +41,10 @@ CLASSIFIER_MODIFIED_KEY: Final[str] = "classifier_modified"
 CACHE_1_MINUTE: Final[int] = 60
 CACHE_5_MINUTES: Final[int] = 5 * CACHE_1_MINUTE
 CACHE_50_MINUTES: Final[int] = 50 * CACHE_1_MINUTE
+CACHE_1_DAY: Final[int] = 24 * 60 * CACHE_1_MINUTE
+
+# Expected time a bulk update waits in the queue before it starts
+PENDING_UPDATE_QUEUE_WAIT: Final[int] = 30 * CACHE_1_MINUTE
 
 
 def get_suggestion_cache_key(document_id: int) -> str:
@@ -189,6 +197,85 @@ def refresh_metadata_cache(
     cache.touch(doc_key, timeout)
 
 
+def get_highlights_cache_key(document: Document, terms: Iterable[str]) -> str:
+    """
+    Returns the key for the content highlights of the given document for the
+    given search terms.  The content can be edited without changing the checksum,
+    so the modification time is part of the key as well, and the highlights
+    depend on the window of the content they are built from
+    """
+    terms_hash = sha256(",".join(sorted(terms)).encode()).hexdigest()
+    modified = int(document.modified.timestamp() * 1000)
+    window = settings.SEARCH_HIGHLIGHT_WINDOW
+    return f"doc_{document.checksum}_{modified}_highlights_{window}_{terms_hash}"
+
+
+def get_highlights_cache(
+    document: Document,
+    terms: Iterable[str],
+) -> Optional[str]:
+    """
+    Returns the cached content highlights for the given document and search
+    terms, if they were cached once
+    """
+    return cache.get(get_highlights_cache_key(document, terms))
+
+
+def set_highlights_cache(
+    document: Document,
+    terms: Iterable[str],
+    highlights: str,
+    *,
+    timeout: int = CACHE_50_MINUTES,
+) -> None:
+    """
+    Caches the content highlights for the given document and search terms
+    """
+    cache.set(get_highlights_cache_key(document, terms), highlights, timeout)
+
+
+def get_date_suggestions_cache_key(document: Document) -> str:
+    """
+    Returns the key for the dates found in the given document.  Besides the
+    content, they depend on the filename and the date settings
+    """
+    settings_hash = sha256(
+        repr(
+            (
+                document.filename,
+                settings.DATE_ORDER,
+                settings.FILENAME_DATE_ORDER,
+                sorted(settings.IGNORE_DATES),
+                settings.DATE_PARSER_SCAN_LIMIT,
+                settings.NUMBER_OF_SUGGESTED_DATES,
+                settings.TIME_ZONE,
+            ),
+        ).encode(),
+    ).hexdigest()
+    modified = int(document.modified.timestamp() * 1000)
+    return f"doc_{document.checksum}_{modified}_dates_{settings_hash}"
+
+
+def get_date_suggestions_cache(document: Document) -> Optional[list[str]]:
+    """
+    Returns the cached dates found in the given document, if they were
+    cached once
+    """
+    return cache.get(get_date_suggestions_cache_key(document))
+
+
+def set_date_suggestions_cache(
+    document: Document,
+    dates: list[str],
+    *,
+    timeout: int = CACHE_50_MINUTES,
+) -> None:
+    """
+    Caches the dates found in the given document
+    """
+    cache.set(get_date_suggestions_cache_key(document), dates, timeout)
+
+
 def get_thumbnail_modified_key(document_id: int) -> str:
     """
     Builds the key to store a thumbnail's timestamp
@@ -200,10 +287,81 @@ def clear_document_caches(document_id: int) -> None:
     """
     Removes all cached items for the given document
     """
+    clear_documents_caches([document_id])
+
+
+def clear_documents_caches(document_ids: Iterable[int]) -> None:
+    """
+    Removes all cached items for the given documents at once
+    """
     cache.delete_many(
         [
-            get_suggestion_cache_key(document_id),
-            get_metadata_cache_key(document_id),
-            get_thumbnail_modified_key(document_id),
+            key
+            for document_id in document_ids
+            for key in (
+                get_suggestion_cache_key(document_id),
+                get_metadata_cache_key(document_id),
+                get_thumbnail_modified_key(document_id),
+            )
         ],
     )
+
+
+def get_pending_update_key(document_id: int) -> str:
+    """
+    Builds the key marking a document as waiting for a bulk update
+    """
+    return f"doc_{document_id}_pending_update"
+
+
+def get_pending_update_timeout() -> int:
+    """
+    Returns how long documents stay marked as waiting for a bulk update.  An
+    update normally starts within the expected queue wait and ends within the
+    task time limit, a lost update doesn't block later ones for longer
+    """
+    return settings.CELERY_TASK_TIME_LIMIT + PENDING_UPDATE_QUEUE_WAIT
+
+
+def mark_pending_updates(
+    document_ids: Iterable[int],
+    *,
+    timeout: Optional[int] = None,
+) -> list[int]:
+    """
+    Marks the given documents as waiting for a bulk update.  Returns the
+    documents which were not waiting already, in the given order.  Marks older
+    than the timeout are replaced, their update is considered lost
+    """
+    if timeout is None:
+        timeout = get_pending_update_timeout()
+    keys = {
+        document_id: get_pending_update_key(document_id) for document_id in document_ids
+    }
+    pending = cache.get_many(keys.values())
+    now = time.time()
+    new_ids = [
+        document_id
+        for document_id, key in keys.items()
+        if key not in pending or now - pending[key] >= timeout
+    ]
+    expired_ids = [
+        document_id for document_id in new_ids if keys[document_id] in pending
+    ]
+    if expired_ids:
+        logger.warning(
+            f"The update of document(s) {expired_ids} did not start in time, "
+            f"updating them again",
+        )
+    cache.set_many({keys[document_id]: now for document_id in new_ids}, timeout)
+    return new_ids
+
+
+def clear_pending_updates(document_ids: Iterable[int]) -> None:
+    """
+    Removes the marks of the given documents once their update started, so
+    later changes are updated again
+    """
+    cache.delete_many(
+        [get_pending_update_key(document_id) for document_id in document_ids],
+    )
@@ -14,7 +14,6 @@ if TYPE_CHECKING:
 
 from django.conf import settings
 from django.core.cache import cache
-from sklearn.exceptions import InconsistentVersionWarning
 
 from documents.caching import CACHE_50_MINUTES
 from documents.caching import CLASSIFIER_HASH_KEY
@@ -93,6 +92,8 @@ class DocumentClassifier:
         self._stop_words = None
 
     def load(self) -> None:
+        from sklearn.exceptions import InconsistentVersionWarning
+
         # Catch warnings for processing
         with warnings.catch_warnings(record=True) as w:
             with open(settings.MODEL_FILE, "rb") as f:
@@ -104,7 +104,9 @@ def preview_etag(request, pk: int) -> Optional[str]:
             "original" in request.query_params
             and request.query_params["original"] == "true"
         )
-        return doc.checksum if use_original else doc.archive_checksum
+        if use_original or not doc.has_archive_version:
+            return doc.checksum
+        return doc.archive_checksum
     except Document.DoesNotExist:  # pragma: no cover
         return None
     return None
@@ -148,3 +150,19 @@ def thumbnail_last_modified(request, pk: int) -> Optional[datetime]:
         return last_modified
     except Document.DoesNotExist:  # pragma: no cover
         return None
+
+
+def thumbnail_etag(request, pk: int) -> Optional[str]:
+    """
+    ETag for the thumbnail in the requested size, using the document checksum
+    and the last modification of the stored thumbnail
+    """
+    last_modified = thumbnail_last_modified(request, pk)
+    if last_modified is None:
+        return None
+    try:
+        checksum = Document.objects.values_list("checksum", flat=True).get(pk=pk)
+    except Document.DoesNotExist:  # pragma: no cover
+        return None
+    size = request.query_params.get("size", "default")
+    return f"{checksum}:{size}:{last_modified.timestamp()}"
@@ -1,18 +1,19 @@
 import datetime
-import hashlib
 import os
 import tempfile
 import uuid
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
 from enum import Enum
 from pathlib import Path
 from subprocess import CompletedProcess
 from subprocess import run
 from typing import TYPE_CHECKING
+from typing import Callable
 from typing import Optional
 
 import magic
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import transaction
@@ -21,6 +22,7 @@ from django.utils import timezone
 from filelock import FileLock
 from rest_framework.reverse import reverse
 
+from documents.classifier import DocumentClassifier
 from documents.classifier import load_classifier
 from documents.data_models import DocumentMetadataOverrides
 from documents.file_handling import create_source_path_directory
@@ -47,10 +49,15 @@ from documents.plugins.base import AlwaysRunPluginMixin
 from documents.plugins.base import ConsumeTaskPlugin
 from documents.plugins.base import NoCleanupPluginMixin
 from documents.plugins.base import NoSetupPluginMixin
+from documents.plugins.helpers import ProgressManager
 from documents.signals import document_consumption_finished
 from documents.signals import document_consumption_started
+from documents.timing import record_size
+from documents.timing import record_stage
+from documents.utils import compute_checksum
 from documents.utils import copy_basic_file_stats
-from documents.utils import copy_file_with_basic_stats
+from documents.utils import copy_file_with_checksum
+from documents.utils import place_file
 
 
 class WorkflowTriggerPlugin(
@@ -255,6 +262,65 @@ class ConsumerFilePhase(str, Enum):
     FAILED = "FAILED"
 
 
+class ConsumerStageRunner:
+    """
+    Runs consumption stages which don't depend on the results of parsing, like
+    the thumbnail of the original file, in background threads while the
+    document is parsed.  The expensive parts of these stages are external
+    processes, so they don't compete with the parser for the interpreter.
+
+    If concurrency is disabled, stages are only run once their result is
+    needed, exactly like before.  Leaving the runner waits for all started
+    stages, so temporary files can be cleaned up safely afterwards.
+    """
+
+    def __init__(self, *, concurrent: bool, max_workers: int = 2):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if concurrent:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix="paperless-consumer-stage",
+            )
+        self._futures: dict[str, Future] = {}
+
+    def __enter__(self) -> "ConsumerStageRunner":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        self._futures.clear()
+
+    def start(self, name: str, stage: Callable, *args):
+        """
+        Starts the given stage in the background, if concurrency is enabled
+        """
+        if self._executor is not None:
+            # The thread records its stage into the timings of this consumption
+            self._futures[name] = self._executor.submit(
+                copy_context().run,
+                self._run,
+                name,
+                stage,
+                *args,
+            )
+
+    def result(self, name: str, stage: Callable, *args):
+        """
+        Returns the result of the stage with the given name, waiting for it if it
+        was started, running it now otherwise.  Exceptions of the stage are
+        raised here
+        """
+        future = self._futures.pop(name, None)
+        if future is None:
+            return self._run(name, stage, *args)
+        return future.result()
+
+    def _run(self, name: str, stage: Callable, *args):
+        with record_stage(name):
+            return stage(*args)
+
+
 class Consumer(LoggingMixin):
     logging_name = "paperless.consumer"
 
@@ -266,20 +332,28 @@ class Consumer(LoggingMixin):
         message: Optional[ConsumerStatusShortMessage] = None,
         document_id=None,
     ):  # pragma: no cover
-        payload = {
+        extra_args = {
             "filename": os.path.basename(self.filename) if self.filename else None,
-            "task_id": self.task_id,
-            "current_progress": current_progress,
-            "max_progress": max_progress,
-            "status": status,
-            "message": message,
             "document_id": document_id,
             "owner_id": self.override_owner_id if self.override_owner_id else None,
         }
-        async_to_sync(self.channel_layer.group_send)(
-            "status_updates",
-            {"type": "status_update", "data": payload},
-        )
+        if self.status_mgr is not None:
+            self.status_mgr.send_progress(
+                status,
+                message,
+                current_progress,
+                max_progress,
+                extra_args,
+            )
+        else:
+            with ProgressManager(self.filename, self.task_id) as status_mgr:
+                status_mgr.send_progress(
+                    status,
+                    message,
+                    current_progress,
+                    max_progress,
+                    extra_args,
+                )
 
     def _fail(
         self,
@@ -292,8 +366,16 @@ class Consumer(LoggingMixin):
         self.log.error(log_message or message, exc_info=exc_info)
         raise ConsumerError(f"{self.filename}: {log_message or message}") from exception
 
-    def __init__(self):
+    def __init__(
+        self,
+        classifier: Optional[DocumentClassifier] = None,
+        status_mgr: Optional[ProgressManager] = None,
+    ):
         super().__init__()
+        # Shared by consumers of a batch, loaded per document otherwise
+        self.classifier = classifier
+        # Progress is sent over the connection of the task, if there is one
+        self.status_mgr = status_mgr
         self.path: Optional[Path] = None
         self.original_path: Optional[Path] = None
         self.filename = None
@@ -305,8 +387,9 @@ class Consumer(LoggingMixin):
         self.task_id = None
         self.override_owner_id = None
         self.override_custom_field_ids = None
-
-        self.channel_layer = get_channel_layer()
+        self.checksum: Optional[str] = None
+        # Directories owned by this consumption, whose files may be moved
+        self.temporary_dirs: list[Path] = []
 
     def pre_check_file_exists(self):
         """
@@ -322,10 +405,8 @@ class Consumer(LoggingMixin):
         """
         Using the MD5 of the file, check this exact file doesn't already exist
         """
-        with open(self.original_path, "rb") as f:
-            checksum = hashlib.md5(f.read()).hexdigest()
         existing_doc = Document.objects.filter(
-            Q(checksum=checksum) | Q(archive_checksum=checksum),
+            Q(checksum=self.checksum) | Q(archive_checksum=self.checksum),
         )
         if existing_doc.exists():
             if settings.CONSUMER_DELETE_DUPLICATES:
@@ -548,22 +629,35 @@ class Consumer(LoggingMixin):
 
         self.pre_check_file_exists()
         self.pre_check_directories()
-        self.pre_check_duplicate()
-        self.pre_check_asn_value()
 
-        self.log.info(f"Consuming {self.filename}")
-
-        # For the actual work, copy the file into a tempdir
+        # For the actual work, copy the file into a tempdir.  The checksum is
+        # computed while copying, so the file is only read once
         tempdir = tempfile.TemporaryDirectory(
             prefix="paperless-ngx",
             dir=settings.SCRATCH_DIR,
         )
         self.working_copy = Path(tempdir.name) / Path(self.filename)
-        copy_file_with_basic_stats(self.original_path, self.working_copy)
+        with record_stage("copy"):
+            self.checksum = copy_file_with_checksum(
+                self.original_path,
+                self.working_copy,
+            )
+            copy_basic_file_stats(self.original_path, self.working_copy)
+        record_size("copy", self.working_copy.stat().st_size)
+
+        try:
+            self.pre_check_duplicate()
+            self.pre_check_asn_value()
+        except ConsumerError:
+            tempdir.cleanup()
+            raise
+
+        self.log.info(f"Consuming {self.filename}")
 
         # Determine the parser class.
 
-        mime_type = magic.from_file(self.working_copy, mime=True)
+        with record_stage("mime_type"):
+            mime_type = magic.from_file(self.working_copy, mime=True)
 
         self.log.debug(f"Detected mime type: {mime_type}")
 
@@ -586,7 +680,11 @@ class Consumer(LoggingMixin):
             logging_group=self.logging_group,
         )
 
-        self.run_pre_consume_script()
+        with record_stage("pre_consume_script"):
+            self.run_pre_consume_script()
+            if settings.PRE_CONSUME_SCRIPT:
+                # The script may have modified the working copy
+                self.checksum = compute_checksum(self.working_copy)
 
         def progress_callback(current_progress, max_progress):  # pragma: no cover
             # recalculate progress to be within 20 and 80
@@ -600,8 +698,11 @@ class Consumer(LoggingMixin):
             progress_callback=progress_callback,
         )
 
+        document_parser.checksum = self.checksum
         self.log.debug(f"Parser: {type(document_parser).__name__}")
 
+        self.temporary_dirs = [Path(tempdir.name), Path(document_parser.tempdir)]
+
         # However, this already created working directories which we have to
         # clean up.
 
@@ -613,39 +714,70 @@ class Consumer(LoggingMixin):
         archive_path = None
 
         try:
-            self._send_progress(
-                20,
-                100,
-                ConsumerFilePhase.WORKING,
-                ConsumerStatusShortMessage.PARSING_DOCUMENT,
-            )
-            self.log.debug(f"Parsing {self.filename}...")
-            document_parser.parse(self.working_copy, mime_type, self.filename)
-
-            self.log.debug(f"Generating thumbnail for {self.filename}...")
-            self._send_progress(
-                70,
-                100,
-                ConsumerFilePhase.WORKING,
-                ConsumerStatusShortMessage.GENERATING_THUMBNAIL,
-            )
-            thumbnail = document_parser.get_thumbnail(
-                self.working_copy,
-                mime_type,
-                self.filename,
-            )
+            # The stages are stopped before any temporary files are cleaned up
+            with ConsumerStageRunner(
+                concurrent=settings.CONSUMER_PARALLEL_STAGES,
+            ) as stages:
+                if not document_parser.thumbnail_depends_on_parse(mime_type):
+                    stages.start(
+                        "thumbnail",
+                        document_parser.get_thumbnail,
+                        self.working_copy,
+                        mime_type,
+                        self.filename,
+                    )
+                stages.start(
+                    "date",
+                    self._parse_date_from_text_layer,
+                    document_parser,
+                    mime_type,
+                )
 
-            text = document_parser.get_text()
-            date = document_parser.get_date()
-            if date is None:
                 self._send_progress(
-                    90,
+                    20,
                     100,
                     ConsumerFilePhase.WORKING,
-                    ConsumerStatusShortMessage.PARSE_DATE,
+                    ConsumerStatusShortMessage.PARSING_DOCUMENT,
                 )
-                date = parse_date(self.filename, text)
-            archive_path = document_parser.get_archive_path()
+                self.log.debug(f"Parsing {self.filename}...")
+                with record_stage("parse"):
+                    document_parser.parse(
+                        self.working_copy,
+                        mime_type,
+                        self.filename,
+                    )
+
+                self.log.debug(f"Generating thumbnail for {self.filename}...")
+                self._send_progress(
+                    70,
+                    100,
+                    ConsumerFilePhase.WORKING,
+                    ConsumerStatusShortMessage.GENERATING_THUMBNAIL,
+                )
+                thumbnail = stages.result(
+                    "thumbnail",
+                    document_parser.get_thumbnail,
+                    self.working_copy,
+                    mime_type,
+                    self.filename,
+                )
+
+                text = document_parser.get_text()
+                date = document_parser.get_date()
+                if date is None:
+                    self._send_progress(
+                        90,
+                        100,
+                        ConsumerFilePhase.WORKING,
+                        ConsumerStatusShortMessage.PARSE_DATE,
+                    )
+                    # The date found in the text layer before parsing can be
+                    # used, as long as parsing did not change the text
+                    text_layer, date = stages.result("date", lambda: (None, None))
+                    if text_layer is None or text_layer != text:
+                        with record_stage("date"):
+                            date = parse_date(self.filename, text)
+                archive_path = document_parser.get_archive_path()
 
         except ParseError as e:
             self._fail(
@@ -670,7 +802,8 @@ class Consumer(LoggingMixin):
         #   reloading the classifier multiple times, since there are multiple
         #   post-consume hooks that all require the classifier.
 
-        classifier = load_classifier()
+        with record_stage("classifier"):
+            classifier = self.classifier or load_classifier()
 
         self._send_progress(
             95,
@@ -681,9 +814,14 @@ class Consumer(LoggingMixin):
         # now that everything is done, we can start to store the document
         # in the system. This will be a transaction and reasonably fast.
         try:
-            with transaction.atomic():
+            with record_stage("transaction"), transaction.atomic():
                 # store the document.
-                document = self._store(text=text, date=date, mime_type=mime_type)
+                with record_stage("store"):
+                    document = self._store(
+                        text=text,
+                        date=date,
+                        mime_type=mime_type,
+                    )
 
                 # If we get here, it was successful. Proceed with post-consume
                 # hooks. If they fail, nothing will get changed.
@@ -695,9 +833,11 @@ class Consumer(LoggingMixin):
                     classifier=classifier,
                 )
 
-                # After everything is in the database, copy the files into
+                # After everything is in the database, move the files into
                 # place. If this fails, we'll also rollback the transaction.
-                with FileLock(settings.MEDIA_LOCK):
+                with record_stage("media_lock_wait"):
+                    media_lock = FileLock(settings.MEDIA_LOCK).acquire()
+                with media_lock:
                     document.filename = generate_unique_filename(document)
                     create_source_path_directory(document.source_path)
 
@@ -719,26 +859,23 @@ class Consumer(LoggingMixin):
                             archive_filename=True,
                         )
                         create_source_path_directory(document.archive_path)
+                        document.archive_checksum = compute_checksum(archive_path)
                         self._write(
                             document.storage_type,
                             archive_path,
                             document.archive_path,
                         )
 
-                        with open(archive_path, "rb") as f:
-                            document.archive_checksum = hashlib.md5(
-                                f.read(),
-                            ).hexdigest()
-
                 # Don't save with the lock active. Saving will cause the file
                 # renaming logic to acquire the lock as well.
                 # This triggers things like file renaming
-                document.save()
+                with record_stage("save"):
+                    document.save()
 
-                # Delete the file only if it was successfully consumed
-                self.log.debug(f"Deleting file {self.working_copy}")
+                # Delete the file only if it was successfully consumed.
+                # The working copy was already moved into place
+                self.log.debug(f"Deleting file {self.original_path}")
                 self.original_path.unlink()
-                self.working_copy.unlink()
 
                 # https://github.com/jonaswinkler/paperless-ng/discussions/1037
                 shadow_file = os.path.join(
@@ -762,7 +899,8 @@ class Consumer(LoggingMixin):
             document_parser.cleanup()
             tempdir.cleanup()
 
-        self.run_post_consume_script(document)
+        with record_stage("post_consume_script"):
+            self.run_post_consume_script(document)
 
         self.log.info(f"Document {document} consumption finished")
 
@@ -852,7 +990,7 @@ class Consumer(LoggingMixin):
             title=title[:127],
             content=text,
             mime_type=mime_type,
-            checksum=hashlib.md5(self.working_copy.read_bytes()).hexdigest(),
+            checksum=self.checksum,
             created=create_date,
             modified=create_date,
             storage_type=storage_type,
@@ -919,15 +1057,34 @@ class Consumer(LoggingMixin):
                     document=document,
                 )  # adds to document
 
-    def _write(self, storage_type, source, target):
-        with open(source, "rb") as read_file, open(target, "wb") as write_file:
-            write_file.write(read_file.read())
+    def _parse_date_from_text_layer(
+        self,
+        document_parser: DocumentParser,
+        mime_type: str,
+    ) -> tuple[Optional[str], Optional[datetime.datetime]]:
+        """
+        Parses the date from the text layer of the original file, if the parser
+        can extract it cheaply.  Returns the text layer and the date
+        """
+        text_layer = document_parser.get_text_layer(self.working_copy, mime_type)
+        if text_layer is None:
+            return None, None
+        return text_layer, parse_date(self.filename, text_layer)
 
-        # Attempt to copy file's original stats, but it's ok if we can't
-        try:
-            copy_basic_file_stats(source, target)
-        except Exception:  # pragma: no cover
-            pass
+    def _write(self, storage_type, source, target):
+        """
+        Places source at target.  Files in the temporary directories of the
+        consumer and the parser are moved, which is a rename on the same
+        filesystem.  Anything else, like static thumbnails, is copied
+        """
+        source = Path(source).resolve()
+        is_temporary = any(
+            source.is_relative_to(directory.resolve())
+            for directory in self.temporary_dirs
+        )
+        record_size("file_placement", source.stat().st_size)
+        with record_stage("file_placement"):
+            place_file(source, target, move=is_temporary)
 
     def _log_script_outputs(self, completed_process: CompletedProcess):
         """
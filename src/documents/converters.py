@@ -1,9 +1,7 @@
 from pathlib import Path
 from subprocess import run
 
-import img2pdf
 from django.conf import settings
-from PIL import Image
 
 from documents.utils import copy_basic_file_stats
 from documents.utils import maybe_override_pixel_limit
@@ -18,6 +16,9 @@ def convert_from_tiff_to_pdf(tiff_path: Path, target_directory: Path) -> Path:
 
     Returns the path of the PDF created.
     """
+    import img2pdf
+    from PIL import Image
+
     # override pixel setting if needed
     maybe_override_pixel_limit()
 
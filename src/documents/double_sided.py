@@ -7,7 +7,6 @@ from typing import Final
 from typing import Optional
 
 from django.conf import settings
-from pikepdf import Pdf
 
 from documents.consumer import ConsumerError
 from documents.converters import convert_from_tiff_to_pdf
@@ -86,6 +85,8 @@ class CollatePlugin(NoCleanupPluginMixin, NoSetupPluginMixin, ConsumeTaskPlugin)
                 valid_staging_exists = True
 
         if valid_staging_exists:
+            from pikepdf import Pdf
+
             try:
                 # Collate pages from second PDF in reverse order
                 with Pdf.open(staging) as pdf1, Pdf.open(pdf_file) as pdf2:
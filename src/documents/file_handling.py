@@ -1,12 +1,18 @@
 import logging
 import os
+import shutil
 from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import PurePath
+from typing import Optional
 
 import pathvalidate
 from django.conf import settings
 from django.template.defaultfilters import slugify
 from django.utils import timezone
+from filelock import FileLock
 
 from documents.models import Document
 
@@ -54,6 +60,118 @@ def delete_empty_directories(directory, root):
         directory = os.path.normpath(os.path.dirname(directory))
 
 
+# Files of the documents deleted within deferred_file_removal(), if enabled
+_deferred_removals: ContextVar[Optional[list[dict]]] = ContextVar(
+    "deferred_file_removals",
+    default=None,
+)
+
+
+def get_document_files(doc: Document) -> dict:
+    """
+    Returns the files of a document, in a form which can be passed to a task
+    """
+    return {
+        "document": str(doc),
+        "source_path": str(doc.source_path),
+        "archive_path": str(doc.archive_path) if doc.has_archive_version else None,
+        "thumbnail_path": str(doc.thumbnail_path),
+    }
+
+
+def _move_to_trash(source_path: str) -> bool:
+    # Find a non-conflicting filename in case a document with the same
+    # name was moved to trash earlier
+    counter = 0
+    old_filename = os.path.split(source_path)[1]
+    (old_filebase, old_fileext) = os.path.splitext(old_filename)
+
+    while True:
+        new_file_path = os.path.join(
+            settings.TRASH_DIR,
+            old_filebase + (f"_{counter:02}" if counter else "") + old_fileext,
+        )
+
+        if os.path.exists(new_file_path):
+            counter += 1
+        else:
+            break
+
+    logger.debug(f"Moving {source_path} to trash at {new_file_path}")
+    try:
+        shutil.move(source_path, new_file_path)
+    except OSError as e:
+        logger.error(
+            f"Failed to move {source_path} to trash at "
+            f"{new_file_path}: {e}. Skipping cleanup!",
+        )
+        return False
+    return True
+
+
+def remove_document_files(documents: list[dict]) -> None:
+    """
+    Moves the originals of deleted documents to the trash, if enabled, and
+    deletes their other files.  The media lock is taken once for all of them
+    and directories left empty are removed at the end
+    """
+    directories = set()
+    with FileLock(settings.MEDIA_LOCK):
+        for files in documents:
+            if settings.TRASH_DIR and not _move_to_trash(files["source_path"]):
+                continue
+
+            for filename in (
+                files["source_path"],
+                files["archive_path"],
+                files["thumbnail_path"],
+            ):
+                if filename and os.path.isfile(filename):
+                    try:
+                        os.unlink(filename)
+                        logger.debug(f"Deleted file {filename}.")
+                    except OSError as e:
+                        logger.warning(
+                            f"While deleting document {files['document']}, the "
+                            f"file {filename} could not be deleted: {e}",
+                        )
+
+            directories.add(
+                (os.path.dirname(files["source_path"]), settings.ORIGINALS_DIR),
+            )
+            if files["archive_path"]:
+                directories.add(
+                    (os.path.dirname(files["archive_path"]), settings.ARCHIVE_DIR),
+                )
+
+        for directory, root in directories:
+            delete_empty_directories(directory, root=root)
+
+
+@contextmanager
+def deferred_file_removal() -> Iterator[list[dict]]:
+    """
+    Collects the files of the documents deleted within the context, instead
+    of deleting them right away.  The caller is responsible for passing them
+    to remove_document_files()
+    """
+    documents = []
+    token = _deferred_removals.set(documents)
+    try:
+        yield documents
+    finally:
+        _deferred_removals.reset(token)
+
+
+def remove_files_of_deleted_document(doc: Document) -> None:
+    files = get_document_files(doc)
+    documents = _deferred_removals.get()
+    if documents is not None:
+        documents.append(files)
+        return
+    remove_document_files([files])
+
+
 def many_to_dictionary(field):
     # Converts ManyToManyField to dictionary by assuming, that field
     # entries contain an _ or - which will be used as a delimiter
@@ -0,0 +1,178 @@
+"""
+Responses serving files.
+
+Files are streamed in chunks instead of being read into memory, and single
+byte ranges are served as 206 Partial Content, so PDF.js can load large
+documents in parts.  If configured with SENDFILE_HEADER, serving the file is
+left to the front proxy with X-Accel-Redirect (nginx) or X-Sendfile (apache,
+lighttpd) instead.  Under ASGI, the chunks are read one at a time in a thread,
+instead of reading the whole file before sending it.
+"""
+
+import io
+import re
+from collections.abc import Iterator
+from pathlib import Path
+from typing import BinaryIO
+from typing import Final
+from typing import Optional
+from typing import Union
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpRequest
+from django.http import HttpResponse
+from django.http import StreamingHttpResponse
+from django.http.response import HttpResponseBase
+from django.utils.http import quote_etag
+
+FILE_CHUNK_SIZE: Final[int] = 64 * 1024
+
+RANGE_REGEX: Final = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+# Returned by next() once a synchronous iterator is exhausted
+_END: Final = object()
+
+
+class RangeNotSatisfiableError(ValueError):
+    pass
+
+
+class SyncStreamingHttpResponse(StreamingHttpResponse):
+    """
+    Streams a synchronous iterator also when served asynchronously.  Django
+    would collect all of its chunks in a thread before sending the first one,
+    this pulls them one at a time instead
+    """
+
+    async def __aiter__(self):
+        if self.is_async:
+            async for part in super().__aiter__():
+                yield part
+            return
+
+        iterator = iter(self.streaming_content)
+        while True:
+            part = await sync_to_async(next)(iterator, _END)
+            if part is _END:
+                break
+            yield part
+
+
+def parse_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """
+    Returns the first and the last byte of the range requested in a Range
+    header.  Returns None if the whole file should be sent, for invalid
+    headers and several ranges
+    """
+    match = RANGE_REGEX.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # The last bytes of the file
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiableError
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiableError
+    end = int(last) if last else size - 1
+    return start, min(end, size - 1)
+
+
+def _stream(file: BinaryIO, start: int, length: int) -> Iterator[bytes]:
+    try:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(FILE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def _sendfile_response(path: Path, content_type: str) -> Optional[HttpResponse]:
+    """
+    A response leaving it to the front proxy to send the file, if enabled and
+    possible for the file
+    """
+    path = path.resolve(strict=True)
+    if settings.SENDFILE_HEADER == "x-accel-redirect":
+        try:
+            # The internal location of nginx is the media directory
+            relative_path = path.relative_to(Path(settings.MEDIA_ROOT).resolve())
+        except ValueError:
+            return None
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = quote(
+            f"{settings.SENDFILE_ACCEL_PREFIX.rstrip('/')}/{relative_path.as_posix()}",
+        )
+        return response
+    elif settings.SENDFILE_HEADER == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = str(path)
+        return response
+    return None
+
+
+def file_response(
+    request: HttpRequest,
+    file: Union[Path, bytes],
+    content_type: str,
+    etag: Optional[str] = None,
+) -> HttpResponseBase:
+    """
+    Serves a file, or content which had to be decrypted, with support for
+    byte ranges and a strong ETag from the given checksum
+    """
+    quoted_etag = quote_etag(etag) if etag else None
+
+    response = None
+    if isinstance(file, Path):
+        response = _sendfile_response(file, content_type)
+    if response is None:
+        if isinstance(file, Path):
+            handle = file.open("rb")
+            size = file.stat().st_size
+        else:
+            handle = io.BytesIO(file)
+            size = len(file)
+
+        byte_range = None
+        range_header = request.headers.get("Range")
+        if_range = request.headers.get("If-Range")
+        # A range of a changed file is useless, send all of it
+        if range_header and (if_range is None or if_range == quoted_etag):
+            try:
+                byte_range = parse_range(range_header, size)
+            except RangeNotSatisfiableError:
+                handle.close()
+                response = HttpResponse(status=416)
+                response["Content-Range"] = f"bytes */{size}"
+                return response
+
+        start, end = byte_range or (0, size - 1)
+        response = SyncStreamingHttpResponse(
+            _stream(handle, start, end - start + 1),
+            content_type=content_type,
+            status=206 if byte_range else 200,
+        )
+        response["Content-Length"] = str(end - start + 1)
+        if byte_range:
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    response["Accept-Ranges"] = "bytes"
+    if quoted_etag:
+        response["ETag"] = quoted_etag
+    return response
@@ -1,8 +1,10 @@
 import logging
 import math
 import os
+import re
 from collections import Counter
 from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
 from datetime import timezone
 from shutil import rmtree
@@ -32,11 +34,15 @@ from whoosh.qparser.dateparse import DateParserPlugin
 from whoosh.qparser.dateparse import English
 from whoosh.qparser.plugins import FieldsPlugin
 from whoosh.scoring import TF_IDF
+from whoosh.searching import Hit
+from whoosh.searching import Results
 from whoosh.searching import ResultsPage
 from whoosh.searching import Searcher
 from whoosh.util.times import timespan
 from whoosh.writing import AsyncWriter
 
+from documents.caching import get_highlights_cache
+from documents.caching import set_highlights_cache
 from documents.models import CustomFieldInstance
 from documents.models import Document
 from documents.models import Note
@@ -184,7 +190,53 @@ def remove_document_by_id(writer: AsyncWriter, doc_id):
     writer.delete_by_term("id", doc_id)
 
 
+# Primary keys of the documents whose index update was deferred, if enabled
+_deferred_updates: ContextVar[Optional[set[int]]] = ContextVar(
+    "deferred_index_updates",
+    default=None,
+)
+
+
+@contextmanager
+def deferred_updates():
+    """
+    Collects the documents added or updated within the context and writes them
+    to the index with a single commit at the end, instead of one per document.
+    Documents which were rolled back or deleted in the meantime are skipped
+    """
+    if _deferred_updates.get() is not None:
+        # Already deferred by an outer context
+        yield
+        return
+
+    token = _deferred_updates.set(set())
+    try:
+        yield
+    finally:
+        flush_deferred_updates()
+        _deferred_updates.reset(token)
+
+
+def flush_deferred_updates():
+    """
+    Writes the updates deferred so far with a single commit, so they aren't
+    lost if the process is killed before the end of the context
+    """
+    document_ids = _deferred_updates.get()
+    if not document_ids:
+        return
+    logger.debug(f"Writing {len(document_ids)} deferred index update(s)")
+    with open_index_writer() as writer:
+        for document in Document.objects.filter(pk__in=document_ids):
+            update_document(writer, document)
+    document_ids.clear()
+
+
 def add_or_update_document(document: Document):
+    document_ids = _deferred_updates.get()
+    if document_ids is not None:
+        document_ids.add(document.pk)
+        return
     with open_index_writer() as writer:
         update_document(writer, document)
 
@@ -209,6 +261,13 @@ class DelayedQuery:
         "custom_fields": ("custom_fields", ["icontains", "istartswith"]),
     }
 
+    def get_query(self):
+        """
+        Returns the query and the numbers of the documents to exclude from
+        its results
+        """
+        return self._get_query()
+
     def _get_query(self):
         raise NotImplementedError
 
@@ -351,8 +410,7 @@ class DelayedQuery:
             sortedby=sortedby,
             reverse=reverse,
         )
-        page.results.fragmenter = highlight.ContextFragmenter(surround=50)
-        page.results.formatter = HtmlFormatter(tagname="span", between=" ... ")
+        configure_highlighting(page.results)
 
         if not self.first_score and len(page.results) > 0 and sortedby is None:
             self.first_score = page.results[0].score
@@ -439,6 +497,97 @@ class DelayedMoreLikeThisQuery(DelayedQuery):
         return q, mask
 
 
+HIGHLIGHT_SURROUND = 50
+
+
+def configure_highlighting(results: Results):
+    results.fragmenter = highlight.ContextFragmenter(surround=HIGHLIGHT_SURROUND)
+    results.formatter = HtmlFormatter(tagname="span", between=" ... ")
+
+
+def get_highlight_terms(results: Results, fieldname: str) -> frozenset[str]:
+    """
+    Returns the words of the query of the given results which are highlighted
+    in the given field
+    """
+    field = results.searcher.schema[fieldname]
+    return frozenset(
+        field.from_bytes(text)
+        for _, text in results.query_terms(expand=True, fieldname=fieldname)
+    )
+
+
+def bound_highlight_text(text: str, terms: frozenset[str], window: int) -> str:
+    """
+    Limits the text which gets re-tokenized for highlighting to a window of
+    the given size, starting shortly before the first match of any of the terms.
+    If no term matches verbatim, the window starts at the beginning of the text
+    """
+    if window <= 0 or len(text) <= window:
+        return text
+    start = 0
+    if len(terms) > 0:
+        match = re.search(
+            "|".join(re.escape(term) for term in terms),
+            text,
+            flags=re.IGNORECASE,
+        )
+        if match is not None:
+            start = max(0, match.start() - HIGHLIGHT_SURROUND)
+    return text[start : start + window]
+
+
+def get_hit_highlights(
+    hit: Hit,
+    doc: Document,
+    terms: Optional[frozenset[str]] = None,
+) -> dict:
+    """
+    Builds the content and note highlights of a search hit for the given document.
+    Content highlights are cached per document and query terms
+    """
+    if terms is None:
+        terms = get_highlight_terms(hit.results, "content")
+
+    highlights = get_highlights_cache(doc, terms)
+    if highlights is None:
+        highlights = hit.highlights(
+            "content",
+            text=bound_highlight_text(
+                doc.content,
+                terms,
+                settings.SEARCH_HIGHLIGHT_WINDOW,
+            ),
+        )
+        set_highlights_cache(doc, terms, highlights)
+
+    notes = ",".join([str(c.note) for c in doc.notes.all()])
+
+    return {
+        "highlights": highlights,
+        "note_highlights": hit.highlights("notes", text=notes),
+    }
+
+
+def get_document_highlights(
+    searcher: Searcher,
+    doc: Document,
+    query_params,
+    user: Optional[User] = None,
+) -> Optional[dict]:
+    """
+    Builds the highlights of a single document for a full text query, allowing
+    them to be loaded separately from the search results.  Returns None if the
+    document does not match the query
+    """
+    q, _ = DelayedFullTextQuery(searcher, query_params, 1, user).get_query()
+    results = searcher.search(q, filter=query.Term("id", doc.pk), limit=1)
+    if results.is_empty():
+        return None
+    configure_highlighting(results)
+    return get_hit_highlights(results[0], doc)
+
+
 def autocomplete(
     ix: FileIndex,
     term: str,
@@ -1,10 +1,12 @@
 import logging
 import os
+import uuid
 from concurrent.futures import ThreadPoolExecutor
 from fnmatch import filter
 from pathlib import Path
 from pathlib import PurePath
 from threading import Event
+from threading import Lock
 from time import monotonic
 from time import sleep
 from typing import Final
@@ -22,6 +24,8 @@ from documents.data_models import DocumentSource
 from documents.models import Tag
 from documents.parsers import is_file_ext_supported
 from documents.tasks import consume_file
+from documents.tasks import consume_file_batch
+from documents.tasks import get_consumer_batch_size
 
 try:
     from inotifyrecursive import INotify
@@ -85,6 +89,61 @@ def _is_ignored(filepath: str) -> bool:
     return False
 
 
+class ConsumeBatch:
+    """
+    Queues the files found in the consumption directory in batches of
+    CONSUMER_BATCH_SIZE documents, which are consumed by a single task, see
+    get_consumer_batch_size.  With a batch size of 1, every file is queued as
+    its own task right away
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._files: list[tuple[str, ConsumableDocument, DocumentMetadataOverrides]] = (
+            []
+        )
+
+    def add(
+        self,
+        input_doc: ConsumableDocument,
+        overrides: DocumentMetadataOverrides,
+    ) -> None:
+        batch_size = get_consumer_batch_size()
+        if batch_size <= 1:
+            consume_file.delay(input_doc, overrides)
+            return
+
+        with self._lock:
+            self._files.append((str(uuid.uuid4()), input_doc, overrides))
+            if len(self._files) < batch_size:
+                return
+            batch, self._files = self._files, []
+        self._send(batch)
+
+    def flush(self) -> None:
+        """
+        Queues the files of an incomplete batch
+        """
+        with self._lock:
+            batch, self._files = self._files, []
+        if batch:
+            try:
+                self._send(batch)
+            except Exception:
+                logger.exception("Error while consuming documents")
+
+    def _send(self, batch) -> None:
+        if len(batch) == 1:
+            task_id, input_doc, overrides = batch[0]
+            consume_file.apply_async((input_doc, overrides), task_id=task_id)
+        else:
+            logger.debug(f"Queueing a batch of {len(batch)} files")
+            consume_file_batch.delay(batch)
+
+
+_batch = ConsumeBatch()
+
+
 def _consume(filepath: str) -> None:
     if os.path.isdir(filepath) or _is_ignored(filepath):
         return
@@ -127,7 +186,7 @@ def _consume(filepath: str) -> None:
 
     try:
         logger.info(f"Adding {filepath} to the task queue.")
-        consume_file.delay(
+        _batch.add(
             ConsumableDocument(
                 source=DocumentSource.ConsumeFolder,
                 original_file=filepath,
@@ -243,6 +302,7 @@ class Command(BaseCommand):
         else:
             for entry in os.scandir(directory):
                 _consume(entry.path)
+        _batch.flush()
 
         if options["oneshot"]:
             return
@@ -276,7 +336,8 @@ class Command(BaseCommand):
             observer.start()
             try:
                 while observer.is_alive():
-                    observer.join(timeout)
+                    observer.join(timeout or polling_interval)
+                    _batch.flush()
                     if self.stop_flag.is_set():
                         observer.stop()
             except KeyboardInterrupt:
@@ -339,6 +400,7 @@ class Command(BaseCommand):
 
                 # These files are still waiting to hit the timeout
                 notified_files = still_waiting
+                _batch.flush()
 
                 # If files are waiting, need to exit read() to check them
                 # Otherwise, go back to infinite sleep time, but only if not testing
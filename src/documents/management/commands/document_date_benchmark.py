@@ -0,0 +1,168 @@
+import itertools
+import json
+import random
+import re
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import CommandError
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from documents.management.commands.document_search_benchmark import VOCABULARY
+from documents.management.commands.document_search_benchmark import summarize
+from documents.parsers import DATE_REGEX
+from documents.parsers import parse_date_generator
+
+MONTHS = (
+    "January February March April May June July August September October "
+    "November December"
+).split()
+
+
+def reference_date_generator(text: str) -> Iterator:
+    """
+    Finds dates the way paperless did before numeric dates were parsed
+    directly, passing every match of the whole text to dateparser
+    """
+    import dateparser
+
+    for match in re.finditer(DATE_REGEX, text):
+        try:
+            date = dateparser.parse(
+                match.group(0),
+                settings={
+                    "DATE_ORDER": settings.DATE_ORDER,
+                    "PREFER_DAY_OF_MONTH": "first",
+                    "RETURN_AS_TIMEZONE_AWARE": True,
+                    "TIMEZONE": settings.TIME_ZONE,
+                },
+            )
+        except Exception:
+            date = None
+        if (
+            date is not None
+            and date.year > 1900
+            and date <= timezone.now()
+            and date.date() not in settings.IGNORE_DATES
+        ):
+            yield date
+
+
+class SyntheticContent:
+    """
+    Generates document content with many numbers looking like dates, as
+    found in invoices and statements
+    """
+
+    def __init__(self, rng: random.Random, *, words_per_document: int):
+        self.rng = rng
+        self.words_per_document = words_per_document
+
+    def _number(self) -> str:
+        rng = self.rng
+        choice = rng.random()
+        if choice < 0.3:
+            # Numbers which match the date pattern, but aren't dates
+            return f"{rng.randint(13, 99)}-{rng.randint(13, 99)}-{rng.randint(10, 99)}"
+        elif choice < 0.5:
+            return f"{rng.randint(1, 28):02}.{rng.randint(1, 12):02}.{rng.randint(1990, 2030)}"
+        elif choice < 0.6:
+            return f"{rng.randint(1990, 2030)}-{rng.randint(1, 12):02}-{rng.randint(1, 28):02}"
+        elif choice < 0.7:
+            return (
+                f"{rng.randint(1, 28)}. {rng.choice(MONTHS)} {rng.randint(1990, 2030)}"
+            )
+        return f"{rng.randint(1, 9999)},{rng.randint(0, 99):02}"
+
+    def content(self) -> str:
+        words = [
+            self._number() if self.rng.random() < 0.1 else self.rng.choice(VOCABULARY)
+            for _ in range(self.words_per_document)
+        ]
+        return " ".join(words)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks finding the created date and the suggested dates of "
+        "synthetic documents, comparing the current date parser with passing "
+        "every match to dateparser."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--documents",
+            type=int,
+            default=50,
+            help="Number of synthetic documents",
+        )
+        parser.add_argument(
+            "--words-per-document",
+            type=int,
+            default=5000,
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Seed for the generated documents",
+        )
+        parser.add_argument(
+            "--output",
+            type=Path,
+            default=None,
+            help="File to write the JSON results to, defaults to stdout",
+        )
+
+    def handle(self, *args, **options):
+        if options["documents"] < 1:
+            raise CommandError("At least 1 document is required")
+
+        corpus = SyntheticContent(
+            random.Random(options["seed"]),
+            words_per_document=options["words_per_document"],
+        )
+        contents = [corpus.content() for _ in range(options["documents"])]
+        suggested = max(1, settings.NUMBER_OF_SUGGESTED_DATES)
+
+        # Loading the languages of dateparser takes a while the first time
+        list(reference_date_generator("1. January 2020"))
+
+        durations = {"current": [], "reference": []}
+        different = 0
+        for content in contents:
+            results = {}
+            for name, find_dates in [
+                ("current", lambda text: parse_date_generator("", text)),
+                ("reference", reference_date_generator),
+            ]:
+                start = time.perf_counter()
+                results[name] = list(itertools.islice(find_dates(content), suggested))
+                durations[name].append(time.perf_counter() - start)
+            if results["current"] != results["reference"]:
+                different += 1
+
+        current = summarize(durations["current"])
+        reference = summarize(durations["reference"])
+        results = {
+            "parameters": {
+                "documents": options["documents"],
+                "words_per_document": options["words_per_document"],
+                "suggested_dates": suggested,
+                "date_order": settings.DATE_ORDER,
+                "seed": options["seed"],
+            },
+            "current": current,
+            "reference": reference,
+            "speedup_p50": reference["p50_ms"] / max(current["p50_ms"], 1e-6),
+            "documents_with_different_dates": different,
+        }
+
+        output = json.dumps(results, indent=2)
+        if options["output"] is not None:
+            options["output"].write_text(output)
+        else:
+            self.stdout.write(output)
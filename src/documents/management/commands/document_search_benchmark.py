@@ -0,0 +1,400 @@
+import hashlib
+import json
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import CommandError
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from guardian.shortcuts import assign_perm
+
+from documents import index
+from documents.management.commands.mixins import ProgressBarMixin
+from documents.models import Correspondent
+from documents.models import Document
+from documents.models import DocumentType
+from documents.models import Tag
+from documents.tasks import index_reindex
+
+# Words typical for the kind of documents paperless stores
+VOCABULARY = (
+    "invoice receipt statement account balance payment amount total tax "
+    "insurance policy contract customer number date reference order delivery "
+    "address street city phone email bank transfer due period annual monthly "
+    "salary employer employee certificate tenant rent landlord deposit notice "
+    "doctor health medical prescription pharmacy vehicle registration license "
+    "electricity water heating gas meter reading consumption tariff refund "
+    "rechnung betrag zahlung konto vertrag kunde datum versicherung steuer "
+    "facture montant paiement compte contrat client assurance impot"
+).split()
+
+# Number of values looked up with a single IN query, as some databases limit
+# the number of variables of a query
+QUERY_BATCH_SIZE = 500
+
+# Characters which OCR engines commonly confuse
+OCR_CONFUSIONS = {
+    "l": "1",
+    "o": "0",
+    "e": "c",
+    "i": "l",
+    "s": "5",
+    "b": "6",
+    "rn": "m",
+}
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """
+    Nearest-rank percentile of the given values
+    """
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(durations: list[float]) -> dict:
+    """
+    Latency statistics of the given durations, in milliseconds
+    """
+    if len(durations) == 0:
+        return {"count": 0}
+    return {
+        "count": len(durations),
+        "min_ms": min(durations) * 1000,
+        "p50_ms": percentile(durations, 50) * 1000,
+        "p95_ms": percentile(durations, 95) * 1000,
+        "max_ms": max(durations) * 1000,
+    }
+
+
+def directory_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+@contextmanager
+def temporary_index_dir(path: Path):
+    """
+    Points the index to the given directory within the context
+    """
+    index_dir = settings.INDEX_DIR
+    settings.INDEX_DIR = path
+    try:
+        yield
+    finally:
+        settings.INDEX_DIR = index_dir
+
+
+class SyntheticCorpus:
+    """
+    Generates documents with OCR-like content, tags, correspondents,
+    document types and permissions
+    """
+
+    def __init__(
+        self,
+        rng: random.Random,
+        *,
+        words_per_document: int,
+        tag_count: int,
+        user_count: int,
+        ocr_error_rate: float,
+    ):
+        self.rng = rng
+        self.words_per_document = words_per_document
+        self.tag_count = tag_count
+        self.user_count = user_count
+        self.ocr_error_rate = ocr_error_rate
+
+    def _word(self) -> str:
+        choice = self.rng.random()
+        if choice < 0.08:
+            return str(self.rng.randint(1, 99999))
+        elif choice < 0.1:
+            return (
+                f"{self.rng.randint(1, 28):02}.{self.rng.randint(1, 12):02}."
+                f"{self.rng.randint(1990, 2030)}"
+            )
+        elif choice < 0.12:
+            return f"{self.rng.randint(1, 9999)},{self.rng.randint(0, 99):02}"
+        word = self.rng.choice(VOCABULARY)
+        if self.rng.random() < self.ocr_error_rate:
+            original, confused = self.rng.choice(list(OCR_CONFUSIONS.items()))
+            word = word.replace(original, confused, 1)
+        return word
+
+    def content(self) -> str:
+        lines = []
+        words = [self._word() for _ in range(self.words_per_document)]
+        while len(words) > 0:
+            line_length = self.rng.randint(4, 14)
+            lines.append(" ".join(words[:line_length]))
+            words = words[line_length:]
+        return "\n".join(lines)
+
+    def create(self, document_count: int) -> list[Document]:
+        users = [
+            User.objects.create(username=f"benchmark_user_{i}")
+            for i in range(self.user_count)
+        ]
+        tags = [
+            Tag.objects.create(name=f"benchmark tag {i}") for i in range(self.tag_count)
+        ]
+        correspondents = [
+            Correspondent.objects.create(name=f"benchmark correspondent {i}")
+            for i in range(max(1, self.tag_count // 2))
+        ]
+        document_types = [
+            DocumentType.objects.create(name=f"benchmark type {i}")
+            for i in range(max(1, self.tag_count // 4))
+        ]
+
+        now = timezone.now()
+        documents = []
+        for i in range(document_count):
+            content = self.content()
+            documents.append(
+                Document(
+                    title=" ".join(self.rng.sample(VOCABULARY, 3)),
+                    content=content,
+                    checksum=hashlib.md5(f"{i}{content}".encode()).hexdigest(),
+                    mime_type="application/pdf",
+                    created=now - timedelta(days=self.rng.randint(0, 3650)),
+                    correspondent=self.rng.choice([*correspondents, None]),
+                    document_type=self.rng.choice([*document_types, None]),
+                    owner=self.rng.choice([*users, None]),
+                ),
+            )
+        Document.objects.bulk_create(documents)
+        # Not every database backend returns primary keys from bulk_create
+        checksums = [d.checksum for d in documents]
+        documents = []
+        for i in range(0, len(checksums), QUERY_BATCH_SIZE):
+            documents.extend(
+                Document.objects.filter(
+                    checksum__in=checksums[i : i + QUERY_BATCH_SIZE],
+                ),
+            )
+
+        tag_relations = []
+        for document in documents:
+            for tag in self.rng.sample(tags, min(len(tags), self.rng.randint(0, 3))):
+                tag_relations.append(
+                    Document.tags.through(document_id=document.pk, tag_id=tag.pk),
+                )
+        Document.tags.through.objects.bulk_create(tag_relations)
+
+        # Share roughly a quarter of the documents with another user
+        for user in users:
+            shared = [d.pk for d in documents if self.rng.random() < 0.25]
+            for i in range(0, len(shared), QUERY_BATCH_SIZE):
+                assign_perm(
+                    "view_document",
+                    user,
+                    Document.objects.filter(pk__in=shared[i : i + QUERY_BATCH_SIZE]),
+                )
+
+        return documents
+
+
+class Command(ProgressBarMixin, BaseCommand):
+    help = (
+        "Benchmarks indexing, full text search, autocomplete and more like this "
+        "against synthetic documents. All generated data is rolled back and a "
+        "temporary index is used, so this can be run against any database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[100, 1000],
+            help="Number of synthetic documents for each benchmark run",
+        )
+        parser.add_argument(
+            "--words-per-document",
+            type=int,
+            default=500,
+        )
+        parser.add_argument(
+            "--tags",
+            type=int,
+            default=20,
+            help="Number of tags to generate",
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=5,
+            help="Number of users to generate, owning and sharing documents",
+        )
+        parser.add_argument(
+            "--ocr-error-rate",
+            type=float,
+            default=0.05,
+            help="Share of words which get a simulated OCR error",
+        )
+        parser.add_argument(
+            "--queries",
+            type=int,
+            default=20,
+            help="Number of timed queries per operation",
+        )
+        parser.add_argument(
+            "--pages",
+            type=int,
+            default=3,
+            help="Number of result pages requested per full text query",
+        )
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=25,
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Seed for the generated documents and queries",
+        )
+        parser.add_argument(
+            "--output",
+            type=Path,
+            default=None,
+            help="File to write the JSON results to, defaults to stdout",
+        )
+        self.add_argument_progress_bar_mixin(parser)
+
+    def handle(self, *args, **options):
+        self.handle_progress_bar_mixin(**options)
+
+        if any(size < 1 for size in options["sizes"]):
+            raise CommandError("Sizes must be at least 1")
+
+        results = {
+            "parameters": {
+                key: options[key]
+                for key in (
+                    "words_per_document",
+                    "tags",
+                    "users",
+                    "ocr_error_rate",
+                    "queries",
+                    "pages",
+                    "page_size",
+                    "seed",
+                )
+            },
+            "runs": [self.run(size, **options) for size in options["sizes"]],
+        }
+
+        output = json.dumps(results, indent=2)
+        if options["output"] is not None:
+            options["output"].write_text(output)
+        else:
+            self.stdout.write(output)
+
+    def run(self, size: int, **options) -> dict:
+        rng = random.Random(options["seed"])
+        corpus = SyntheticCorpus(
+            rng,
+            words_per_document=options["words_per_document"],
+            tag_count=options["tags"],
+            user_count=options["users"],
+            ocr_error_rate=options["ocr_error_rate"],
+        )
+
+        with tempfile.TemporaryDirectory(
+            dir=settings.SCRATCH_DIR,
+        ) as index_dir, temporary_index_dir(Path(index_dir)), transaction.atomic():
+            start = time.perf_counter()
+            documents = corpus.create(size)
+            generate_seconds = time.perf_counter() - start
+
+            # index_reindex indexes every document in the database
+            indexed = Document.objects.count()
+            start = time.perf_counter()
+            index_reindex(progress_bar_disable=self.no_progress_bar)
+            index_seconds = time.perf_counter() - start
+
+            user = User.objects.filter(username__startswith="benchmark_").first()
+            result = {
+                "documents": size,
+                "indexed_documents": indexed,
+                "generate_seconds": generate_seconds,
+                "index_seconds": index_seconds,
+                "index_docs_per_second": indexed / index_seconds,
+                "index_size_bytes": directory_size(Path(index_dir)),
+                "full_text_query": self.time_full_text(rng, None, **options),
+                "full_text_query_user": self.time_full_text(rng, user, **options),
+                "autocomplete": self.time_autocomplete(rng, **options),
+                "more_like_this": self.time_more_like_this(
+                    rng,
+                    documents,
+                    **options,
+                ),
+            }
+
+            transaction.set_rollback(True)
+
+        return result
+
+    def time_full_text(self, rng: random.Random, user, **options) -> dict:
+        durations = []
+        page_size = options["page_size"]
+        with index.open_index_searcher() as searcher:
+            for _ in range(options["queries"]):
+                query = " ".join(rng.sample(VOCABULARY, rng.randint(1, 2)))
+                delayed_query = index.DelayedFullTextQuery(
+                    searcher,
+                    {"query": query},
+                    page_size,
+                    user,
+                )
+                for page in range(options["pages"]):
+                    start = time.perf_counter()
+                    len(delayed_query[page * page_size : (page + 1) * page_size])
+                    durations.append(time.perf_counter() - start)
+        return summarize(durations)
+
+    def time_autocomplete(self, rng: random.Random, **options) -> dict:
+        durations = []
+        ix = index.open_index()
+        try:
+            for _ in range(options["queries"]):
+                word = rng.choice(VOCABULARY)
+                start = time.perf_counter()
+                index.autocomplete(ix, word[: rng.randint(2, len(word))])
+                durations.append(time.perf_counter() - start)
+        finally:
+            ix.close()
+        return summarize(durations)
+
+    def time_more_like_this(
+        self,
+        rng: random.Random,
+        documents: list[Document],
+        **options,
+    ) -> dict:
+        durations = []
+        page_size = options["page_size"]
+        with index.open_index_searcher() as searcher:
+            for _ in range(options["queries"]):
+                delayed_query = index.DelayedMoreLikeThisQuery(
+                    searcher,
+                    {"more_like_id": str(rng.choice(documents).pk)},
+                    page_size,
+                    None,
+                )
+                start = time.perf_counter()
+                len(delayed_query[0:page_size])
+                durations.append(time.perf_counter() - start)
+        return summarize(durations)
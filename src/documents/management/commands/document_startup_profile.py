@@ -0,0 +1,199 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Final
+
+from django.conf import settings
+from django.core.management import CommandError
+from django.core.management.base import BaseCommand
+
+from documents.workers import HEAVY_MODULES
+
+SETUP: Final[str] = (
+    "import os\n"
+    "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'paperless.settings')\n"
+    "import django\n"
+    "django.setup()\n"
+)
+
+# What each kind of process imports before it can do any work
+TARGETS: Final[dict[str, str]] = {
+    "manage": SETUP
+    + ("from django.core.management import get_commands\nget_commands()\n"),
+    "worker": SETUP
+    + (
+        "from django.apps import apps\n"
+        "from paperless.celery import app\n"
+        "app.loader.autodiscover_tasks([c.name for c in apps.get_app_configs()])\n"
+    ),
+    "web": SETUP + "import paperless.urls\n",
+}
+
+IMPORT_TIME_REGEX: Final = re.compile(
+    r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$",
+)
+
+
+def parse_import_times(output: str) -> list[dict]:
+    """
+    Parses the output of python -X importtime into the self and cumulative
+    import time of every module, in microseconds
+    """
+    modules = []
+    for line in output.splitlines():
+        match = IMPORT_TIME_REGEX.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        modules.append(
+            {
+                "module": name,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                # Imported directly by the script, not by another module
+                "top_level": len(indent) == 1,
+            },
+        )
+    return modules
+
+
+def profile_target(target: str) -> tuple[float, list[dict]]:
+    """
+    Starts a new interpreter importing what the target imports.  Returns the
+    seconds it took in total and the import times of the modules
+    """
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", TARGETS[target]],
+        cwd=settings.BASE_DIR,
+        env=os.environ.copy(),
+        capture_output=True,
+        text=True,
+    )
+    wall_seconds = time.perf_counter() - start
+    if process.returncode != 0:
+        raise CommandError(
+            f"Starting {target} failed: {process.stderr.splitlines()[-1:]}",
+        )
+    return wall_seconds, parse_import_times(process.stderr)
+
+
+def _round_ms(microseconds: int) -> float:
+    return round(microseconds / 1000, 2)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures how long starting management commands, the workers and the "
+        "web server takes and which modules take the longest to import."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--targets",
+            nargs="+",
+            choices=list(TARGETS),
+            default=list(TARGETS),
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Number of starts per target, the fastest one is reported",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=20,
+            help="Number of slowest modules to report",
+        )
+        parser.add_argument(
+            "--budget",
+            type=float,
+            default=None,
+            help="Fail if starting any target takes more seconds than this",
+        )
+        parser.add_argument(
+            "--output",
+            type=Path,
+            default=None,
+            help="File to write the JSON results to, defaults to stdout",
+        )
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("At least 1 repetition is required")
+
+        results = {}
+        for target in options["targets"]:
+            runs = [profile_target(target) for _ in range(options["repeat"])]
+            wall_seconds, modules = min(runs, key=lambda run: run[0])
+            imported = {module["module"] for module in modules}
+
+            by_cumulative = sorted(
+                modules,
+                key=lambda module: module["cumulative_us"],
+                reverse=True,
+            )
+            by_self = sorted(
+                modules,
+                key=lambda module: module["self_us"],
+                reverse=True,
+            )
+            results[target] = {
+                "wall_seconds": round(wall_seconds, 4),
+                "import_seconds": round(
+                    sum(m["cumulative_us"] for m in modules if m["top_level"]) / 1e6,
+                    4,
+                ),
+                "modules": len(modules),
+                "top_cumulative": [
+                    {
+                        "module": module["module"],
+                        "cumulative_ms": _round_ms(module["cumulative_us"]),
+                        "self_ms": _round_ms(module["self_us"]),
+                    }
+                    for module in by_cumulative[: options["top"]]
+                ],
+                "top_self": [
+                    {
+                        "module": module["module"],
+                        "self_ms": _round_ms(module["self_us"]),
+                    }
+                    for module in by_self[: options["top"]]
+                ],
+                # Libraries which are only needed once there is work to do
+                "heavy_packages": sorted(
+                    {
+                        name.split(".")[0]
+                        for name in HEAVY_MODULES
+                        if name.split(".")[0] in imported
+                    },
+                ),
+            }
+
+        output = json.dumps(
+            {"parameters": {"repeat": options["repeat"]}, "targets": results},
+            indent=2,
+        )
+        if options["output"] is not None:
+            options["output"].write_text(output)
+        else:
+            self.stdout.write(output)
+
+        budget = options["budget"]
+        if budget is not None:
+            over_budget = [
+                f"{target} ({result['wall_seconds']:.2f}s)"
+                for target, result in results.items()
+                if result["wall_seconds"] > budget
+            ]
+            if over_budget:
+                raise CommandError(
+                    f"Starting {', '.join(over_budget)} took longer than "
+                    f"{budget:.2f}s",
+                )
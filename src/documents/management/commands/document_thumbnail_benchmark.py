@@ -0,0 +1,110 @@
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management import CommandError
+from django.core.management.base import BaseCommand
+
+from documents.management.commands.document_search_benchmark import summarize
+from documents.models import Document
+from documents.parsers import ParseError
+from documents.parsers import make_thumbnail_from_pdf_convert
+from documents.parsers import make_thumbnail_from_pdf_gs
+
+RENDERERS = {
+    "convert": make_thumbnail_from_pdf_convert,
+    "ghostscript": make_thumbnail_from_pdf_gs,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks rendering the thumbnails of PDF files with ImageMagick "
+        "convert and with a single Ghostscript run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths",
+            nargs="*",
+            type=Path,
+            help="PDF files to render, defaults to the files of stored documents",
+        )
+        parser.add_argument(
+            "--documents",
+            type=int,
+            default=20,
+            help="Number of stored documents to use if no files are given",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Number of times each file is rendered by each renderer",
+        )
+        parser.add_argument(
+            "--output",
+            type=Path,
+            default=None,
+            help="File to write the JSON results to, defaults to stdout",
+        )
+
+    def _stored_files(self, count: int) -> list[Path]:
+        files = []
+        for document in Document.objects.order_by("-pk")[:count]:
+            if document.has_archive_version:
+                files.append(document.archive_path)
+            elif document.mime_type == "application/pdf":
+                files.append(document.source_path)
+        return files
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("At least 1 repetition is required")
+
+        files = options["paths"] or self._stored_files(options["documents"])
+        if not files:
+            raise CommandError("There are no PDF files to render")
+
+        durations = {name: [] for name in RENDERERS}
+        sizes = {name: [] for name in RENDERERS}
+        failures = {name: 0 for name in RENDERERS}
+        for path in files:
+            for name, render in RENDERERS.items():
+                for _ in range(options["repeat"]):
+                    with tempfile.TemporaryDirectory() as temp_dir:
+                        start = time.perf_counter()
+                        try:
+                            thumbnail = render(path, temp_dir)
+                        except ParseError:
+                            failures[name] += 1
+                            continue
+                        durations[name].append(time.perf_counter() - start)
+                        sizes[name].append(Path(thumbnail).stat().st_size)
+
+        results = {
+            "parameters": {
+                "files": len(files),
+                "repeat": options["repeat"],
+            },
+        }
+        for name in RENDERERS:
+            results[name] = {
+                **summarize(durations[name]),
+                "failures": failures[name],
+                "mean_bytes": (
+                    sum(sizes[name]) / len(sizes[name]) if sizes[name] else None
+                ),
+            }
+        if durations["convert"] and durations["ghostscript"]:
+            results["speedup_p50"] = results["convert"]["p50_ms"] / max(
+                results["ghostscript"]["p50_ms"],
+                1e-6,
+            )
+
+        output = json.dumps(results, indent=2)
+        if options["output"] is not None:
+            options["output"].write_text(output)
+        else:
+            self.stdout.write(output)
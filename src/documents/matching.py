@@ -1,6 +1,9 @@
 import logging
 import re
+from contextlib import contextmanager
+from contextvars import ContextVar
 from fnmatch import fnmatch
+from typing import Optional
 from typing import Union
 
 from documents.classifier import DocumentClassifier
@@ -33,20 +36,59 @@ def log_reason(
     )
 
 
+# Matching models loaded once per model and user, while shared
+_shared_models: ContextVar[Optional[dict]] = ContextVar(
+    "shared_matching_models",
+    default=None,
+)
+
+
+@contextmanager
+def shared_matching_models():
+    """
+    Within the context, the models to match against are loaded from the
+    database only once and shared by all documents.  Meant for consuming
+    many documents in a row, during which the models don't change
+    """
+    if _shared_models.get() is not None:
+        yield
+        return
+
+    token = _shared_models.set({})
+    try:
+        yield
+    finally:
+        _shared_models.reset(token)
+
+
+def _matching_models(model: type[MatchingModel], permission: str, user=None):
+    shared = _shared_models.get()
+    key = (model, user.pk if user is not None else None)
+    if shared is not None and key in shared:
+        return shared[key]
+
+    if user is not None:
+        models = get_objects_for_user_owner_aware(user, permission, model)
+    else:
+        models = model.objects.all()
+
+    if shared is not None:
+        shared[key] = list(models)
+        return shared[key]
+    return models
+
+
 def match_correspondents(document: Document, classifier: DocumentClassifier, user=None):
     pred_id = classifier.predict_correspondent(document.content) if classifier else None
 
     if user is None and document.owner is not None:
         user = document.owner
 
-    if user is not None:
-        correspondents = get_objects_for_user_owner_aware(
-            user,
-            "documents.view_correspondent",
-            Correspondent,
-        )
-    else:
-        correspondents = Correspondent.objects.all()
+    correspondents = _matching_models(
+        Correspondent,
+        "documents.view_correspondent",
+        user,
+    )
 
     return list(
         filter(
@@ -63,14 +105,7 @@ def match_document_types(document: Document, classifier: DocumentClassifier, use
     if user is None and document.owner is not None:
         user = document.owner
 
-    if user is not None:
-        document_types = get_objects_for_user_owner_aware(
-            user,
-            "documents.view_documenttype",
-            DocumentType,
-        )
-    else:
-        document_types = DocumentType.objects.all()
+    document_types = _matching_models(DocumentType, "documents.view_documenttype", user)
 
     return list(
         filter(
@@ -87,10 +122,7 @@ def match_tags(document: Document, classifier: DocumentClassifier, user=None):
     if user is None and document.owner is not None:
         user = document.owner
 
-    if user is not None:
-        tags = get_objects_for_user_owner_aware(user, "documents.view_tag", Tag)
-    else:
-        tags = Tag.objects.all()
+    tags = _matching_models(Tag, "documents.view_tag", user)
 
     return list(
         filter(
@@ -110,14 +142,7 @@ def match_storage_paths(document: Document, classifier: DocumentClassifier, user
     if user is None and document.owner is not None:
         user = document.owner
 
-    if user is not None:
-        storage_paths = get_objects_for_user_owner_aware(
-            user,
-            "documents.view_storagepath",
-            StoragePath,
-        )
-    else:
-        storage_paths = StoragePath.objects.all()
+    storage_paths = _matching_models(StoragePath, "documents.view_storagepath", user)
 
     return list(
         filter(
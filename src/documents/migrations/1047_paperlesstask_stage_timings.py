@@ -0,0 +1,23 @@
+# Generated by Django 4.2.11 on 2026-10-19 10:12
+
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("documents", "1046_workflowaction_remove_all_correspondents_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="paperlesstask",
+            name="stage_timings",
+            field=models.JSONField(
+                default=None,
+                help_text="Duration in seconds and processed bytes of each stage of consumption",
+                null=True,
+                verbose_name="Stage Timings",
+            ),
+        ),
+    ]
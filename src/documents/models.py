@@ -643,6 +643,14 @@ class PaperlessTask(models.Model):
             "The data returned by the task",
         ),
     )
+    stage_timings = models.JSONField(
+        null=True,
+        default=None,
+        verbose_name=_("Stage Timings"),
+        help_text=_(
+            "Duration in seconds and processed bytes of each stage of consumption",
+        ),
+    )
 
     def __str__(self) -> str:
         return f"Task {self.task_id}"
@@ -0,0 +1,223 @@
+"""
+Content addressed cache of OCR results.
+
+An entry holds the sidecar text and optionally the archive file OCR produced
+for an input file with certain parameters.  It is found by the checksum of
+the input file together with these parameters, so consuming the same file
+again or re-creating an archive file with unchanged settings skips OCR.
+
+Entries are directories below OCR_CACHE_DIR.  Using an entry updates its
+modification time.  Every OCR_CACHE_EVICT_INTERVAL new entries, the least
+recently used entries are removed if the cache grew beyond OCR_CACHE_SIZE.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Final
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from documents.utils import compute_checksum
+from documents.utils import place_file
+
+logger = logging.getLogger("paperless.ocr_cache")
+
+OCR_CACHE_HITS_KEY: Final[str] = "ocr_cache_hits"
+OCR_CACHE_MISSES_KEY: Final[str] = "ocr_cache_misses"
+
+OCR_CACHE_EVICT_INTERVAL: Final[int] = 10
+OCR_CACHE_NEW_ENTRIES_KEY: Final[str] = "ocr_cache_new_entries"
+
+SIDECAR_NAME: Final[str] = "sidecar.txt"
+ARCHIVE_NAME: Final[str] = "archive.pdf"
+
+# Parameters which don't change the result, like the location of the files
+IGNORED_PARAMETERS: Final[frozenset[str]] = frozenset(
+    {
+        "input_file",
+        "output_file",
+        "sidecar",
+        "use_threads",
+        "jobs",
+        "progress_bar",
+    },
+)
+
+
+def get_ocr_cache_key(
+    document_path: Path,
+    parameters: dict,
+    checksum: Optional[str] = None,
+) -> str:
+    """
+    Returns the key of the OCR result of the document with the given
+    parameters
+    """
+    import ocrmypdf
+
+    parameters = {
+        name: value
+        for name, value in parameters.items()
+        if name not in IGNORED_PARAMETERS
+    }
+    key_data = json.dumps(
+        {
+            "checksum": checksum or compute_checksum(document_path),
+            "parameters": parameters,
+            # Results of different versions might differ
+            "ocrmypdf": ocrmypdf.__version__,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(key_data.encode()).hexdigest()
+
+
+def _count(key: str) -> None:
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:  # pragma: no cover
+        pass
+
+
+def get_ocr_cache_statistics() -> dict[str, int]:
+    return {
+        "hits": cache.get(OCR_CACHE_HITS_KEY, 0),
+        "misses": cache.get(OCR_CACHE_MISSES_KEY, 0),
+    }
+
+
+class OcrCache:
+    def __init__(self, directory: Path, max_size: int) -> None:
+        self.directory = Path(directory)
+        self.max_size = max_size
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def restore(
+        self,
+        key: str,
+        sidecar_file: Path,
+        archive_file: Path,
+        *,
+        require_archive: bool,
+    ) -> bool:
+        """
+        Copies the cached OCR results to the given files.  Returns False if
+        there is no usable entry
+        """
+        entry_dir = self._entry_dir(key)
+        cached_sidecar = entry_dir / SIDECAR_NAME
+        cached_archive = entry_dir / ARCHIVE_NAME
+
+        if require_archive:
+            usable = cached_archive.is_file()
+        else:
+            # The text can also be extracted from the archive file
+            usable = cached_sidecar.is_file() or cached_archive.is_file()
+        try:
+            if usable:
+                if cached_sidecar.is_file():
+                    place_file(cached_sidecar, sidecar_file)
+                if cached_archive.is_file():
+                    place_file(cached_archive, archive_file)
+                os.utime(entry_dir)
+        except FileNotFoundError:
+            # Evicted by another worker just now
+            usable = False
+
+        _count(OCR_CACHE_HITS_KEY if usable else OCR_CACHE_MISSES_KEY)
+        logger.debug(f"OCR cache {'hit' if usable else 'miss'} for {key}")
+        return usable
+
+    def store(
+        self,
+        key: str,
+        sidecar_file: Path,
+        archive_file: Optional[Path],
+    ) -> None:
+        """
+        Stores the OCR results in the cache, replacing an existing entry
+        """
+        files = [
+            (path, name)
+            for path, name in [
+                (sidecar_file, SIDECAR_NAME),
+                (archive_file, ARCHIVE_NAME),
+            ]
+            if path is not None and os.path.isfile(path)
+        ]
+        if not files:
+            return
+
+        entry_dir = self._entry_dir(key)
+        entry_dir.parent.mkdir(parents=True, exist_ok=True)
+        # Entries appear completely or not at all, for concurrent workers
+        new_entry_dir = Path(tempfile.mkdtemp(prefix=".new-", dir=entry_dir.parent))
+        for path, name in files:
+            place_file(path, new_entry_dir / name)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        try:
+            new_entry_dir.rename(entry_dir)
+        except OSError:
+            # Stored by another worker at the same time
+            shutil.rmtree(new_entry_dir, ignore_errors=True)
+
+        self.count_new_entry()
+
+    def count_new_entry(self) -> None:
+        """
+        Counts a new entry, and evicts entries once every
+        OCR_CACHE_EVICT_INTERVAL new entries
+        """
+        cache.add(OCR_CACHE_NEW_ENTRIES_KEY, 0, None)
+        try:
+            new_entries = cache.incr(OCR_CACHE_NEW_ENTRIES_KEY)
+        except ValueError:
+            # The counter was removed in the meantime
+            new_entries = 0
+        if new_entries >= OCR_CACHE_EVICT_INTERVAL:
+            cache.set(OCR_CACHE_NEW_ENTRIES_KEY, 0, None)
+            self.evict()
+
+    def evict(self) -> None:
+        """
+        Removes the least recently used entries until the cache fits into
+        its maximum size
+        """
+        entries = []
+        total_size = 0
+        for entry_dir in self.directory.glob("*/*"):
+            if entry_dir.name.startswith("."):
+                continue
+            try:
+                size = sum(f.stat().st_size for f in entry_dir.iterdir())
+                entries.append((entry_dir.stat().st_mtime, size, entry_dir))
+            except FileNotFoundError:
+                continue
+            total_size += size
+
+        for _, size, entry_dir in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            logger.debug(f"Removing OCR cache entry {entry_dir.name}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_size -= size
+
+
+def get_ocr_cache() -> Optional[OcrCache]:
+    """
+    Returns the OCR cache, if it is enabled
+    """
+    if settings.OCR_CACHE_SIZE <= 0:
+        return None
+    return OcrCache(settings.OCR_CACHE_DIR, settings.OCR_CACHE_SIZE * 1024 * 1024)
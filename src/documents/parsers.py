@@ -6,6 +6,7 @@ import re
 import shutil
 import subprocess
 import tempfile
+import zoneinfo
 from collections.abc import Iterator
 from functools import lru_cache
 from pathlib import Path
@@ -18,6 +19,7 @@ from django.utils import timezone
 from documents.loggers import LoggingMixin
 from documents.signals import document_consumer_declaration
 from documents.utils import copy_file_with_basic_stats
+from documents.utils import maybe_override_pixel_limit
 
 # This regular expression will try to find dates in the document at
 # hand and will match the following formats:
@@ -45,6 +47,21 @@ DATE_REGEX = re.compile(
     r"(\b|(?!=([_-])))(\b[0-9]{1,2}[ \.\/-][a-zA-Z]{3}[ \.\/-][0-9]{4})(\b|(?=([_-])))",
 )
 
+# Dates matched by the first two alternatives of DATE_REGEX, consisting only
+# of numbers, with the same separator between all of them
+NUMERIC_DATE_REGEX = re.compile(r"^([0-9]{1,4})([\.\/-])([0-9]{1,2})\2([0-9]{1,4})$")
+
+# Maximum depth of the page tree of a PDF which is searched for inherited
+# attributes
+PAGE_TREE_MAX_DEPTH = 32
+
+# Returned for dates which must be parsed by dateparser
+_NOT_NUMERIC = object()
+
+# Date orders for which numeric dates are parsed without dateparser, it
+# places the year in its own way for the others
+NUMERIC_DATE_ORDERS = ("DMY", "MDY", "YMD", "MYD")
+
 
 logger = logging.getLogger("paperless.parsing")
 
@@ -175,6 +192,11 @@ def get_default_thumbnail() -> Path:
     return (Path(__file__).parent / "resources" / "document.webp").resolve()
 
 
+# The size of thumbnails
+THUMBNAIL_WIDTH = 500
+THUMBNAIL_MAX_HEIGHT = 5000
+
+
 def make_thumbnail_from_pdf_gs_fallback(in_path, temp_dir, logging_group=None) -> str:
     out_path = os.path.join(temp_dir, "convert_gs.webp")
 
@@ -216,26 +238,127 @@ def make_thumbnail_from_pdf_gs_fallback(in_path, temp_dir, logging_group=None) -
         return default_thumbnail_path
 
 
-def make_thumbnail_from_pdf(in_path, temp_dir, logging_group=None) -> str:
+def _get_inherited_attribute(page_obj, name: str, default):
     """
-    The thumbnail of a PDF is just a 500px wide image of the first page.
+    Returns an attribute of a page, which may be inherited from the nodes of
+    the page tree above it
     """
+    node = page_obj
+    # Malformed page trees may have cycles
+    for _ in range(PAGE_TREE_MAX_DEPTH):
+        if name in node:
+            return node[name]
+        if "/Parent" not in node:
+            break
+        node = node.Parent
+    return default
+
+
+def make_thumbnail_from_pdf_gs(
+    in_path,
+    temp_dir,
+    logging_group=None,
+    width: int = THUMBNAIL_WIDTH,
+) -> str:
+    """
+    Renders only the first page with a single Ghostscript run, at the
+    resolution which results in an image of the given width, 500px by
+    default, and encodes it as WebP without ImageMagick.
+    """
+    import pikepdf
+    from PIL import Image
+
+    try:
+        with pikepdf.Pdf.open(in_path) as pdf:
+            page = pdf.pages[0]
+            left, bottom, right, top = (float(value) for value in page.cropbox)
+            rotate = int(_get_inherited_attribute(page.obj, "/Rotate", 0))
+    except (pikepdf.PdfError, IndexError, TypeError, ValueError) as err:
+        raise ParseError(f"Unable to read the first page of {in_path}: {err}")
+
+    page_width, page_height = abs(right - left), abs(top - bottom)
+    if page_width == 0 or page_height == 0:
+        raise ParseError(f"The first page of {in_path} has no size")
+    if rotate % 180:
+        page_width, page_height = page_height, page_width
+    # Like convert at 300 DPI scaled to at most 500x5000, sizes are in points
+    max_height = width * THUMBNAIL_MAX_HEIGHT // THUMBNAIL_WIDTH
+    density = min(300, width * 72 / page_width, max_height * 72 / page_height)
+
+    # Ghostscript doesn't handle WebP outputs
+    gs_out_path = os.path.join(temp_dir, "gs_thumbnail.png")
+    cmd = [
+        settings.GS_BINARY,
+        "-q",
+        "-dSAFER",
+        "-dBATCH",
+        "-dNOPAUSE",
+        "-sDEVICE=png16m",
+        "-dUseCropBox",
+        "-dFirstPage=1",
+        "-dLastPage=1",
+        "-dTextAlphaBits=4",
+        "-dGraphicsAlphaBits=4",
+        f"-r{density:.3f}",
+        "-o",
+        gs_out_path,
+        str(in_path),
+    ]
+    logger.debug("Execute: " + " ".join(cmd), extra={"group": logging_group})
+    try:
+        if not subprocess.run(cmd).returncode == 0:
+            raise ParseError(f"Thumbnail (gs) failed at {cmd}")
+    except OSError as err:
+        raise ParseError(f"Thumbnail (gs) failed at {cmd}: {err}")
+
+    out_path = os.path.join(temp_dir, "gs.webp")
+    maybe_override_pixel_limit()
+    try:
+        with Image.open(gs_out_path) as image:
+            image = image.convert("RGB")
+            # The resolution is rounded, never be wider than requested
+            image.thumbnail((width, max_height))
+            image.save(out_path, "WEBP")
+    except OSError as err:
+        raise ParseError(f"Unable to encode thumbnail: {err}")
+
+    return out_path
+
+
+def make_thumbnail_from_pdf_convert(in_path, temp_dir, logging_group=None) -> str:
     out_path = os.path.join(temp_dir, "convert.webp")
 
     # Run convert to get a decent thumbnail
+    run_convert(
+        density=300,
+        scale="500x5000>",
+        alpha="remove",
+        strip=True,
+        trim=False,
+        auto_orient=True,
+        use_cropbox=True,
+        input_file=f"{in_path}[0]",
+        output_file=out_path,
+        logging_group=logging_group,
+    )
+    return out_path
+
+
+def make_thumbnail_from_pdf(in_path, temp_dir, logging_group=None) -> str:
+    """
+    The thumbnail of a PDF is just a 500px wide image of the first page.
+    """
+    if settings.THUMBNAIL_RENDERER == "ghostscript":
+        try:
+            return make_thumbnail_from_pdf_gs(in_path, temp_dir, logging_group)
+        except ParseError as e:
+            logger.warning(
+                f"Unable to make thumbnail with ghostscript, using convert: {e}",
+                extra={"group": logging_group},
+            )
+
     try:
-        run_convert(
-            density=300,
-            scale="500x5000>",
-            alpha="remove",
-            strip=True,
-            trim=False,
-            auto_orient=True,
-            use_cropbox=True,
-            input_file=f"{in_path}[0]",
-            output_file=out_path,
-            logging_group=logging_group,
-        )
+        out_path = make_thumbnail_from_pdf_convert(in_path, temp_dir, logging_group)
     except ParseError as e:
         logger.error(f"Unable to make thumbnail with convert: {e}")
         out_path = make_thumbnail_from_pdf_gs_fallback(in_path, temp_dir, logging_group)
@@ -247,6 +370,57 @@ def parse_date(filename, text) -> Optional[datetime.datetime]:
     return next(parse_date_generator(filename, text), None)
 
 
+def _parse_numeric_date(date_string: str, date_order: str):
+    """
+    Parses numeric dates with a 4 digit year, like 24.03.2022 or 2022-03-24,
+    and rejects numbers which can't be a date, without dateparser.  Returns
+    the same result as dateparser would, or _NOT_NUMERIC for all other dates
+    and for date orders not in NUMERIC_DATE_ORDERS
+    """
+    if date_order not in NUMERIC_DATE_ORDERS:
+        return _NOT_NUMERIC
+    match = NUMERIC_DATE_REGEX.match(date_string)
+    if match is None:
+        return _NOT_NUMERIC
+    first, _, second, third = match.groups()
+    numbers = [int(first), int(second), int(third)]
+    if 0 in numbers:
+        # dateparser treats a zero part in odd ways
+        return _NOT_NUMERIC
+    if not any(number <= 12 for number in numbers) or (
+        sum(number <= 31 for number in numbers) < 2
+    ):
+        # There is no month or no day, like in many other numbers
+        return None
+
+    if len(first) == 4:
+        year, day_and_month = numbers[0], numbers[1:]
+    elif len(third) == 4 and date_order != "YMD":
+        year, day_and_month = numbers[2], numbers[:2]
+    else:
+        # dateparser guesses which part is the year here
+        return _NOT_NUMERIC
+
+    # The year is placed according to the number of digits, the day and the
+    # month keep their order
+    parts = dict(zip(date_order.replace("Y", ""), day_and_month))
+    candidates = [(parts["M"], parts["D"])]
+    if date_order != "DMY":
+        # Like dateparser, try swapping an impossible month with the day
+        candidates.append((parts["D"], parts["M"]))
+    for month, day in candidates:
+        try:
+            return datetime.datetime(
+                year,
+                month,
+                day,
+                tzinfo=zoneinfo.ZoneInfo(settings.TIME_ZONE),
+            )
+        except ValueError:
+            pass
+    return None
+
+
 def parse_date_generator(filename, text) -> Iterator[datetime.datetime]:
     """
     Returns the date of the document.
@@ -284,11 +458,13 @@ def parse_date_generator(filename, text) -> Iterator[datetime.datetime]:
     ) -> Optional[datetime.datetime]:
         date_string = match.group(0)
 
-        try:
-            date = __parser(date_string, date_order)
-        except Exception:
-            # Skip all matches that do not parse to a proper date
-            date = None
+        date = _parse_numeric_date(date_string, date_order)
+        if date is _NOT_NUMERIC:
+            try:
+                date = __parser(date_string, date_order)
+            except Exception:
+                # Skip all matches that do not parse to a proper date
+                date = None
 
         return __filter(date)
 
@@ -302,6 +478,10 @@ def parse_date_generator(filename, text) -> Iterator[datetime.datetime]:
     if settings.FILENAME_DATE_ORDER:
         yield from __process_content(filename, settings.FILENAME_DATE_ORDER)
 
+    # Dates are usually found at the start of long documents
+    if settings.DATE_PARSER_SCAN_LIMIT > 0:
+        text = text[: settings.DATE_PARSER_SCAN_LIMIT]
+
     # Iterate through all regex matches in text and try to parse the date
     yield from __process_content(text, settings.DATE_ORDER)
 
@@ -331,6 +511,8 @@ class DocumentParser(LoggingMixin):
         self.text = None
         self.date: Optional[datetime.datetime] = None
         self.progress_callback = progress_callback
+        # The checksum of the document to parse, if the caller knows it
+        self.checksum: Optional[str] = None
 
     def progress(self, current_progress, max_progress):
         if self.progress_callback:
@@ -369,6 +551,22 @@ class DocumentParser(LoggingMixin):
         """
         raise NotImplementedError
 
+    def thumbnail_depends_on_parse(self, mime_type) -> bool:
+        """
+        Returns whether get_thumbnail needs the results of parse.  If it
+        doesn't, the consumer generates the thumbnail while the document is
+        parsed.
+        """
+        return True
+
+    def get_text_layer(self, document_path, mime_type) -> Optional[str]:
+        """
+        Returns text of the original document which can be extracted cheaply,
+        such as the text layer of a PDF, or None.  The consumer looks for the
+        document date in it while the document is parsed.
+        """
+        return None
+
     def get_text(self):
         return self.text
 
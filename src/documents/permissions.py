@@ -1,16 +1,20 @@
+from typing import Union
+
 from django.contrib.auth.models import Group
 from django.contrib.auth.models import Permission
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
 from guardian.core import ObjectPermissionChecker
 from guardian.models import GroupObjectPermission
-from guardian.shortcuts import assign_perm
+from guardian.models import UserObjectPermission
 from guardian.shortcuts import get_objects_for_user
-from guardian.shortcuts import get_users_with_perms
-from guardian.shortcuts import remove_perm
 from rest_framework.permissions import BasePermission
 from rest_framework.permissions import DjangoObjectPermissions
 
+# Maximum number of object permissions created with one query
+PERMISSION_BATCH_SIZE = 1000
+
 
 class PaperlessObjectPermissions(DjangoObjectPermissions):
     """
@@ -66,60 +70,109 @@ def set_permissions_for_object(permissions: list[str], object, merge: bool = Fal
     no users or groups are removed. If False, the permissions are set to exactly
     the given list of users and groups.
     """
+    set_permissions_for_objects(permissions, [object], merge=merge)
+
+
+def _set_object_permissions(
+    model: Union[type[UserObjectPermission], type[GroupObjectPermission]],
+    principal_field: str,
+    principal_ids: set[int],
+    permission: Permission,
+    implied_permissions: list[Permission],
+    content_type: ContentType,
+    object_pks: list[str],
+    merge: bool,
+) -> None:
+    """
+    Gives the users or groups the permission for all objects, along with the
+    permissions it implies.  Unless merging, all others lose the permission
+    """
+    rows = model.objects.filter(content_type=content_type, object_pk__in=object_pks)
+    if not merge:
+        rows.filter(permission=permission).exclude(
+            **{f"{principal_field}__in": principal_ids},
+        ).delete()
+    if not principal_ids:
+        return
+
+    for granted in [permission, *implied_permissions]:
+        existing = set(
+            rows.filter(
+                permission=granted,
+                **{f"{principal_field}__in": principal_ids},
+            ).values_list("object_pk", principal_field),
+        )
+        model.objects.bulk_create(
+            [
+                model(
+                    content_type=content_type,
+                    permission=granted,
+                    object_pk=object_pk,
+                    **{principal_field: principal_id},
+                )
+                for object_pk in object_pks
+                for principal_id in principal_ids
+                if (object_pk, principal_id) not in existing
+            ],
+            batch_size=PERMISSION_BATCH_SIZE,
+        )
 
-    for action in permissions:
-        permission = f"{action}_{object.__class__.__name__.lower()}"
-        # users
-        users_to_add = User.objects.filter(id__in=permissions[action]["users"])
-        users_to_remove = (
-            get_users_with_perms(
-                object,
-                only_with_perms_in=[permission],
-                with_group_users=False,
-            )
-            if not merge
-            else User.objects.none()
+
+def set_permissions_for_objects(permissions: dict, objects, merge: bool = False):
+    """
+    Sets the permissions of many objects of the same model at once, like
+    set_permissions_for_object does for one.  The changed permissions are
+    computed and written for all objects with a few queries per action,
+    inside one transaction
+    """
+    objects = list(objects)
+    if not objects:
+        return
+
+    model_name = objects[0].__class__.__name__.lower()
+    content_type = ContentType.objects.get_for_model(objects[0])
+    codenames = [f"{action}_{model_name}" for action in [*permissions, "view"]]
+    permission_objects = {
+        permission.codename: permission
+        for permission in Permission.objects.filter(
+            content_type=content_type,
+            codename__in=codenames,
         )
-        if len(users_to_add) > 0 and len(users_to_remove) > 0:
-            users_to_remove = users_to_remove.exclude(id__in=users_to_add)
-        if len(users_to_remove) > 0:
-            for user in users_to_remove:
-                remove_perm(permission, user, object)
-        if len(users_to_add) > 0:
-            for user in users_to_add:
-                assign_perm(permission, user, object)
-                if action == "change":
-                    # change gives view too
-                    assign_perm(
-                        f"view_{object.__class__.__name__.lower()}",
-                        user,
-                        object,
-                    )
-        # groups
-        groups_to_add = Group.objects.filter(id__in=permissions[action]["groups"])
-        groups_to_remove = (
-            get_groups_with_only_permission(
-                object,
-                permission,
+    }
+    object_pks = [str(obj.pk) for obj in objects]
+
+    with transaction.atomic():
+        for action in permissions:
+            permission = permission_objects[f"{action}_{model_name}"]
+            # change gives view too
+            implied_permissions = (
+                [permission_objects[f"view_{model_name}"]] if action == "change" else []
             )
-            if not merge
-            else Group.objects.none()
-        )
-        if len(groups_to_add) > 0 and len(groups_to_remove) > 0:
-            groups_to_remove = groups_to_remove.exclude(id__in=groups_to_add)
-        if len(groups_to_remove) > 0:
-            for group in groups_to_remove:
-                remove_perm(permission, group, object)
-        if len(groups_to_add) > 0:
-            for group in groups_to_add:
-                assign_perm(permission, group, object)
-                if action == "change":
-                    # change gives view too
-                    assign_perm(
-                        f"view_{object.__class__.__name__.lower()}",
-                        group,
-                        object,
-                    )
+            for model, principal_model, principal_field, principals in [
+                (UserObjectPermission, User, "user_id", permissions[action]["users"]),
+                (
+                    GroupObjectPermission,
+                    Group,
+                    "group_id",
+                    permissions[action]["groups"],
+                ),
+            ]:
+                principal_ids = set(
+                    principal_model.objects.filter(id__in=principals).values_list(
+                        "id",
+                        flat=True,
+                    ),
+                )
+                _set_object_permissions(
+                    model,
+                    principal_field,
+                    principal_ids,
+                    permission,
+                    implied_permissions,
+                    content_type,
+                    object_pks,
+                    merge,
+                )
 
 
 def get_objects_for_user_owner_aware(user, perms, Model):
@@ -1,9 +1,12 @@
+import asyncio
 import enum
+import threading
+import time
 from typing import TYPE_CHECKING
+from typing import Final
 from typing import Optional
 from typing import Union
 
-from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 
 if TYPE_CHECKING:
@@ -17,15 +20,33 @@ class ProgressStatusOptions(str, enum.Enum):
     FAILED = "FAILED"
 
 
+# Progress of a task is only published if it changed by at least this many
+# percent or this many seconds passed since the last update.  Changes of the
+# status or message are always published
+PROGRESS_MIN_STEP: Final[int] = 5
+PROGRESS_MIN_INTERVAL: Final[float] = 1.0
+
+
 class ProgressManager:
     """
     Handles sending of progress information via the channel layer, with proper management
-    of the open/close of the layer to ensure messages go out and everything is cleaned up
+    of the open/close of the layer to ensure messages go out and everything is cleaned up.
+
+    Frequent progress updates are throttled: updates which are not published
+    right away replace each other and the latest is published with the next
+    significant update or when the manager is closed.  All updates of a
+    manager are sent over the same connection
     """
 
     def __init__(self, filename: str, task_id: Optional[str] = None) -> None:
         self.filename = filename
         self._channel: Optional[RedisPubSubChannelLayer] = None
+        # The layer keeps one connection per event loop
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Progress callbacks may be called from other threads
+        self._lock = threading.RLock()
+        self._last_sent: Optional[tuple[str, Optional[str], float, float]] = None
+        self._pending: Optional[dict] = None
         self.task_id = task_id
 
     def __enter__(self):
@@ -40,16 +61,52 @@ class ProgressManager:
         If not already opened, gets the default channel layer
         opened and ready to send messages
         """
-        if self._channel is None:
-            self._channel = get_channel_layer()
+        with self._lock:
+            if self._channel is None:
+                self._channel = get_channel_layer()
+                self._loop = asyncio.new_event_loop()
 
     def close(self) -> None:
         """
-        If it was opened, flushes the channel layer
+        If it was opened, sends the pending update and flushes the channel layer
         """
-        if self._channel is not None:
-            async_to_sync(self._channel.flush)
-            self._channel = None
+        with self._lock:
+            if self._channel is not None:
+                try:
+                    if self._pending is not None:
+                        self._send(self._pending)
+                    self._loop.run_until_complete(self._channel.flush())
+                finally:
+                    self._loop.close()
+                    self._channel = None
+                    self._loop = None
+
+    def _is_significant(
+        self,
+        status: str,
+        message: Optional[str],
+        percent: float,
+    ) -> bool:
+        if self._last_sent is None or percent >= 100:
+            return True
+        last_status, last_message, last_percent, last_time = self._last_sent
+        return (
+            status != last_status
+            or message != last_message
+            or abs(percent - last_percent) >= PROGRESS_MIN_STEP
+            or time.monotonic() - last_time >= PROGRESS_MIN_INTERVAL
+        )
+
+    def _send(self, payload: dict) -> None:
+        # Just for IDEs
+        if TYPE_CHECKING:
+            assert self._channel is not None
+            assert self._loop is not None
+
+        self._loop.run_until_complete(
+            self._channel.group_send("status_updates", payload),
+        )
+        self._pending = None
 
     def send_progress(
         self,
@@ -59,13 +116,6 @@ class ProgressManager:
         max_progress: int,
         extra_args: Optional[dict[str, Union[str, int]]] = None,
     ) -> None:
-        # Ensure the layer is open
-        self.open()
-
-        # Just for IDEs
-        if TYPE_CHECKING:
-            assert self._channel is not None
-
         payload = {
             "type": "status_update",
             "data": {
@@ -80,5 +130,14 @@ class ProgressManager:
         if extra_args is not None:
             payload["data"].update(extra_args)
 
-        # Construct and send the update
-        async_to_sync(self._channel.group_send)("status_updates", payload)
+        percent = current_progress * 100 / max_progress if max_progress else 100
+
+        with self._lock:
+            # Ensure the layer is open
+            self.open()
+
+            if self._is_significant(status, message, percent):
+                self._send(payload)
+                self._last_sent = (status, message, percent, time.monotonic())
+            else:
+                self._pending = payload
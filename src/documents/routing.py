@@ -0,0 +1,154 @@
+import logging
+from typing import Optional
+
+from celery import Task
+from django.conf import settings
+from django.core.cache import cache
+from redis import Redis
+
+from documents.data_models import DocumentSource
+
+logger = logging.getLogger("paperless.routing")
+
+QUEUE_INTERACTIVE = "interactive"
+QUEUE_CONSUME = "consume"
+QUEUE_MAIL = "mail"
+QUEUE_DEFAULT = "celery"
+QUEUE_BULK = "bulk"
+
+# The priority of the tasks in each queue.  Workers always take the task with
+# the lowest number first, whichever queue it is in, so an upload doesn't wait
+# behind a backlog of bulk edits
+QUEUE_PRIORITIES: dict[str, int] = {
+    QUEUE_INTERACTIVE: 0,
+    QUEUE_CONSUME: 3,
+    QUEUE_MAIL: 3,
+    QUEUE_DEFAULT: 6,
+    QUEUE_BULK: 9,
+}
+
+# Redis keeps a list per queue and priority, see kombu.transport.redis
+PRIORITY_SEPARATOR = "\x06\x16"
+
+SOURCE_QUEUES: dict[DocumentSource, str] = {
+    DocumentSource.ApiUpload: QUEUE_INTERACTIVE,
+    DocumentSource.ConsumeFolder: QUEUE_CONSUME,
+    DocumentSource.MailFetch: QUEUE_MAIL,
+}
+
+TASK_QUEUES: dict[str, str] = {
+    "documents.tasks.bulk_update_documents": QUEUE_BULK,
+    "documents.tasks.bulk_update_documents_chunk": QUEUE_BULK,
+    "documents.tasks.update_document_archive_file": QUEUE_BULK,
+    "documents.tasks.build_bulk_download": QUEUE_BULK,
+    "documents.tasks.remove_deleted_document_files": QUEUE_BULK,
+    # Chunks of large documents are needed to finish consuming them
+    "paperless_tesseract.tasks.ocr_chunk": QUEUE_CONSUME,
+}
+
+QUEUE_SLOTS_KEY = "task_queue_slots"
+
+# How long a task waits before trying again, if its queue has no free slot
+QUEUE_SLOT_RETRY_SECONDS = 10
+
+
+def route_task(name, args, kwargs, options, task=None, **kw) -> dict:
+    """
+    Celery router, sending consumption to a queue based on the source of the
+    document and other tasks based on their name
+    """
+    if name == "documents.tasks.consume_file":
+        input_doc = args[0] if args else kwargs.get("input_doc")
+        source = getattr(input_doc, "source", None)
+        queue = SOURCE_QUEUES.get(source, QUEUE_CONSUME)
+    elif name == "documents.tasks.consume_file_batch":
+        batch = args[0] if args else kwargs.get("batch")
+        # A batch holds documents of the same source
+        source = getattr(batch[0][1], "source", None) if batch else None
+        queue = SOURCE_QUEUES.get(source, QUEUE_CONSUME)
+    else:
+        queue = TASK_QUEUES.get(name, QUEUE_DEFAULT)
+    return {"queue": queue, "priority": QUEUE_PRIORITIES[queue]}
+
+
+def get_queue_depths() -> dict[str, int]:
+    """
+    Returns the number of tasks waiting in each queue
+    """
+    prefix = settings.CELERY_BROKER_TRANSPORT_OPTIONS.get("global_keyprefix", "")
+    priorities = [
+        f"{PRIORITY_SEPARATOR}{priority}" if priority else ""
+        for priority in set(QUEUE_PRIORITIES.values())
+    ]
+    with Redis.from_url(url=settings.CELERY_BROKER_URL) as client:
+        return {
+            queue: sum(
+                client.llen(f"{prefix}{queue}{priority}") for priority in priorities
+            )
+            for queue in QUEUE_PRIORITIES
+        }
+
+
+def acquire_queue_slot(queue: str, limit: int) -> bool:
+    """
+    Takes one of the limited slots for tasks running from the given queue,
+    across all workers.  Returns False if all slots are taken
+    """
+    key = f"{QUEUE_SLOTS_KEY}_{queue}"
+    # Slots of killed workers are freed once no task of the queue started or
+    # finished for as long as a task may run
+    cache.add(key, 0, timeout=settings.CELERY_TASK_TIME_LIMIT)
+    try:
+        used = cache.incr(key)
+    except ValueError:
+        # The counter expired just now
+        cache.add(key, 1, timeout=settings.CELERY_TASK_TIME_LIMIT)
+        return True
+    cache.touch(key, timeout=settings.CELERY_TASK_TIME_LIMIT)
+    if used > limit:
+        release_queue_slot(queue)
+        return False
+    return True
+
+
+def release_queue_slot(queue: str) -> None:
+    key = f"{QUEUE_SLOTS_KEY}_{queue}"
+    try:
+        used = cache.decr(key)
+    except ValueError:
+        # The counter expired while the task was running
+        return
+    if used < 0:
+        # Slots of tasks which were running when the counter expired
+        cache.set(key, 0, timeout=settings.CELERY_TASK_TIME_LIMIT)
+    else:
+        cache.touch(key, timeout=settings.CELERY_TASK_TIME_LIMIT)
+
+
+class QueueConcurrencyTask(Task):
+    """
+    Task which respects the limit of concurrently running tasks configured
+    for the queue it was taken from.  If the limit is reached, the task is
+    queued again after a while
+    """
+
+    def _queue(self) -> Optional[str]:
+        delivery_info = self.request.delivery_info or {}
+        return delivery_info.get("routing_key")
+
+    def __call__(self, *args, **kwargs):
+        queue = self._queue()
+        limit = settings.TASK_QUEUE_CONCURRENCY.get(queue)
+        if limit is None or self.request.called_directly:
+            return super().__call__(*args, **kwargs)
+
+        if not acquire_queue_slot(queue, limit):
+            logger.debug(
+                f"All {limit} slot(s) of queue {queue} are in use, "
+                f"retrying {self.name} later",
+            )
+            raise self.retry(countdown=QUEUE_SLOT_RETRY_SECONDS, max_retries=None)
+        try:
+            return super().__call__(*args, **kwargs)
+        finally:
+            release_queue_slot(queue)
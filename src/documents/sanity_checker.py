@@ -1,4 +1,3 @@
-import hashlib
 import logging
 from collections import defaultdict
 from pathlib import Path
@@ -8,6 +7,7 @@ from django.conf import settings
 from tqdm import tqdm
 
 from documents.models import Document
+from documents.utils import compute_checksum
 
 
 class SanityCheckMessages:
@@ -90,7 +90,7 @@ def check_sanity(progress=False) -> SanityCheckMessages:
             if source_path in present_files:
                 present_files.remove(source_path)
             try:
-                checksum = hashlib.md5(source_path.read_bytes()).hexdigest()
+                checksum = compute_checksum(source_path)
             except OSError as e:
                 messages.error(doc.pk, f"Cannot read original file of document: {e}")
             else:
@@ -120,7 +120,7 @@ def check_sanity(progress=False) -> SanityCheckMessages:
                 if archive_path in present_files:
                     present_files.remove(archive_path)
                 try:
-                    checksum = hashlib.md5(archive_path.read_bytes()).hexdigest()
+                    checksum = compute_checksum(archive_path)
                 except OSError as e:
                     messages.error(
                         doc.pk,
@@ -1164,6 +1164,11 @@ class BulkDownloadSerializer(DocumentListSerializer):
         default=False,
     )
 
+    mode = serializers.ChoiceField(
+        choices=["stream", "async"],
+        default="stream",
+    )
+
     def validate_compression(self, compression):
         import zipfile
 
@@ -1279,6 +1284,7 @@ class TasksViewSerializer(serializers.ModelSerializer):
             "result",
             "acknowledged",
             "related_document",
+            "stage_timings",
         )
 
     type = serializers.SerializerMethodField()
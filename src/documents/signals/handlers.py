@@ -8,6 +8,8 @@ from celery.signals import before_task_publish
 from celery.signals import task_failure
 from celery.signals import task_postrun
 from celery.signals import task_prerun
+from celery.signals import worker_init
+from celery.signals import worker_process_init
 from django.conf import settings
 from django.contrib.admin.models import ADDITION
 from django.contrib.admin.models import LogEntry
@@ -29,6 +31,7 @@ from documents.consumer import parse_doc_title_w_placeholders
 from documents.file_handling import create_source_path_directory
 from documents.file_handling import delete_empty_directories
 from documents.file_handling import generate_unique_filename
+from documents.file_handling import remove_files_of_deleted_document
 from documents.models import CustomFieldInstance
 from documents.models import Document
 from documents.models import MatchingModel
@@ -39,10 +42,14 @@ from documents.models import WorkflowAction
 from documents.models import WorkflowTrigger
 from documents.permissions import get_objects_for_user_owner_aware
 from documents.permissions import set_permissions_for_object
+from documents.timing import record_stage
+from documents.workers import import_heavy_modules
+from documents.workers import warm_up
 
 logger = logging.getLogger("paperless.handlers")
 
 
+@record_stage("inbox_tags")
 def add_inbox_tags(sender, document: Document, logging_group=None, **kwargs):
     if document.owner is not None:
         tags = get_objects_for_user_owner_aware(
@@ -76,6 +83,7 @@ def _suggestion_printer(
     stdout.write(f"Suggest {suggestion_type}: {selected}")
 
 
+@record_stage("match_correspondent")
 def set_correspondent(
     sender,
     document: Document,
@@ -131,6 +139,7 @@ def set_correspondent(
             document.save(update_fields=("correspondent",))
 
 
+@record_stage("match_document_type")
 def set_document_type(
     sender,
     document: Document,
@@ -187,6 +196,7 @@ def set_document_type(
             document.save(update_fields=("document_type",))
 
 
+@record_stage("match_tags")
 def set_tags(
     sender,
     document: Document,
@@ -242,6 +252,7 @@ def set_tags(
         document.tags.add(*relevant_tags)
 
 
+@record_stage("match_storage_path")
 def set_storage_path(
     sender,
     document: Document,
@@ -303,60 +314,7 @@ def set_storage_path(
 
 @receiver(models.signals.post_delete, sender=Document)
 def cleanup_document_deletion(sender, instance, using, **kwargs):
-    with FileLock(settings.MEDIA_LOCK):
-        if settings.TRASH_DIR:
-            # Find a non-conflicting filename in case a document with the same
-            # name was moved to trash earlier
-            counter = 0
-            old_filename = os.path.split(instance.source_path)[1]
-            (old_filebase, old_fileext) = os.path.splitext(old_filename)
-
-            while True:
-                new_file_path = os.path.join(
-                    settings.TRASH_DIR,
-                    old_filebase + (f"_{counter:02}" if counter else "") + old_fileext,
-                )
-
-                if os.path.exists(new_file_path):
-                    counter += 1
-                else:
-                    break
-
-            logger.debug(f"Moving {instance.source_path} to trash at {new_file_path}")
-            try:
-                shutil.move(instance.source_path, new_file_path)
-            except OSError as e:
-                logger.error(
-                    f"Failed to move {instance.source_path} to trash at "
-                    f"{new_file_path}: {e}. Skipping cleanup!",
-                )
-                return
-
-        for filename in (
-            instance.source_path,
-            instance.archive_path,
-            instance.thumbnail_path,
-        ):
-            if filename and os.path.isfile(filename):
-                try:
-                    os.unlink(filename)
-                    logger.debug(f"Deleted file {filename}.")
-                except OSError as e:
-                    logger.warning(
-                        f"While deleting document {instance!s}, the file "
-                        f"{filename} could not be deleted: {e}",
-                    )
-
-        delete_empty_directories(
-            os.path.dirname(instance.source_path),
-            root=settings.ORIGINALS_DIR,
-        )
-
-        if instance.has_archive_version:
-            delete_empty_directories(
-                os.path.dirname(instance.archive_path),
-                root=settings.ARCHIVE_DIR,
-            )
+    remove_files_of_deleted_document(instance)
 
 
 class CannotMoveFilesException(Exception):
@@ -491,6 +449,7 @@ def update_filename_and_move_files(sender, instance: Document, **kwargs):
             )
 
 
+@record_stage("log_entry")
 def set_log_entry(sender, document: Document, logging_group=None, **kwargs):
     ct = ContentType.objects.get(model="document")
     user = User.objects.get(username="consumer")
@@ -505,12 +464,14 @@ def set_log_entry(sender, document: Document, logging_group=None, **kwargs):
     )
 
 
+@record_stage("index")
 def add_to_index(sender, document, **kwargs):
     from documents import index
 
     index.add_or_update_document(document)
 
 
+@record_stage("workflows")
 def run_workflow_added(sender, document: Document, logging_group=None, **kwargs):
     run_workflow(
         WorkflowTrigger.WorkflowTriggerType.DOCUMENT_ADDED,
@@ -772,7 +733,10 @@ def before_task_publish_handler(sender=None, headers=None, body=None, **kwargs):
     https://docs.celeryq.dev/en/stable/internals/protocol.html#version-2
 
     """
-    if "task" not in headers or headers["task"] != "documents.tasks.consume_file":
+    if "task" not in headers or headers["task"] not in {
+        "documents.tasks.consume_file",
+        "documents.tasks.consume_file_batch",
+    }:
         # Assumption: this is only ever a v2 message
         return
 
@@ -780,19 +744,33 @@ def before_task_publish_handler(sender=None, headers=None, body=None, **kwargs):
         close_old_connections()
 
         task_args = body[0]
-        input_doc, _ = task_args
-
-        task_file_name = input_doc.original_file.name
-
-        PaperlessTask.objects.create(
-            task_id=headers["id"],
-            status=states.PENDING,
-            task_file_name=task_file_name,
-            task_name=headers["task"],
-            result=None,
-            date_created=timezone.now(),
-            date_started=None,
-            date_done=None,
+
+        if headers["task"] == "documents.tasks.consume_file_batch":
+            # Every document of the batch is tracked as its own consume task
+            (batch,) = task_args
+            files = [(task_id, input_doc) for task_id, input_doc, _ in batch]
+        else:
+            input_doc, _ = task_args
+            files = [(headers["id"], input_doc)]
+
+        PaperlessTask.objects.bulk_create(
+            [
+                PaperlessTask(
+                    task_id=task_id,
+                    status=states.PENDING,
+                    task_file_name=input_doc.original_file.name,
+                    task_name="documents.tasks.consume_file",
+                    result=None,
+                    date_created=timezone.now(),
+                    date_started=None,
+                    date_done=None,
+                )
+                for task_id, input_doc in files
+            ],
+            # A task which is retried is published again with the same id
+            update_conflicts=True,
+            unique_fields=["task_id"],
+            update_fields=["status", "result", "date_started", "date_done"],
         )
     except Exception:  # pragma: no cover
         # Don't let an exception in the signal handlers prevent
@@ -877,3 +855,31 @@ def task_failure_handler(
             task_instance.save()
     except Exception:  # pragma: no cover
         logger.exception("Updating PaperlessTask failed")
+
+
+@worker_init.connect
+def worker_init_handler(sender=None, **kwargs):
+    """
+    Imports the heavy libraries once in the main worker process, so warm
+    worker processes forked from it have them already
+
+    https://docs.celeryq.dev/en/stable/userguide/signals.html#worker-init
+    """
+    if settings.WORKER_WARM:
+        import_heavy_modules()
+
+
+@worker_process_init.connect
+def worker_process_init_handler(sender=None, **kwargs):
+    """
+    Prepares a warm worker process for its tasks
+
+    https://docs.celeryq.dev/en/stable/userguide/signals.html#worker-process-init
+    """
+    if settings.WORKER_WARM:
+        try:
+            duration = warm_up()
+            logger.info(f"Worker process prepared in {duration:.2f}s")
+        except Exception:  # pragma: no cover
+            # The tasks prepare what is missing themselves
+            logger.exception("Preparing the worker process failed")
@@ -1,24 +1,38 @@
-import hashlib
 import logging
-import shutil
 import uuid
+from datetime import timedelta
 from pathlib import Path
 from tempfile import TemporaryDirectory
+from typing import Final
 from typing import Optional
 
 import tqdm
 from celery import Task
+from celery import group
 from celery import shared_task
+from celery import states
+from celery.exceptions import SoftTimeLimitExceeded
 from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
 from django.db.models.signals import post_save
+from django.utils import timezone
 from filelock import FileLock
-from whoosh.writing import AsyncWriter
 
-from documents import index
+from documents import matching
 from documents import sanity_checker
 from documents.barcodes import BarcodePlugin
+from documents.bulk_download import BULK_DOWNLOAD_FILENAME
+from documents.bulk_download import archive_key
+from documents.bulk_download import build_archive
+from documents.bulk_download import get_archive_path
+from documents.bulk_download import get_build_cache_key
+from documents.bulk_download import remove_expired_archives
+from documents.caching import CACHE_1_DAY
 from documents.caching import clear_document_caches
+from documents.caching import clear_documents_caches
+from documents.caching import clear_pending_updates
+from documents.caching import mark_pending_updates
 from documents.classifier import DocumentClassifier
 from documents.classifier import load_classifier
 from documents.consumer import Consumer
@@ -26,12 +40,15 @@ from documents.consumer import ConsumerError
 from documents.consumer import WorkflowTriggerPlugin
 from documents.data_models import ConsumableDocument
 from documents.data_models import DocumentMetadataOverrides
+from documents.data_models import DocumentSource
 from documents.double_sided import CollatePlugin
 from documents.file_handling import create_source_path_directory
 from documents.file_handling import generate_unique_filename
+from documents.file_handling import remove_document_files
 from documents.models import Correspondent
 from documents.models import Document
 from documents.models import DocumentType
+from documents.models import PaperlessTask
 from documents.models import StoragePath
 from documents.models import Tag
 from documents.parsers import DocumentParser
@@ -40,8 +57,16 @@ from documents.plugins.base import ConsumeTaskPlugin
 from documents.plugins.base import ProgressManager
 from documents.plugins.base import StopConsumeTaskError
 from documents.plugins.helpers import ProgressStatusOptions
+from documents.routing import QueueConcurrencyTask
 from documents.sanity_checker import SanityCheckFailedException
 from documents.signals import document_updated
+from documents.timing import StageTimings
+from documents.timing import record_stage
+from documents.timing import recording
+from documents.utils import compute_checksum
+from documents.utils import place_file
+from documents.workers import get_classifier
+from documents.workers import import_heavy_modules
 
 if settings.AUDIT_LOG_ENABLED:
     import json
@@ -52,12 +77,20 @@ logger = logging.getLogger("paperless.tasks")
 
 @shared_task
 def index_optimize():
+    from whoosh.writing import AsyncWriter
+
+    from documents import index
+
     ix = index.open_index()
     writer = AsyncWriter(ix)
     writer.commit(optimize=True)
 
 
 def index_reindex(progress_bar_disable=False):
+    from whoosh.writing import AsyncWriter
+
+    from documents import index
+
     documents = Document.objects.all()
 
     ix = index.open_index(recreate=True)
@@ -101,12 +134,150 @@ def train_classifier():
         logger.warning("Classifier error: " + str(e))
 
 
-@shared_task(bind=True)
+@shared_task(bind=True, base=QueueConcurrencyTask)
 def consume_file(
     self: Task,
     input_doc: ConsumableDocument,
     overrides: Optional[DocumentMetadataOverrides] = None,
 ):
+    return _consume_document(input_doc, overrides, self.request.id)
+
+
+# Time a document of a batch is expected to take at most.  Batches are capped
+# to the number of documents which can be consumed within the task time limit
+CONSUMER_BATCH_DOCUMENT_SECONDS: Final[int] = 60
+
+# Time left to a batch after its soft time limit, to mark the documents which
+# were not consumed and write the index updates
+CONSUMER_BATCH_CLEANUP_SECONDS: Final[int] = 60
+
+# Number of documents of a batch after which the index updates are written
+CONSUMER_BATCH_INDEX_INTERVAL: Final[int] = 10
+
+
+def get_consumer_batch_size() -> int:
+    """
+    Returns the number of documents consumed by a single task, at most as many
+    as can be consumed within the task time limit
+    """
+    return max(
+        1,
+        min(
+            settings.CONSUMER_BATCH_SIZE,
+            settings.CELERY_TASK_TIME_LIMIT // CONSUMER_BATCH_DOCUMENT_SECONDS,
+        ),
+    )
+
+
+@shared_task(
+    bind=True,
+    base=QueueConcurrencyTask,
+    soft_time_limit=max(
+        settings.CELERY_TASK_TIME_LIMIT - CONSUMER_BATCH_CLEANUP_SECONDS,
+        1,
+    ),
+)
+def consume_file_batch(
+    self: Task,
+    batch: list[tuple[str, ConsumableDocument, Optional[DocumentMetadataOverrides]]],
+):
+    """
+    Consumes many documents in a row, each with the id of its own
+    PaperlessTask.  The classifier, the models to match against and the index
+    commits are shared by the documents of the batch, but every document is
+    still consumed in its own transaction, so one failing document doesn't
+    affect the others.  If the batch runs out of time, the documents not
+    consumed yet are marked as failed
+    """
+    from documents import index
+
+    classifier = get_classifier()
+    results = []
+
+    with index.deferred_updates(), matching.shared_matching_models():
+        for position, (task_id, input_doc, overrides) in enumerate(batch):
+            PaperlessTask.objects.filter(task_id=task_id).update(
+                status=states.STARTED,
+                date_started=timezone.now(),
+            )
+            try:
+                result = _consume_document(
+                    input_doc,
+                    overrides,
+                    task_id,
+                    classifier=classifier,
+                )
+                status = states.SUCCESS
+            except SoftTimeLimitExceeded:
+                result = "The batch ran out of time before consuming this document"
+                logger.error(
+                    f"Consuming the batch ran out of time, "
+                    f"{len(batch) - position} document(s) were not consumed",
+                )
+                PaperlessTask.objects.filter(
+                    task_id__in=[task[0] for task in batch[position:]],
+                ).update(
+                    status=states.FAILURE,
+                    result=result,
+                    date_done=timezone.now(),
+                )
+                results.extend([result] * (len(batch) - position))
+                break
+            except Exception as e:
+                logger.exception(f"Consuming {input_doc.original_file} failed: {e}")
+                result = str(e)
+                status = states.FAILURE
+
+            PaperlessTask.objects.filter(task_id=task_id).update(
+                status=status,
+                result=result,
+                date_done=timezone.now(),
+            )
+            results.append(result)
+
+            if (position + 1) % CONSUMER_BATCH_INDEX_INTERVAL == 0:
+                index.flush_deferred_updates()
+
+    return results
+
+
+def _consume_document(
+    input_doc: ConsumableDocument,
+    overrides: Optional[DocumentMetadataOverrides],
+    task_id: str,
+    classifier: Optional[DocumentClassifier] = None,
+) -> str:
+    """
+    Consumes the document and records how long each stage took on its
+    PaperlessTask, also if consuming it failed
+    """
+    timings = StageTimings()
+    try:
+        with recording(timings):
+            # Everything until the classifier is ready, which cold workers
+            # load with the libraries it needs for every task, while warm
+            # workers have done this before
+            with record_stage("worker_startup"):
+                if settings.WORKER_WARM:
+                    import_heavy_modules()
+                if classifier is None:
+                    classifier = get_classifier()
+            return _run_consumption(input_doc, overrides, task_id, classifier)
+    finally:
+        try:
+            PaperlessTask.objects.filter(task_id=task_id).update(
+                stage_timings=timings.as_dict(),
+            )
+        except Exception:  # pragma: no cover
+            logger.exception("Saving stage timings failed")
+
+
+def _run_consumption(
+    input_doc: ConsumableDocument,
+    overrides: Optional[DocumentMetadataOverrides],
+    task_id: str,
+    classifier: Optional[DocumentClassifier],
+) -> str:
     # Default no overrides
     if overrides is None:
         overrides = DocumentMetadataOverrides()
@@ -117,79 +288,90 @@ def consume_file(
         WorkflowTriggerPlugin,
     ]
 
+    # The plugins and the consumer send their progress over the same connection
     with ProgressManager(
         overrides.filename or input_doc.original_file.name,
-        self.request.id,
-    ) as status_mgr, TemporaryDirectory(dir=settings.SCRATCH_DIR) as tmp_dir:
-        tmp_dir = Path(tmp_dir)
-        for plugin_class in plugins:
-            plugin_name = plugin_class.NAME
-
-            plugin = plugin_class(
-                input_doc,
-                overrides,
-                status_mgr,
-                tmp_dir,
-                self.request.id,
-            )
-
-            if not plugin.able_to_run:
-                logger.debug(f"Skipping plugin {plugin_name}")
-                continue
+        task_id,
+    ) as status_mgr:
+        with TemporaryDirectory(dir=settings.SCRATCH_DIR) as tmp_dir:
+            tmp_dir = Path(tmp_dir)
+            for plugin_class in plugins:
+                plugin_name = plugin_class.NAME
+
+                plugin = plugin_class(
+                    input_doc,
+                    overrides,
+                    status_mgr,
+                    tmp_dir,
+                    task_id,
+                )
 
-            try:
-                logger.debug(f"Executing plugin {plugin_name}")
-                plugin.setup()
+                if not plugin.able_to_run:
+                    logger.debug(f"Skipping plugin {plugin_name}")
+                    continue
 
-                msg = plugin.run()
+                try:
+                    logger.debug(f"Executing plugin {plugin_name}")
+                    with record_stage(plugin_name):
+                        plugin.setup()
 
-                if msg is not None:
-                    logger.info(f"{plugin_name} completed with: {msg}")
-                else:
-                    logger.info(f"{plugin_name} completed with no message")
+                        msg = plugin.run()
 
-                overrides = plugin.metadata
+                    if msg is not None:
+                        logger.info(f"{plugin_name} completed with: {msg}")
+                    else:
+                        logger.info(f"{plugin_name} completed with no message")
 
-            except StopConsumeTaskError as e:
-                logger.info(f"{plugin_name} requested task exit: {e.message}")
-                return e.message
+                    overrides = plugin.metadata
 
-            except Exception as e:
-                logger.exception(f"{plugin_name} failed: {e}")
-                status_mgr.send_progress(ProgressStatusOptions.FAILED, f"{e}", 100, 100)
-                raise
-
-            finally:
-                plugin.cleanup()
-
-    # continue with consumption if no barcode was found
-    document = Consumer().try_consume_file(
-        input_doc.original_file,
-        override_filename=overrides.filename,
-        override_title=overrides.title,
-        override_correspondent_id=overrides.correspondent_id,
-        override_document_type_id=overrides.document_type_id,
-        override_tag_ids=overrides.tag_ids,
-        override_storage_path_id=overrides.storage_path_id,
-        override_created=overrides.created,
-        override_asn=overrides.asn,
-        override_owner_id=overrides.owner_id,
-        override_view_users=overrides.view_users,
-        override_view_groups=overrides.view_groups,
-        override_change_users=overrides.change_users,
-        override_change_groups=overrides.change_groups,
-        override_custom_field_ids=overrides.custom_field_ids,
-        task_id=self.request.id,
-    )
+                except StopConsumeTaskError as e:
+                    logger.info(f"{plugin_name} requested task exit: {e.message}")
+                    return e.message
 
-    if document:
-        return f"Success. New document id {document.pk} created"
-    else:
-        raise ConsumerError(
-            "Unknown error: Returned document was null, but "
-            "no error message was given.",
+                except Exception as e:
+                    logger.exception(f"{plugin_name} failed: {e}")
+                    status_mgr.send_progress(
+                        ProgressStatusOptions.FAILED,
+                        f"{e}",
+                        100,
+                        100,
+                    )
+                    raise
+
+                finally:
+                    plugin.cleanup()
+
+        # continue with consumption if no barcode was found
+        document = Consumer(
+            classifier=classifier,
+            status_mgr=status_mgr,
+        ).try_consume_file(
+            input_doc.original_file,
+            override_filename=overrides.filename,
+            override_title=overrides.title,
+            override_correspondent_id=overrides.correspondent_id,
+            override_document_type_id=overrides.document_type_id,
+            override_tag_ids=overrides.tag_ids,
+            override_storage_path_id=overrides.storage_path_id,
+            override_created=overrides.created,
+            override_asn=overrides.asn,
+            override_owner_id=overrides.owner_id,
+            override_view_users=overrides.view_users,
+            override_view_groups=overrides.view_groups,
+            override_change_users=overrides.change_users,
+            override_change_groups=overrides.change_groups,
+            override_custom_field_ids=overrides.custom_field_ids,
+            task_id=task_id,
         )
 
+        if document:
+            return f"Success. New document id {document.pk} created"
+        else:
+            raise ConsumerError(
+                "Unknown error: Returned document was null, but "
+                "no error message was given.",
+            )
+
 
 @shared_task
 def sanity_check():
@@ -207,31 +389,217 @@ def sanity_check():
         return "No issues detected."
 
 
-@shared_task
+def get_operation_counter_key(operation_id: str, counter: str) -> str:
+    return f"operation_{operation_id}_{counter}"
+
+
+def start_operation_counters(operation_id: str, *counters: str) -> None:
+    """
+    Starts counting the progress of an operation split across several tasks
+    """
+    cache.set_many(
+        {get_operation_counter_key(operation_id, counter): 0 for counter in counters},
+        CACHE_1_DAY,
+    )
+
+
+def count_operation_step(operation_id: str, counter: str) -> Optional[int]:
+    """
+    Counts a finished step of an operation and returns the number of steps
+    finished by all its tasks, or None if the counter expired
+    """
+    try:
+        return cache.incr(get_operation_counter_key(operation_id, counter))
+    except ValueError:
+        return None
+
+
+def stop_operation_counters(operation_id: str, *counters: str) -> None:
+    cache.delete_many(
+        [get_operation_counter_key(operation_id, counter) for counter in counters],
+    )
+
+
+@shared_task(base=QueueConcurrencyTask)
 def bulk_update_documents(document_ids):
-    documents = Document.objects.filter(id__in=document_ids)
+    """
+    Updates the caches, file names, workflows and search index entries of
+    documents after a bulk edit.  Documents which are waiting for an update
+    already are left to that update.  The others are split into chunks, which
+    are updated in parallel
+    """
+    document_ids = mark_pending_updates(document_ids)
+    if not document_ids:
+        return "All documents are waiting for an update already"
+
+    chunk_size = max(settings.BULK_UPDATE_CHUNK_SIZE, 1)
+    chunks = [
+        document_ids[i : i + chunk_size]
+        for i in range(0, len(document_ids), chunk_size)
+    ]
 
-    ix = index.open_index()
+    operation_id = str(uuid.uuid4())
+    start_operation_counters(operation_id, "documents", "chunks")
+    args = (operation_id, len(document_ids), len(chunks))
+    if len(chunks) == 1:
+        return bulk_update_documents_chunk(chunks[0], *args)
 
-    for doc in documents:
-        clear_document_caches(doc.pk)
-        document_updated.send(
-            sender=None,
-            document=doc,
-            logging_group=uuid.uuid4(),
-        )
-        post_save.send(Document, instance=doc, created=False)
+    group(bulk_update_documents_chunk.s(chunk, *args) for chunk in chunks).delay()
+    return f"Updating {len(document_ids)} document(s) in {len(chunks)} chunks"
 
-    with AsyncWriter(ix) as writer:
+
+@shared_task(base=QueueConcurrencyTask)
+def bulk_update_documents_chunk(
+    document_ids: list[int],
+    operation_id: str,
+    total: int,
+    chunks: int,
+):
+    """
+    Updates one chunk of the documents of a bulk update, reporting the
+    progress of the whole update
+    """
+    from whoosh.writing import AsyncWriter
+
+    from documents import index
+
+    # Changes made from now on need another update
+    clear_pending_updates(document_ids)
+    documents = list(
+        Document.objects.filter(id__in=document_ids).prefetch_related("tags"),
+    )
+    clear_documents_caches(document_ids)
+
+    extra_args = {"operation": "bulk_update"}
+    with ProgressManager("bulk_update", operation_id) as manager:
         for doc in documents:
-            index.update_document(writer, doc)
+            document_updated.send(
+                sender=None,
+                document=doc,
+                logging_group=uuid.uuid4(),
+            )
+            post_save.send(Document, instance=doc, created=False)
+            current = count_operation_step(operation_id, "documents")
+            if current is not None:
+                manager.send_progress(
+                    ProgressStatusOptions.WORKING,
+                    "Updating documents",
+                    min(current, total),
+                    total,
+                    extra_args,
+                )
+
+        with AsyncWriter(index.open_index()) as writer:
+            for doc in documents:
+                index.update_document(writer, doc)
+
+        # The last chunk to finish reports the end of the whole update
+        if count_operation_step(operation_id, "chunks") == chunks:
+            stop_operation_counters(operation_id, "documents", "chunks")
+            manager.send_progress(
+                ProgressStatusOptions.SUCCESS,
+                "Updated documents",
+                total,
+                total,
+                extra_args,
+            )
+    return f"Updated {len(documents)} document(s)"
+
+
+@shared_task(bind=True, base=QueueConcurrencyTask)
+def build_bulk_download(
+    self: Task,
+    document_ids: list[int],
+    content: str,
+    compression: int,
+    follow_formatting: bool,
+    owner_id: Optional[int] = None,
+):
+    """
+    Builds the zip file of a bulk download in the background, so the
+    request can be repeated to download it once it is done
+    """
+    documents = Document.objects.in_bulk(document_ids)
+    documents = [documents[id] for id in document_ids if id in documents]
+    key = archive_key(documents, content, compression, follow_formatting)
+    extra_args = {"operation": "bulk_download", "bulk_download": key}
+    if owner_id is not None:
+        extra_args["owner_id"] = owner_id
+
+    with ProgressManager(BULK_DOWNLOAD_FILENAME, self.request.id) as manager:
+
+        def progress(current: int, total: int) -> None:
+            manager.send_progress(
+                ProgressStatusOptions.WORKING,
+                "Adding documents to the archive",
+                current,
+                total,
+                extra_args,
+            )
+
+        manager.send_progress(
+            ProgressStatusOptions.STARTED,
+            "Building the archive",
+            0,
+            len(documents),
+            extra_args,
+        )
+        try:
+            build_archive(
+                documents,
+                content,
+                compression,
+                follow_formatting,
+                get_archive_path(key),
+                progress,
+            )
+        except Exception as e:
+            manager.send_progress(
+                ProgressStatusOptions.FAILED,
+                f"Unable to build the archive: {e}",
+                len(documents),
+                len(documents),
+                extra_args,
+            )
+            raise
+        finally:
+            cache.delete(get_build_cache_key(key))
+
+        manager.send_progress(
+            ProgressStatusOptions.SUCCESS,
+            "The archive is ready",
+            len(documents),
+            len(documents),
+            extra_args,
+        )
+    return f"Built bulk download {key} of {len(documents)} document(s)"
 
 
 @shared_task
+def remove_expired_bulk_downloads():
+    removed = remove_expired_archives(
+        timedelta(hours=settings.BULK_DOWNLOAD_CACHE_TTL),
+    )
+    return f"Removed {removed} expired bulk download(s)"
+
+
+@shared_task(base=QueueConcurrencyTask)
+def remove_deleted_document_files(documents: list[dict]):
+    """
+    Removes the files of a batch of deleted documents, see
+    documents.file_handling.remove_document_files
+    """
+    remove_document_files(documents)
+    return f"Removed the files of {len(documents)} deleted document(s)"
+
+
+@shared_task(base=QueueConcurrencyTask)
 def update_document_archive_file(document_id):
     """
     Re-creates the archive file of a document, including new OCR content and thumbnail
     """
+    from documents import index
+
     document = Document.objects.get(id=document_id)
 
     mime_type = document.mime_type
@@ -246,6 +614,8 @@ def update_document_archive_file(document_id):
         return
 
     parser: DocumentParser = parser_class(logging_group=uuid.uuid4())
+    if document.storage_type == Document.STORAGE_TYPE_UNENCRYPTED:
+        parser.checksum = document.checksum
 
     try:
         parser.parse(document.source_path, mime_type, document.get_public_filename())
@@ -258,8 +628,7 @@ def update_document_archive_file(document_id):
 
         if parser.get_archive_path():
             with transaction.atomic():
-                with open(parser.get_archive_path(), "rb") as f:
-                    checksum = hashlib.md5(f.read()).hexdigest()
+                checksum = compute_checksum(parser.get_archive_path())
                 # I'm going to save first so that in case the file move
                 # fails, the database is rolled back.
                 # We also don't use save() since that triggers the filehandling
@@ -301,8 +670,12 @@ def update_document_archive_file(document_id):
 
                 with FileLock(settings.MEDIA_LOCK):
                     create_source_path_directory(document.archive_path)
-                    shutil.move(parser.get_archive_path(), document.archive_path)
-                    shutil.move(thumbnail, document.thumbnail_path)
+                    place_file(
+                        parser.get_archive_path(),
+                        document.archive_path,
+                        move=True,
+                    )
+                    place_file(thumbnail, document.thumbnail_path, move=True)
 
             with index.open_index_writer() as writer:
                 index.update_document(writer, document)
@@ -315,3 +688,196 @@ def update_document_archive_file(document_id):
         )
     finally:
         parser.cleanup()
+
+
+@shared_task(base=QueueConcurrencyTask)
+def rotate_document(document_id: int, degrees: int, operation_id: str, total: int):
+    """
+    Rotates the pages of a PDF document and re-creates its archive file.  One
+    of the tasks rotating the documents of a bulk edit in parallel
+    """
+    import pikepdf
+
+    try:
+        # The document may have been deleted since the rotation was queued
+        document = Document.objects.get(id=document_id)
+        with pikepdf.open(document.source_path, allow_overwriting_input=True) as pdf:
+            for page in pdf.pages:
+                page.rotate(degrees, relative=True)
+            pdf.save()
+        document.checksum = compute_checksum(document.source_path)
+        document.save()
+        logger.info(f"Rotated document {document_id} by {degrees} degrees")
+    except Exception as e:
+        logger.exception(f"Error rotating document {document_id}: {e}")
+    else:
+        update_document_archive_file(document_id=document_id)
+
+    current = count_operation_step(operation_id, "documents")
+    if current is None:
+        # The counter expired
+        return
+    with ProgressManager("rotate", operation_id) as manager:
+        if current >= total:
+            stop_operation_counters(operation_id, "documents")
+        manager.send_progress(
+            (
+                ProgressStatusOptions.SUCCESS
+                if current >= total
+                else ProgressStatusOptions.WORKING
+            ),
+            "Rotated documents" if current >= total else "Rotating documents",
+            min(current, total),
+            total,
+            {"operation": "rotate"},
+        )
+
+
+@shared_task(bind=True, base=QueueConcurrencyTask)
+def merge_documents(
+    self: Task,
+    document_ids: list[int],
+    metadata_document_id: Optional[int] = None,
+):
+    """
+    Merges the pages of PDF documents, in the given order, into a new
+    document, which is consumed
+    """
+    import pikepdf
+
+    documents = Document.objects.in_bulk(document_ids)
+    extra_args = {"operation": "merge"}
+    merged_ids = []
+
+    with ProgressManager("merge", self.request.id) as manager:
+        merged_pdf = pikepdf.new()
+        version = merged_pdf.pdf_version
+        for current, document_id in enumerate(document_ids, start=1):
+            document = documents.get(document_id)
+            try:
+                if document is None:
+                    raise Document.DoesNotExist
+                with pikepdf.open(str(document.source_path)) as pdf:
+                    version = max(version, pdf.pdf_version)
+                    merged_pdf.pages.extend(pdf.pages)
+                merged_ids.append(document_id)
+            except Exception as e:
+                logger.exception(
+                    f"Error merging document {document_id}, it will not be "
+                    f"included in the merge: {e}",
+                )
+            manager.send_progress(
+                ProgressStatusOptions.WORKING,
+                "Merging documents",
+                current,
+                len(document_ids),
+                extra_args,
+            )
+
+        if len(merged_ids) == 0:
+            logger.warning("No documents were merged")
+            manager.send_progress(
+                ProgressStatusOptions.FAILED,
+                "No documents were merged",
+                len(document_ids),
+                len(document_ids),
+                extra_args,
+            )
+            return "No documents were merged"
+
+        filepath = Path(settings.SCRATCH_DIR) / (
+            f"{'_'.join([str(doc_id) for doc_id in document_ids])[:100]}_merged.pdf"
+        )
+        merged_pdf.remove_unreferenced_resources()
+        merged_pdf.save(filepath, min_version=version)
+        merged_pdf.close()
+
+        if metadata_document_id:
+            metadata_document = documents[metadata_document_id]
+            overrides = DocumentMetadataOverrides.from_document(metadata_document)
+            overrides.title = metadata_document.title + " (merged)"
+        else:
+            overrides = DocumentMetadataOverrides()
+
+        logger.info("Adding merged document to the task queue.")
+        consume_file.delay(
+            ConsumableDocument(
+                source=DocumentSource.ConsumeFolder,
+                original_file=filepath,
+            ),
+            overrides,
+        )
+        manager.send_progress(
+            ProgressStatusOptions.SUCCESS,
+            "Merged documents",
+            len(document_ids),
+            len(document_ids),
+            extra_args,
+        )
+    return f"Merged {len(merged_ids)} document(s)"
+
+
+@shared_task(bind=True, base=QueueConcurrencyTask)
+def split_document(self: Task, document_id: int, pages: list[list[int]]):
+    """
+    Splits a PDF document into new documents of the given pages, which are
+    consumed
+    """
+    import pikepdf
+
+    document = Document.objects.get(id=document_id)
+    extra_args = {"operation": "split"}
+
+    with ProgressManager("split", self.request.id) as manager:
+        try:
+            with pikepdf.open(document.source_path) as pdf:
+                for idx, split_doc in enumerate(pages):
+                    dst = pikepdf.new()
+                    for page in split_doc:
+                        dst.pages.append(pdf.pages[page - 1])
+                    filepath = Path(settings.SCRATCH_DIR) / (
+                        f"{document.id}_{split_doc[0]}-{split_doc[-1]}.pdf"
+                    )
+                    dst.remove_unreferenced_resources()
+                    dst.save(filepath)
+                    dst.close()
+
+                    overrides = DocumentMetadataOverrides().from_document(document)
+                    overrides.title = f"{document.title} (split {idx + 1})"
+                    logger.info(
+                        f"Adding split document with pages {split_doc} to the "
+                        f"task queue.",
+                    )
+                    consume_file.delay(
+                        ConsumableDocument(
+                            source=DocumentSource.ConsumeFolder,
+                            original_file=filepath,
+                        ),
+                        overrides,
+                    )
+                    manager.send_progress(
+                        ProgressStatusOptions.WORKING,
+                        "Splitting document",
+                        idx + 1,
+                        len(pages),
+                        extra_args,
+                    )
+        except Exception as e:
+            logger.exception(f"Error splitting document {document.id}: {e}")
+            manager.send_progress(
+                ProgressStatusOptions.FAILED,
+                f"Error splitting document: {e}",
+                len(pages),
+                len(pages),
+                extra_args,
+            )
+            return f"Error splitting document {document.id}"
+
+        manager.send_progress(
+            ProgressStatusOptions.SUCCESS,
+            "Split document",
+            len(pages),
+            len(pages),
+            extra_args,
+        )
+    return f"Split document {document.id} into {len(pages)} document(s)"
@@ -3,18 +3,30 @@ import io
 import json
 import os
 import shutil
+import warnings
 import zipfile
+from unittest import mock
 
+from asgiref.sync import async_to_sync
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from documents import tasks
+from documents.bulk_download import BULK_DOWNLOAD_FILENAME
+from documents.bulk_download import build_archive
+from documents.bulk_download import get_archive_path
+from documents.file_responses import FILE_CHUNK_SIZE
 from documents.models import Correspondent
 from documents.models import Document
 from documents.models import DocumentType
 from documents.tests.utils import DirectoriesMixin
+from documents.tests.utils import DummyProgressManager
 
 
 class TestBulkDownload(DirectoriesMixin, APITestCase):
@@ -23,8 +35,9 @@ class TestBulkDownload(DirectoriesMixin, APITestCase):
     def setUp(self):
         super().setUp()
 
-        user = User.objects.create_superuser(username="temp_admin")
-        self.client.force_authenticate(user=user)
+        self.user = User.objects.create_superuser(username="temp_admin")
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
 
         self.doc1 = Document.objects.create(title="unrelated", checksum="A")
         self.doc2 = Document.objects.create(
@@ -80,7 +93,7 @@ class TestBulkDownload(DirectoriesMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response["Content-Type"], "application/zip")
 
-        with zipfile.ZipFile(io.BytesIO(response.content)) as zipf:
+        with zipfile.ZipFile(io.BytesIO(response.getvalue())) as zipf:
             self.assertEqual(len(zipf.filelist), 2)
             self.assertIn("2021-01-01 document A.pdf", zipf.namelist())
             self.assertIn("2020-03-21 document B.jpg", zipf.namelist())
@@ -101,7 +114,7 @@ class TestBulkDownload(DirectoriesMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response["Content-Type"], "application/zip")
 
-        with zipfile.ZipFile(io.BytesIO(response.content)) as zipf:
+        with zipfile.ZipFile(io.BytesIO(response.getvalue())) as zipf:
             self.assertEqual(len(zipf.filelist), 2)
             self.assertIn("2021-01-01 document A.pdf", zipf.namelist())
             self.assertIn("2020-03-21 document B.pdf", zipf.namelist())
@@ -122,7 +135,7 @@ class TestBulkDownload(DirectoriesMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response["Content-Type"], "application/zip")
 
-        with zipfile.ZipFile(io.BytesIO(response.content)) as zipf:
+        with zipfile.ZipFile(io.BytesIO(response.getvalue())) as zipf:
             self.assertEqual(len(zipf.filelist), 3)
             self.assertIn("originals/2021-01-01 document A.pdf", zipf.namelist())
             self.assertIn("archive/2020-03-21 document B.pdf", zipf.namelist())
@@ -156,7 +169,7 @@ class TestBulkDownload(DirectoriesMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response["Content-Type"], "application/zip")
 
-        with zipfile.ZipFile(io.BytesIO(response.content)) as zipf:
+        with zipfile.ZipFile(io.BytesIO(response.getvalue())) as zipf:
             self.assertEqual(len(zipf.filelist), 2)
 
             self.assertIn("2021-01-01 document A.pdf", zipf.namelist())
@@ -215,7 +228,7 @@ class TestBulkDownload(DirectoriesMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response["Content-Type"], "application/zip")
 
-        with zipfile.ZipFile(io.BytesIO(response.content)) as zipf:
+        with zipfile.ZipFile(io.BytesIO(response.getvalue())) as zipf:
             self.assertEqual(len(zipf.filelist), 2)
             self.assertIn("a space name/Title 2 - Doc 3.jpg", zipf.namelist())
             self.assertIn("test/This is Doc 2.pdf", zipf.namelist())
@@ -261,7 +274,7 @@ class TestBulkDownload(DirectoriesMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response["Content-Type"], "application/zip")
 
-        with zipfile.ZipFile(io.BytesIO(response.content)) as zipf:
+        with zipfile.ZipFile(io.BytesIO(response.getvalue())) as zipf:
             self.assertEqual(len(zipf.filelist), 2)
             self.assertIn("somewhere/This is Doc 2.pdf", zipf.namelist())
             self.assertIn("somewhere/Title 2 - Doc 3.pdf", zipf.namelist())
@@ -310,7 +323,7 @@ class TestBulkDownload(DirectoriesMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response["Content-Type"], "application/zip")
 
-        with zipfile.ZipFile(io.BytesIO(response.content)) as zipf:
+        with zipfile.ZipFile(io.BytesIO(response.getvalue())) as zipf:
             self.assertEqual(len(zipf.filelist), 3)
             self.assertIn("originals/bill/This is Doc 2.pdf", zipf.namelist())
             self.assertIn("archive/statement/Title 2 - Doc 3.pdf", zipf.namelist())
@@ -333,3 +346,187 @@ class TestBulkDownload(DirectoriesMixin, APITestCase):
                     f.read(),
                     zipf.read("originals/statement/Title 2 - Doc 3.jpg"),
                 )
+
+    def test_streamed_download(self):
+        """
+        GIVEN:
+            - A document larger than one chunk
+        WHEN:
+            - Bulk download request with compression
+        THEN:
+            - The zip file is streamed in several chunks and not compressed again
+            - Nothing is written to the scratch directory
+            - The documents are validated and fetched with one query each
+        """
+        content = os.urandom(3 * FILE_CHUNK_SIZE)
+        self.doc2.source_path.write_bytes(content)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                self.ENDPOINT,
+                json.dumps(
+                    {
+                        "documents": [self.doc2.id, self.doc3.id],
+                        "compression": "lzma",
+                    },
+                ),
+                content_type="application/json",
+                HTTP_ACCEPT_ENCODING="gzip",
+            )
+            document_queries = [
+                query
+                for query in context.captured_queries
+                if '"documents_document"' in query["sql"]
+            ]
+            self.assertEqual(len(document_queries), 2)
+
+        self.assertTrue(response.streaming)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 3)
+        self.assertEqual(list(self.dirs.scratch_dir.iterdir()), [])
+
+        with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zipf:
+            self.assertIsNone(zipf.testzip())
+            self.assertEqual(
+                zipf.getinfo("2021-01-01 document A.pdf").compress_type,
+                zipfile.ZIP_LZMA,
+            )
+            self.assertEqual(zipf.read("2021-01-01 document A.pdf"), content)
+            with self.doc3.archive_file as f:
+                self.assertEqual(f.read(), zipf.read("2020-03-21 document B.pdf"))
+
+    def test_streamed_download_asgi(self):
+        """
+        GIVEN:
+            - A document larger than one chunk
+        WHEN:
+            - The zip file is streamed by an ASGI server
+        THEN:
+            - The first chunk is sent before the zip file is complete
+            - Django doesn't warn about consuming the iterator
+        """
+        self.doc2.source_path.write_bytes(os.urandom(3 * FILE_CHUNK_SIZE))
+        response = self.client.post(
+            self.ENDPOINT,
+            json.dumps({"documents": [self.doc2.id, self.doc3.id]}),
+            content_type="application/json",
+        )
+
+        async def read(response) -> tuple[int, list[bytes]]:
+            parts = []
+            files_after_first_part = None
+            async for part in response:
+                parts.append(part)
+                if files_after_first_part is None:
+                    files_after_first_part = m_from_file.call_count
+            return files_after_first_part, parts
+
+        with mock.patch(
+            "documents.bulk_download.ZipInfo.from_file",
+            side_effect=zipfile.ZipInfo.from_file,
+        ) as m_from_file, warnings.catch_warnings():
+            warnings.simplefilter("error")
+            files_after_first_part, parts = async_to_sync(read)(response)
+
+        self.assertEqual(files_after_first_part, 1)
+        self.assertEqual(m_from_file.call_count, 2)
+        with zipfile.ZipFile(io.BytesIO(b"".join(parts))) as zipf:
+            self.assertIsNone(zipf.testzip())
+
+    @mock.patch("documents.views.build_bulk_download")
+    def test_async_download(self, m_build):
+        """
+        GIVEN:
+            - Bulk download requests in the async mode
+        WHEN:
+            - The same documents are requested again while the zip file is built
+            - The zip file is built and the documents are requested again
+            - A document is changed and the documents are requested again
+        THEN:
+            - The zip file is built once in the background
+            - The built zip file is served, also in the default mode
+            - The zip file is built again for the changed document
+        """
+        request = {
+            "documents": [self.doc2.id, self.doc3.id],
+            "content": "both",
+            "mode": "async",
+        }
+        response = self.client.post(
+            self.ENDPOINT,
+            json.dumps(request),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        task_id = response.data["task_id"]
+        key = response.data["bulk_download"]
+        m_build.apply_async.assert_called_once()
+        self.assertEqual(m_build.apply_async.call_args.kwargs["task_id"], task_id)
+
+        response = self.client.post(
+            self.ENDPOINT,
+            json.dumps(request),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["task_id"], task_id)
+        m_build.apply_async.assert_called_once()
+
+        manager = DummyProgressManager(BULK_DOWNLOAD_FILENAME, task_id)
+        with mock.patch("documents.tasks.ProgressManager", return_value=manager):
+            tasks.build_bulk_download(**m_build.apply_async.call_args.kwargs["kwargs"])
+
+        self.assertEqual(manager.payloads[-1]["data"]["status"], "SUCCESS")
+        self.assertEqual(manager.payloads[-1]["data"]["bulk_download"], key)
+        self.assertEqual(manager.payloads[-1]["data"]["owner_id"], self.user.id)
+
+        del request["mode"]
+        response = self.client.post(
+            self.ENDPOINT,
+            json.dumps(request),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertIn("documents.zip", response["Content-Disposition"])
+        with zipfile.ZipFile(io.BytesIO(response.getvalue())) as zipf:
+            self.assertEqual(len(zipf.filelist), 3)
+            self.assertIn("archive/2020-03-21 document B.pdf", zipf.namelist())
+
+        self.doc2.title = "document C"
+        self.doc2.save()
+        request["mode"] = "async"
+        response = self.client.post(
+            self.ENDPOINT,
+            json.dumps(request),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertNotEqual(response.data["bulk_download"], key)
+        self.assertEqual(m_build.apply_async.call_count, 2)
+
+    def test_remove_expired_downloads(self):
+        """
+        GIVEN:
+            - A zip file which wasn't used for longer than the TTL
+            - A recently used zip file
+        WHEN:
+            - Expired bulk downloads are removed
+        THEN:
+            - Only the expired zip file is removed
+        """
+        old = get_archive_path("old")
+        new = get_archive_path("new")
+        for path in (old, new):
+            build_archive([self.doc2], "archive", zipfile.ZIP_STORED, False, path)
+        os.utime(old, (0, 0))
+
+        self.assertEqual(
+            tasks.remove_expired_bulk_downloads(),
+            "Removed 1 expired bulk download(s)",
+        )
+
+        self.assertFalse(old.exists())
+        self.assertTrue(new.exists())
@@ -784,7 +784,7 @@ class TestBulkEditAPI(DirectoriesMixin, APITestCase):
 
     @mock.patch("documents.serialisers.bulk_edit.rotate")
     def test_rotate(self, m):
-        m.return_value = "OK"
+        m.return_value = "operation-id"
 
         response = self.client.post(
             "/api/documents/bulk_edit/",
@@ -799,6 +799,7 @@ class TestBulkEditAPI(DirectoriesMixin, APITestCase):
         )
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["operation_id"], "operation-id")
 
         m.assert_called_once()
         args, kwargs = m.call_args
@@ -839,7 +840,7 @@ class TestBulkEditAPI(DirectoriesMixin, APITestCase):
 
     @mock.patch("documents.serialisers.bulk_edit.merge")
     def test_merge(self, m):
-        m.return_value = "OK"
+        m.return_value = "task-id"
 
         response = self.client.post(
             "/api/documents/bulk_edit/",
@@ -854,6 +855,7 @@ class TestBulkEditAPI(DirectoriesMixin, APITestCase):
         )
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["task_id"], "task-id")
 
         m.assert_called_once()
         args, kwargs = m.call_args
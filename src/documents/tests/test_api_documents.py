@@ -6,6 +6,8 @@ import uuid
 import zoneinfo
 from binascii import hexlify
 from datetime import timedelta
+from email.parser import BytesParser
+from io import BytesIO
 from pathlib import Path
 from unittest import mock
 
@@ -15,9 +17,12 @@ from django.conf import settings
 from django.contrib.auth.models import Permission
 from django.contrib.auth.models import User
 from django.core.cache import cache
+from django.db import connection
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from guardian.shortcuts import assign_perm
+from PIL import Image
 from rest_framework import status
 from rest_framework.test import APITestCase
 
@@ -36,6 +41,7 @@ from documents.models import SavedView
 from documents.models import ShareLink
 from documents.models import StoragePath
 from documents.models import Tag
+from documents.parsers import parse_date_generator
 from documents.tests.utils import DirectoriesMixin
 from documents.tests.utils import DocumentConsumeDelayMixin
 
@@ -187,17 +193,17 @@ class TestDocumentApi(DirectoriesMixin, DocumentConsumeDelayMixin, APITestCase):
         response = self.client.get(f"/api/documents/{doc.pk}/download/")
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.content, content)
+        self.assertEqual(response.getvalue(), content)
 
         response = self.client.get(f"/api/documents/{doc.pk}/preview/")
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.content, content)
+        self.assertEqual(response.getvalue(), content)
 
         response = self.client.get(f"/api/documents/{doc.pk}/thumb/")
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.content, content_thumbnail)
+        self.assertEqual(response.getvalue(), content_thumbnail)
 
     def test_document_actions_with_perms(self):
         """
@@ -258,6 +264,183 @@ class TestDocumentApi(DirectoriesMixin, DocumentConsumeDelayMixin, APITestCase):
         response = self.client.get(f"/api/documents/{doc.pk}/thumb/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_thumbnail_sizes(self):
+        """
+        GIVEN:
+            - A document with a thumbnail
+        WHEN:
+            - The thumbnail is requested in a size class
+        THEN:
+            - The thumbnail is returned in that size with an ETag
+            - The thumbnail isn't sent again if it is unchanged
+            - Unknown sizes are rejected
+        """
+        doc = Document.objects.create(
+            title="none",
+            checksum="A",
+            mime_type="application/pdf",
+        )
+        Image.new("RGB", (500, 700), "white").save(doc.thumbnail_path, "WEBP")
+
+        response = self.client.get(f"/api/documents/{doc.pk}/thumb/?size=small")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "image/webp")
+        with Image.open(BytesIO(response.getvalue())) as image:
+            self.assertEqual(image.width, 150)
+        etag = response["ETag"]
+
+        response = self.client.get(
+            f"/api/documents/{doc.pk}/thumb/?size=small",
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(f"/api/documents/{doc.pk}/thumb/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+        response = self.client.get(f"/api/documents/{doc.pk}/thumb/?size=huge")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def _read_multipart(self, response) -> dict[str, bytes]:
+        message = BytesParser().parsebytes(
+            f"Content-Type: {response['Content-Type']}\r\n\r\n".encode()
+            + response.content,
+        )
+        return {
+            part.get_param("name", header="Content-Disposition"): part.get_payload(
+                decode=True,
+            )
+            for part in message.get_payload()
+        }
+
+    def test_thumbnail_batch(self):
+        """
+        GIVEN:
+            - Documents of the user, of another user and without thumbnail
+        WHEN:
+            - The thumbnails of all of them are requested at once
+        THEN:
+            - The thumbnails the user may view are returned in one response
+            - The number of queries doesn't depend on the number of documents
+        """
+        user = User.objects.create_user(username="test")
+        user.user_permissions.add(*Permission.objects.filter(codename="view_document"))
+        other_user = User.objects.create_user(username="other")
+        self.client.force_authenticate(user)
+
+        docs = []
+        for i, owner in enumerate([user, None, other_user, user, user]):
+            doc = Document.objects.create(
+                title=f"doc {i}",
+                checksum=str(i),
+                mime_type="application/pdf",
+                owner=owner,
+            )
+            doc.thumbnail_path.write_bytes(f"thumbnail {i}".encode())
+            docs.append(doc)
+        docs[4].thumbnail_path.unlink()
+
+        # Loads the permissions of the user
+        self.client.get(f"/api/documents/thumbs/?ids={docs[0].pk}")
+
+        with CaptureQueriesContext(connection) as few_documents:
+            response = self.client.get(
+                f"/api/documents/thumbs/?ids={docs[0].pk},{docs[1].pk}",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Including a document which doesn't exist
+        ids = ",".join(str(pk) for pk in [*(doc.pk for doc in docs), 9999])
+        with CaptureQueriesContext(connection) as many_documents:
+            response = self.client.get(f"/api/documents/thumbs/?ids={ids}")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("multipart/form-data"))
+        self.assertEqual(
+            self._read_multipart(response),
+            {
+                str(docs[0].pk): b"thumbnail 0",
+                str(docs[1].pk): b"thumbnail 1",
+                str(docs[3].pk): b"thumbnail 3",
+            },
+        )
+        self.assertEqual(len(many_documents), len(few_documents))
+
+    @mock.patch("documents.views.GnuPG.decrypted")
+    def test_thumbnail_batch_validators(self, m_decrypted):
+        """
+        GIVEN:
+            - Documents with thumbnails, one of them encrypted
+        WHEN:
+            - Their thumbnails are requested again with the validators of the
+              first response
+            - One of the thumbnails changed in the meantime
+        THEN:
+            - The response is not sent again while no thumbnail changed
+            - Clients always revalidate the response
+            - The encrypted thumbnail is decrypted from its closed file
+        """
+        m_decrypted.side_effect = lambda handle: b"decrypted " + handle.read()
+        docs = []
+        for i, storage_type in enumerate(
+            [Document.STORAGE_TYPE_UNENCRYPTED, Document.STORAGE_TYPE_GPG],
+        ):
+            doc = Document.objects.create(
+                title=f"doc {i}",
+                checksum=str(i),
+                mime_type="application/pdf",
+                storage_type=storage_type,
+            )
+            doc.thumbnail_path.write_bytes(f"thumbnail {i}".encode())
+            docs.append(doc)
+        url = f"/api/documents/thumbs/?ids={docs[0].pk},{docs[1].pk}"
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertEqual(
+            self._read_multipart(response)[str(docs[1].pk)],
+            b"decrypted thumbnail 1",
+        )
+        self.assertTrue(m_decrypted.call_args.args[0].closed)
+        etag = response["ETag"]
+        last_modified = response["Last-Modified"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        os.utime(docs[0].thumbnail_path, (0, 0))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_thumbnail_batch_invalid(self):
+        """
+        GIVEN:
+            - Requests for several thumbnails
+        WHEN:
+            - The ids are missing, invalid or too many, or the size is unknown
+            - The large size is requested, which must be rendered
+        THEN:
+            - The requests are rejected
+        """
+        for query in [
+            "",
+            "ids=",
+            "ids=1,a",
+            "ids=" + ",".join(str(i) for i in range(1, 102)),
+            "ids=1&size=huge",
+            "ids=1&size=large",
+        ]:
+            response = self.client.get(f"/api/documents/thumbs/?{query}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     @override_settings(FILENAME_FORMAT="")
     def test_download_with_archive(self):
         content = b"This is a test"
@@ -279,26 +462,26 @@ class TestDocumentApi(DirectoriesMixin, DocumentConsumeDelayMixin, APITestCase):
         response = self.client.get(f"/api/documents/{doc.pk}/download/")
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.content, content_archive)
+        self.assertEqual(response.getvalue(), content_archive)
 
         response = self.client.get(
             f"/api/documents/{doc.pk}/download/?original=true",
         )
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.content, content)
+        self.assertEqual(response.getvalue(), content)
 
         response = self.client.get(f"/api/documents/{doc.pk}/preview/")
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.content, content_archive)
+        self.assertEqual(response.getvalue(), content_archive)
 
         response = self.client.get(
             f"/api/documents/{doc.pk}/preview/?original=true",
         )
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.content, content)
+        self.assertEqual(response.getvalue(), content)
 
     def test_document_actions_not_existing_file(self):
         doc = Document.objects.create(
@@ -1390,6 +1573,36 @@ class TestDocumentApi(DirectoriesMixin, DocumentConsumeDelayMixin, APITestCase):
         self.client.get(f"/api/documents/{doc.pk}/suggestions/")
         self.assertFalse(parse_date_generator.called)
 
+    @mock.patch("documents.views.parse_date_generator", wraps=parse_date_generator)
+    @override_settings(NUMBER_OF_SUGGESTED_DATES=10)
+    def test_get_suggestions_dates_cached(self, m_parse_date_generator):
+        """
+        GIVEN:
+            - A document with dates and no classifier
+        WHEN:
+            - Suggestions are requested twice, then the content is changed
+        THEN:
+            - The dates are searched once for the same content
+            - The dates are searched again for changed content
+        """
+        doc = Document.objects.create(
+            title="test",
+            mime_type="application/pdf",
+            content="this is an invoice from 12.04.2022!",
+        )
+
+        for _ in range(2):
+            response = self.client.get(f"/api/documents/{doc.pk}/suggestions/")
+            self.assertEqual(response.data["dates"], ["2022-04-12"])
+        m_parse_date_generator.assert_called_once()
+
+        doc.content = "this is an invoice from 13.04.2022!"
+        doc.save()
+
+        response = self.client.get(f"/api/documents/{doc.pk}/suggestions/")
+        self.assertEqual(response.data["dates"], ["2022-04-13"])
+        self.assertEqual(m_parse_date_generator.call_count, 2)
+
     def test_saved_views(self):
         u1 = User.objects.create_superuser("user1")
         u2 = User.objects.create_superuser("user2")
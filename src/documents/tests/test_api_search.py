@@ -6,7 +6,9 @@ import pytest
 from dateutil.relativedelta import relativedelta
 from django.contrib.auth.models import Permission
 from django.contrib.auth.models import User
+from django.db import connection
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from guardian.shortcuts import assign_perm
 from rest_framework import status
@@ -1125,3 +1127,200 @@ class TestDocumentSearchApi(DirectoriesMixin, APITestCase):
             search_query("&ordering=-owner"),
             [d3.id, d2.id, d1.id],
         )
+
+    def test_search_results_bulk_hydration(self):
+        """
+        GIVEN:
+            - Documents with tags and notes matching a search query
+        WHEN:
+            - A page of search results is requested with different page sizes
+        THEN:
+            - The number of database queries does not grow with the page size
+        """
+        tag = Tag.objects.create(name="tag")
+        with index.open_index_writer() as writer:
+            for i in range(20):
+                doc = Document.objects.create(
+                    checksum=str(i),
+                    pk=i + 1,
+                    title=f"Document {i+1}",
+                    content="content",
+                )
+                doc.tags.add(tag)
+                Note.objects.create(note="a note", document=doc, user=self.user)
+                index.update_document(writer, doc)
+
+        with CaptureQueriesContext(connection) as small_page:
+            response = self.client.get("/api/documents/?query=content&page_size=2")
+        self.assertEqual(len(response.data["results"]), 2)
+
+        with CaptureQueriesContext(connection) as large_page:
+            response = self.client.get("/api/documents/?query=content&page_size=20")
+        self.assertEqual(len(response.data["results"]), 20)
+        self.assertEqual(len(small_page), len(large_page))
+
+        for result in response.data["results"]:
+            self.assertEqual(result["tags"], [tag.id])
+            self.assertEqual(len(result["notes"]), 1)
+
+    def test_search_results_keep_rank_and_skip_stale(self):
+        """
+        GIVEN:
+            - Documents in the index, one of which no longer exists in the database
+        WHEN:
+            - Search results are requested
+        THEN:
+            - Results are returned in rank order
+            - The stale index entry is skipped
+        """
+        d1 = Document.objects.create(
+            title="invoice",
+            content="bank bank bank",
+            checksum="A",
+            pk=1,
+        )
+        d2 = Document.objects.create(
+            title="statement",
+            content="bank",
+            checksum="B",
+            pk=2,
+        )
+        d3 = Document.objects.create(
+            title="letter",
+            content="bank bank",
+            checksum="C",
+            pk=3,
+        )
+        with index.open_index_writer() as writer:
+            index.update_document(writer, d1)
+            index.update_document(writer, d2)
+            index.update_document(writer, d3)
+        d3.delete()
+
+        response = self.client.get("/api/documents/?query=bank")
+        results = response.data["results"]
+
+        self.assertEqual([r["id"] for r in results], [d1.id, d2.id])
+        self.assertEqual(
+            [r["__search_hit__"]["rank"] for r in results],
+            sorted(r["__search_hit__"]["rank"] for r in results),
+        )
+
+    @override_settings(SEARCH_HIGHLIGHT_WINDOW=200)
+    def test_search_highlights_bounded_window(self):
+        """
+        GIVEN:
+            - A document with very long content and a single match far into it
+        WHEN:
+            - Search results with highlights are requested
+        THEN:
+            - The match is highlighted from the bounded content window
+        """
+        content = "filler " * 10000 + "needle in a haystack " + "filler " * 10000
+        doc = Document.objects.create(
+            title="long",
+            content=content,
+            checksum="A",
+            pk=1,
+        )
+        with index.open_index_writer() as writer:
+            index.update_document(writer, doc)
+
+        self.assertLessEqual(
+            len(index.bound_highlight_text(content, frozenset(["needle"]), 200)),
+            200,
+        )
+
+        response = self.client.get("/api/documents/?query=needle")
+        results = response.data["results"]
+
+        self.assertEqual(len(results), 1)
+        self.assertIn(
+            '<span class="match term0">needle</span>',
+            results[0]["__search_hit__"]["highlights"],
+        )
+
+    def test_search_highlights_cached(self):
+        """
+        GIVEN:
+            - A document matching a search query
+        WHEN:
+            - The same search is requested twice
+            - The same search is requested with another highlight window
+        THEN:
+            - Content highlights are only generated once per window
+        """
+        doc = Document.objects.create(
+            title="invoice",
+            content="the thing i bought at a shop and paid with bank account",
+            checksum="A",
+            pk=1,
+        )
+        with index.open_index_writer() as writer:
+            index.update_document(writer, doc)
+
+        with mock.patch(
+            "documents.index.bound_highlight_text",
+            wraps=index.bound_highlight_text,
+        ) as mock_bound:
+            response = self.client.get("/api/documents/?query=bank")
+            first = response.data["results"][0]["__search_hit__"]["highlights"]
+            response = self.client.get("/api/documents/?query=bank")
+            second = response.data["results"][0]["__search_hit__"]["highlights"]
+
+            mock_bound.assert_called_once()
+
+            with override_settings(SEARCH_HIGHLIGHT_WINDOW=20):
+                self.client.get("/api/documents/?query=bank")
+
+            self.assertEqual(mock_bound.call_count, 2)
+
+        self.assertEqual(first, second)
+        self.assertIn("bank", first)
+
+    def test_search_highlights_lazy(self):
+        """
+        GIVEN:
+            - A document matching a search query
+        WHEN:
+            - Search results are requested without highlights
+            - Highlights are requested separately
+        THEN:
+            - The search results contain no highlights
+            - The highlights endpoint returns the highlights of the document
+        """
+        doc = Document.objects.create(
+            title="invoice",
+            content="the thing i bought at a shop and paid with bank account",
+            checksum="A",
+            pk=1,
+        )
+        other = Document.objects.create(
+            title="letter",
+            content="nothing to see here",
+            checksum="B",
+            pk=2,
+        )
+        with index.open_index_writer() as writer:
+            index.update_document(writer, doc)
+            index.update_document(writer, other)
+
+        response = self.client.get("/api/documents/?query=bank&highlights=false")
+        results = response.data["results"]
+        self.assertEqual(len(results), 1)
+        self.assertIsNone(results[0]["__search_hit__"]["highlights"])
+
+        response = self.client.get(f"/api/documents/{doc.pk}/highlights/?query=bank")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(
+            '<span class="match term0">bank</span>',
+            response.data["highlights"],
+        )
+
+        response = self.client.get(
+            f"/api/documents/{other.pk}/highlights/?query=bank",
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get(f"/api/documents/{doc.pk}/highlights/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
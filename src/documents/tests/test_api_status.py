@@ -84,6 +84,64 @@ class TestSystemStatus(APITestCase):
         response = self.client.get(self.ENDPOINT)
         self.assertEqual(response.data["install_type"], "kubernetes")
 
+    @mock.patch("documents.views.get_ocr_cache_statistics")
+    def test_system_status_ocr_cache(self, mock_statistics):
+        """
+        GIVEN:
+            - The OCR cache was used
+        WHEN:
+            - The user requests the system status
+        THEN:
+            - The response contains the number of OCR cache hits and misses
+        """
+        mock_statistics.return_value = {"hits": 3, "misses": 1}
+        self.client.force_login(self.user)
+        response = self.client.get(self.ENDPOINT)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["tasks"]["ocr_cache"],
+            {"hits": 3, "misses": 1},
+        )
+
+    @mock.patch("redis.Redis.execute_command")
+    def test_system_status_queue_depths(self, mock_execute):
+        """
+        GIVEN:
+            - Tasks are waiting in the interactive queue
+        WHEN:
+            - The user requests the system status
+        THEN:
+            - The response contains the number of waiting tasks per queue
+        """
+
+        def execute_command(*args, **kwargs):
+            if args[0] == "LLEN":
+                return 2 if args[1] == "interactive" else 0
+            return True
+
+        mock_execute.side_effect = execute_command
+        self.client.force_login(self.user)
+        response = self.client.get(self.ENDPOINT)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["tasks"]["queue_depths"],
+            {"interactive": 2, "consume": 0, "mail": 0, "celery": 0, "bulk": 0},
+        )
+
+    def test_system_status_queue_depths_unavailable(self):
+        """
+        GIVEN:
+            - Redis is not reachable
+        WHEN:
+            - The user requests the system status
+        THEN:
+            - The response contains no queue depths
+        """
+        self.client.force_login(self.user)
+        response = self.client.get(self.ENDPOINT)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["tasks"]["queue_depths"])
+
     @mock.patch("redis.Redis.execute_command")
     def test_system_status_redis_ping(self, mock_ping):
         """
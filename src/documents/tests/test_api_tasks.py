@@ -54,6 +54,55 @@ class TestTasks(DirectoriesMixin, APITestCase):
         self.assertEqual(returned_task2["status"], celery.states.PENDING)
         self.assertEqual(returned_task2["task_file_name"], task2.task_file_name)
 
+    def test_get_stage_timing_metrics(self):
+        """
+        GIVEN:
+            - Consumption tasks with recorded stage timings
+        WHEN:
+            - API call is made to get the task metrics
+        THEN:
+            - The median and 95th percentile of every stage are returned
+        """
+        for i in range(1, 21):
+            PaperlessTask.objects.create(
+                task_id=str(uuid.uuid4()),
+                task_file_name=f"task_{i}.pdf",
+                stage_timings={
+                    "parse": {"duration": float(i)},
+                    "copy": {"duration": 0.5, "bytes": 100 * i},
+                },
+            )
+        PaperlessTask.objects.create(
+            task_id=str(uuid.uuid4()),
+            task_file_name="pending.pdf",
+        )
+
+        response = self.client.get(self.ENDPOINT + "metrics/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 20)
+        self.assertEqual(
+            response.data["stages"]["parse"],
+            {"count": 20, "p50": 10.0, "p95": 19.0},
+        )
+        self.assertEqual(
+            response.data["stages"]["copy"],
+            {
+                "count": 20,
+                "p50": 0.5,
+                "p95": 0.5,
+                "bytes_p50": 1000,
+                "bytes_p95": 1900,
+            },
+        )
+
+        response = self.client.get(self.ENDPOINT)
+
+        self.assertEqual(
+            response.data[1]["stage_timings"]["parse"],
+            {"duration": 20.0},
+        )
+
     def test_get_single_task_status(self):
         """
         GIVEN
@@ -4,21 +4,30 @@ from unittest import mock
 
 from django.contrib.auth.models import Group
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from guardian.models import UserObjectPermission
 from guardian.shortcuts import assign_perm
 from guardian.shortcuts import get_groups_with_perms
+from guardian.shortcuts import get_perms
 from guardian.shortcuts import get_users_with_perms
 
 from documents import bulk_edit
+from documents import tasks
 from documents.models import Correspondent
 from documents.models import Document
 from documents.models import DocumentType
 from documents.models import StoragePath
 from documents.models import Tag
+from documents.tasks import start_operation_counters
 from documents.tests.utils import DirectoriesMixin
+from documents.tests.utils import DummyProgressManager
+from documents.tests.utils import FileSystemAssertsMixin
 
 
-class TestBulkEdit(DirectoriesMixin, TestCase):
+class TestBulkEdit(DirectoriesMixin, FileSystemAssertsMixin, TestCase):
     def setUp(self):
         super().setUp()
 
@@ -195,6 +204,68 @@ class TestBulkEdit(DirectoriesMixin, TestCase):
             [self.doc3.id, self.doc4.id, self.doc5.id],
         )
 
+    @mock.patch("documents.bulk_edit.remove_deleted_document_files.delay")
+    def test_delete_files(self, m_remove_files):
+        """
+        GIVEN:
+            - Documents with an original, an archive file and a thumbnail
+        WHEN:
+            - The documents are deleted
+        THEN:
+            - The removal of their files is queued once the rows are gone
+            - The files and emptied directories are removed by the task
+        """
+        docs = [self.doc2, self.doc3]
+        for doc in docs:
+            Document.objects.filter(pk=doc.pk).update(
+                mime_type="application/pdf",
+                filename=f"{doc.correspondent.name}/{doc.title}.pdf",
+                archive_checksum=doc.checksum,
+                archive_filename=f"{doc.correspondent.name}/{doc.title}.pdf",
+            )
+            doc.refresh_from_db()
+            for path in (doc.source_path, doc.archive_path, doc.thumbnail_path):
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.touch()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_edit.delete([doc.pk for doc in docs])
+
+        self.assertEqual(Document.objects.count(), 3)
+        m_remove_files.assert_called_once()
+        (documents,) = m_remove_files.call_args.args
+        self.assertEqual(len(documents), 2)
+        for doc in docs:
+            self.assertIsFile(doc.source_path)
+
+        tasks.remove_deleted_document_files(documents)
+
+        for doc in docs:
+            self.assertIsNotFile(doc.source_path)
+            self.assertIsNotFile(doc.archive_path)
+            self.assertIsNotFile(doc.thumbnail_path)
+            self.assertFalse(doc.source_path.parent.exists())
+            self.assertFalse(doc.archive_path.parent.exists())
+
+    @mock.patch("documents.bulk_edit.FILE_REMOVAL_BATCH_SIZE", 2)
+    @mock.patch("documents.bulk_edit.remove_deleted_document_files.delay")
+    def test_delete_files_batches(self, m_remove_files):
+        """
+        GIVEN:
+            - 5 documents and a file removal batch size of 2
+        WHEN:
+            - The documents are deleted
+        THEN:
+            - The removal of their files is queued in 3 batches
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_edit.delete(list(Document.objects.values_list("pk", flat=True)))
+
+        self.assertEqual(
+            [len(call.args[0]) for call in m_remove_files.call_args_list],
+            [2, 2, 1],
+        )
+
     @mock.patch("documents.tasks.bulk_update_documents.delay")
     def test_set_permissions(self, m):
         doc_ids = [self.doc1.id, self.doc2.id, self.doc3.id]
@@ -278,6 +349,60 @@ class TestBulkEdit(DirectoriesMixin, TestCase):
         )
         self.assertEqual(groups_with_perms.count(), 2)
 
+    @mock.patch("documents.tasks.bulk_update_documents.delay")
+    def test_set_permissions_queries(self, m):
+        """
+        GIVEN:
+            - Documents with permissions of a group
+        WHEN:
+            - The permissions of few and of many documents are set
+            - The same permissions are set again
+        THEN:
+            - The number of queries doesn't depend on the number of documents
+            - Change permissions also give view permissions
+            - Other groups lose their permissions, no permission is duplicated
+        """
+        docs = [
+            Document.objects.create(checksum=f"many{i}", title=f"many{i}")
+            for i in range(30)
+        ]
+        for doc in [self.doc1, *docs]:
+            assign_perm("change_document", self.group1, doc)
+
+        permissions = {
+            "view": {"users": [self.user2.id], "groups": []},
+            "change": {"users": [self.user1.id], "groups": [self.group2.id]},
+        }
+
+        def set_permissions(doc_ids) -> int:
+            with CaptureQueriesContext(connection) as context:
+                bulk_edit.set_permissions(doc_ids, set_permissions=permissions)
+            return len(context.captured_queries)
+
+        few_queries = set_permissions([self.doc1.id, self.doc2.id])
+        many_queries = set_permissions([doc.id for doc in docs])
+        self.assertEqual(few_queries, many_queries)
+
+        set_permissions([doc.id for doc in docs])
+
+        for doc in [self.doc1, *docs]:
+            self.assertCountEqual(
+                get_perms(self.user1, doc),
+                ["view_document", "change_document"],
+            )
+            self.assertCountEqual(get_perms(self.user2, doc), ["view_document"])
+            self.assertCountEqual(
+                get_perms(self.group2, doc),
+                ["view_document", "change_document"],
+            )
+            self.assertEqual(get_perms(self.group1, doc), [])
+        self.assertEqual(
+            UserObjectPermission.objects.filter(
+                object_pk__in=[str(doc.pk) for doc in docs],
+            ).count(),
+            3 * len(docs),
+        )
+
 
 class TestPDFActions(DirectoriesMixin, TestCase):
     def setUp(self):
@@ -361,20 +486,30 @@ class TestPDFActions(DirectoriesMixin, TestCase):
             mime_type="image/jpeg",
         )
 
+        self.progress = DummyProgressManager("operation", None)
+        patcher = mock.patch(
+            "documents.tasks.ProgressManager",
+            return_value=self.progress,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+
     @mock.patch("documents.tasks.consume_file.delay")
     def test_merge(self, mock_consume_file):
         """
         GIVEN:
             - Existing documents
         WHEN:
-            - Merge action is called with 3 documents
+            - Merge task runs with 3 documents
         THEN:
             - Consume file should be called
+            - The progress of the merge is reported
         """
         doc_ids = [self.doc1.id, self.doc2.id, self.doc3.id]
         metadata_document_id = self.doc1.id
 
-        result = bulk_edit.merge(doc_ids)
+        tasks.merge_documents(doc_ids)
 
         expected_filename = (
             f"{'_'.join([str(doc_id) for doc_id in doc_ids])[:100]}_merged.pdf"
@@ -387,13 +522,36 @@ class TestPDFActions(DirectoriesMixin, TestCase):
             expected_filename,
         )
         self.assertEqual(consume_file_args[1].title, None)
+        self.assertEqual(
+            [
+                (payload["data"]["status"], payload["data"]["current_progress"])
+                for payload in self.progress.payloads
+            ],
+            [("WORKING", 1), ("WORKING", 2), ("WORKING", 3), ("SUCCESS", 3)],
+        )
 
         # With metadata_document_id overrides
-        result = bulk_edit.merge(doc_ids, metadata_document_id=metadata_document_id)
+        tasks.merge_documents(doc_ids, metadata_document_id=metadata_document_id)
         consume_file_args, _ = mock_consume_file.call_args
         self.assertEqual(consume_file_args[1].title, "A (merged)")
 
-        self.assertEqual(result, "OK")
+    @mock.patch("documents.bulk_edit.merge_documents.delay")
+    def test_merge_queued(self, mock_merge):
+        """
+        GIVEN:
+            - Existing documents
+        WHEN:
+            - Merge action is called
+        THEN:
+            - The merge is queued and the id of its task is returned
+        """
+        mock_merge.return_value.id = "task-id"
+        doc_ids = [self.doc3.id, self.doc1.id]
+
+        result = bulk_edit.merge(doc_ids, metadata_document_id=self.doc1.id)
+
+        mock_merge.assert_called_once_with(doc_ids, self.doc1.id)
+        self.assertEqual(result, "task-id")
 
     @mock.patch("documents.tasks.consume_file.delay")
     @mock.patch("pikepdf.open")
@@ -402,7 +560,7 @@ class TestPDFActions(DirectoriesMixin, TestCase):
         GIVEN:
             - Existing documents
         WHEN:
-            - Merge action is called with 2 documents
+            - Merge task runs with 2 documents
             - Error occurs when opening both files
         THEN:
             - Consume file should not be called
@@ -410,8 +568,8 @@ class TestPDFActions(DirectoriesMixin, TestCase):
         mock_open_pdf.side_effect = Exception("Error opening PDF")
         doc_ids = [self.doc2.id, self.doc3.id]
 
-        with self.assertLogs("paperless.bulk_edit", level="ERROR") as cm:
-            bulk_edit.merge(doc_ids)
+        with self.assertLogs("paperless.tasks", level="ERROR") as cm:
+            tasks.merge_documents(doc_ids)
             error_str = cm.output[0]
             expected_str = (
                 "Error merging document 2, it will not be included in the merge"
@@ -419,6 +577,7 @@ class TestPDFActions(DirectoriesMixin, TestCase):
             self.assertIn(expected_str, error_str)
 
         mock_consume_file.assert_not_called()
+        self.assertEqual(self.progress.payloads[-1]["data"]["status"], "FAILED")
 
     @mock.patch("documents.tasks.consume_file.delay")
     def test_split(self, mock_consume_file):
@@ -426,18 +585,33 @@ class TestPDFActions(DirectoriesMixin, TestCase):
         GIVEN:
             - Existing documents
         WHEN:
-            - Split action is called with 1 document and 2 pages
+            - Split task runs with 1 document and 2 pages
         THEN:
             - Consume file should be called twice
         """
-        doc_ids = [self.doc2.id]
         pages = [[1, 2], [3]]
-        result = bulk_edit.split(doc_ids, pages)
+        tasks.split_document(self.doc2.id, pages)
         self.assertEqual(mock_consume_file.call_count, 2)
         consume_file_args, _ = mock_consume_file.call_args
         self.assertEqual(consume_file_args[1].title, "B (split 2)")
+        self.assertEqual(self.progress.payloads[-1]["data"]["status"], "SUCCESS")
 
-        self.assertEqual(result, "OK")
+    @mock.patch("documents.bulk_edit.split_document.delay")
+    def test_split_queued(self, mock_split):
+        """
+        GIVEN:
+            - Existing documents
+        WHEN:
+            - Split action is called
+        THEN:
+            - The split is queued and the id of its task is returned
+        """
+        mock_split.return_value.id = "task-id"
+
+        result = bulk_edit.split([self.doc2.id], [[1, 2], [3]])
+
+        mock_split.assert_called_once_with(self.doc2.id, [[1, 2], [3]])
+        self.assertEqual(result, "task-id")
 
     @mock.patch("documents.tasks.consume_file.delay")
     @mock.patch("pikepdf.Pdf.save")
@@ -446,77 +620,121 @@ class TestPDFActions(DirectoriesMixin, TestCase):
         GIVEN:
             - Existing documents
         WHEN:
-            - Split action is called with 1 document and 2 page groups
+            - Split task runs with 1 document and 2 page groups
             - Error occurs when saving the files
         THEN:
             - Consume file should not be called
         """
         mock_save_pdf.side_effect = Exception("Error saving PDF")
-        doc_ids = [self.doc2.id]
         pages = [[1, 2], [3]]
 
-        with self.assertLogs("paperless.bulk_edit", level="ERROR") as cm:
-            bulk_edit.split(doc_ids, pages)
+        with self.assertLogs("paperless.tasks", level="ERROR") as cm:
+            tasks.split_document(self.doc2.id, pages)
             error_str = cm.output[0]
             expected_str = "Error splitting document 2"
             self.assertIn(expected_str, error_str)
 
         mock_consume_file.assert_not_called()
 
-    @mock.patch("documents.tasks.bulk_update_documents.s")
-    @mock.patch("documents.tasks.update_document_archive_file.s")
+    @mock.patch("documents.bulk_edit.bulk_update_documents.si")
+    @mock.patch("documents.bulk_edit.rotate_document.si")
     @mock.patch("celery.chord.delay")
-    def test_rotate(self, mock_chord, mock_update_document, mock_update_documents):
+    def test_rotate(self, mock_chord, mock_rotate_document, mock_update_documents):
         """
         GIVEN:
             - Existing documents
         WHEN:
             - Rotate action is called with 2 documents
         THEN:
-            - Rotate action should be called twice
+            - One rotation task is queued per document
+            - The id of the operation is returned
         """
         doc_ids = [self.doc1.id, self.doc2.id]
         result = bulk_edit.rotate(doc_ids, 90)
-        self.assertEqual(mock_update_document.call_count, 2)
+        self.assertEqual(mock_rotate_document.call_count, 2)
+        for call in mock_rotate_document.call_args_list:
+            self.assertEqual(call.args[1:], (90, result, 2))
         mock_update_documents.assert_called_once()
         mock_chord.assert_called_once()
-        self.assertEqual(result, "OK")
 
-    @mock.patch("documents.tasks.bulk_update_documents.s")
-    @mock.patch("documents.tasks.update_document_archive_file.s")
+    @mock.patch("documents.tasks.update_document_archive_file")
+    def test_rotate_document(self, mock_update_archive_file):
+        """
+        GIVEN:
+            - A PDF document
+        WHEN:
+            - The last of two rotation tasks of an operation runs
+        THEN:
+            - The document is rotated and its checksum updated
+            - The archive file is re-created
+            - The end of the operation is reported
+        """
+        start_operation_counters("operation", "documents")
+        tasks.count_operation_step("operation", "documents")
+
+        tasks.rotate_document(self.doc2.id, 90, "operation", 2)
+
+        self.doc2.refresh_from_db()
+        self.assertNotEqual(self.doc2.checksum, "B")
+        mock_update_archive_file.assert_called_once_with(document_id=self.doc2.id)
+        self.assertEqual(self.progress.payloads[-1]["data"]["status"], "SUCCESS")
+
+    @mock.patch("documents.tasks.update_document_archive_file")
+    def test_rotate_deleted_document(self, mock_update_archive_file):
+        """
+        GIVEN:
+            - A document deleted after its rotation was queued
+        WHEN:
+            - The last rotation task of an operation runs for it
+        THEN:
+            - The error is logged
+            - The end of the operation is still reported
+        """
+        start_operation_counters("operation", "documents")
+        tasks.count_operation_step("operation", "documents")
+        self.doc2.delete()
+
+        with self.assertLogs("paperless.tasks", level="ERROR") as cm:
+            tasks.rotate_document(self.doc2.id, 90, "operation", 2)
+        self.assertIn(f"Error rotating document {self.doc2.id}", cm.output[0])
+
+        mock_update_archive_file.assert_not_called()
+        self.assertEqual(self.progress.payloads[-1]["data"]["status"], "SUCCESS")
+
+    @mock.patch("documents.tasks.update_document_archive_file")
     @mock.patch("pikepdf.Pdf.save")
     def test_rotate_with_error(
         self,
         mock_pdf_save,
         mock_update_archive_file,
-        mock_update_documents,
     ):
         """
         GIVEN:
             - Existing documents
         WHEN:
-            - Rotate action is called with 2 documents
+            - Rotate task runs
             - PikePDF raises an error
         THEN:
-            - Rotate action should be called 0 times
+            - The archive file is not re-created
         """
         mock_pdf_save.side_effect = Exception("Error saving PDF")
-        doc_ids = [self.doc2.id, self.doc3.id]
+        start_operation_counters("operation", "documents")
 
-        with self.assertLogs("paperless.bulk_edit", level="ERROR") as cm:
-            bulk_edit.rotate(doc_ids, 90)
+        with self.assertLogs("paperless.tasks", level="ERROR") as cm:
+            tasks.rotate_document(self.doc2.id, 90, "operation", 2)
             error_str = cm.output[0]
             expected_str = "Error rotating document"
             self.assertIn(expected_str, error_str)
             mock_update_archive_file.assert_not_called()
+        self.assertEqual(self.progress.payloads[-1]["data"]["status"], "WORKING")
 
-    @mock.patch("documents.tasks.bulk_update_documents.s")
-    @mock.patch("documents.tasks.update_document_archive_file.s")
+    @mock.patch("documents.bulk_edit.bulk_update_documents.si")
+    @mock.patch("documents.bulk_edit.rotate_document.si")
     @mock.patch("celery.chord.delay")
     def test_rotate_non_pdf(
         self,
         mock_chord,
-        mock_update_document,
+        mock_rotate_document,
         mock_update_documents,
     ):
         """
@@ -528,11 +746,12 @@ class TestPDFActions(DirectoriesMixin, TestCase):
             - Rotate action should be performed 1 time, with the non-PDF document skipped
         """
         with self.assertLogs("paperless.bulk_edit", level="INFO") as cm:
-            result = bulk_edit.rotate([self.doc2.id, self.img_doc.id], 90)
+            bulk_edit.rotate([self.doc2.id, self.img_doc.id], 90)
             output_str = cm.output[1]
             expected_str = "Document 4 is not a PDF, skipping rotation"
             self.assertIn(expected_str, output_str)
-            self.assertEqual(mock_update_document.call_count, 1)
-            mock_update_documents.assert_called_once()
+            self.assertEqual(mock_rotate_document.call_count, 1)
+            mock_update_documents.assert_called_once_with(
+                document_ids=[self.doc2.id],
+            )
             mock_chord.assert_called_once()
-            self.assertEqual(result, "OK")
@@ -1,9 +1,12 @@
 import datetime
+import hashlib
 import os
 import re
 import shutil
 import stat
 import tempfile
+import threading
+import time
 import uuid
 import zoneinfo
 from unittest import mock
@@ -30,9 +33,12 @@ from documents.models import StoragePath
 from documents.models import Tag
 from documents.parsers import DocumentParser
 from documents.parsers import ParseError
+from documents.parsers import parse_date
 from documents.tasks import sanity_check
 from documents.tests.utils import DirectoriesMixin
 from documents.tests.utils import FileSystemAssertsMixin
+from documents.timing import StageTimings
+from documents.timing import recording
 
 
 class TestAttributes(TestCase):
@@ -219,6 +225,43 @@ class FaultyParser(_BaseTestParser):
         raise ParseError("Does not compute.")
 
 
+class ConcurrentThumbnailParser(_BaseTestParser):
+    """
+    Creates its thumbnail from the original file and waits for it while parsing
+    """
+
+    text_layer = "Dated 12.03.2021"
+    parsed_text = "Dated 12.03.2021"
+    fail_parse = False
+
+    def __init__(self, logging_group, progress_callback=None):
+        super().__init__(logging_group, progress_callback)
+        self.thumbnail_started = threading.Event()
+        self.thumbnail_finished = False
+        self.thumbnail_during_parse = False
+
+    def thumbnail_depends_on_parse(self, mime_type):
+        return False
+
+    def get_text_layer(self, document_path, mime_type):
+        return self.text_layer
+
+    def get_thumbnail(self, document_path, mime_type, file_name=None):
+        self.thumbnail_started.set()
+        time.sleep(0.1)
+        _, thumb = tempfile.mkstemp(suffix=".webp", dir=self.tempdir)
+        self.thumbnail_finished = True
+        return thumb
+
+    def parse(self, document_path, mime_type, file_name=None):
+        self.thumbnail_during_parse = self.thumbnail_started.wait(
+            timeout=5 if settings.CONSUMER_PARALLEL_STAGES else 0,
+        )
+        if self.fail_parse:
+            raise ParseError("Does not compute.")
+        self.text = self.parsed_text
+
+
 class FaultyGenericExceptionParser(_BaseTestParser):
     def __init__(self, logging_group, scratch_dir):
         super().__init__(logging_group)
@@ -385,6 +428,42 @@ class TestConsumer(DirectoriesMixin, FileSystemAssertsMixin, TestCase):
         # Skipping seconds and more precise
 
     @override_settings(FILENAME_FORMAT=None)
+    def test_stage_timings(self):
+        """
+        GIVEN:
+            - Stage timings are recorded
+        WHEN:
+            - A document is consumed
+        THEN:
+            - The duration of the stages of the consumer and the handlers of
+              the finished consumption are recorded
+            - The sizes of the copied and placed files are recorded
+        """
+        filename = self.get_test_file()
+        timings = StageTimings()
+
+        with recording(timings):
+            self.consumer.try_consume_file(filename)
+
+        stages = timings.as_dict()
+        for name in [
+            "copy",
+            "mime_type",
+            "parse",
+            "thumbnail",
+            "classifier",
+            "transaction",
+            "store",
+            "match_correspondent",
+            "index",
+            "media_lock_wait",
+            "file_placement",
+            "save",
+        ]:
+            self.assertGreaterEqual(stages[name]["duration"], 0, name)
+        self.assertEqual(stages["copy"]["bytes"], os.path.getsize(self.get_test_file()))
+        self.assertGreater(stages["file_placement"]["bytes"], stages["copy"]["bytes"])
+
     def testDeleteMacFiles(self):
         # https://github.com/jonaswinkler/paperless-ng/discussions/1037
 
@@ -640,6 +719,112 @@ class TestConsumer(DirectoriesMixin, FileSystemAssertsMixin, TestCase):
 
         self._assert_first_last_send_progress(last_status="FAILED")
 
+    def _consume_with_concurrent_parser(self, **parser_attributes):
+        parsers = []
+
+        def make_parser(logging_group, progress_callback=None):
+            parser = ConcurrentThumbnailParser(logging_group, progress_callback)
+            for key, value in parser_attributes.items():
+                setattr(parser, key, value)
+            parsers.append(parser)
+            return parser
+
+        with mock.patch(
+            "documents.parsers.document_consumer_declaration.send",
+        ) as m:
+            m.return_value = [
+                (
+                    None,
+                    {
+                        "parser": make_parser,
+                        "mime_types": {"application/pdf": ".pdf"},
+                        "weight": 0,
+                    },
+                ),
+            ]
+            try:
+                document = self.consumer.try_consume_file(self.get_test_file())
+            except ConsumerError:
+                document = None
+        return document, parsers[0]
+
+    def test_thumbnail_concurrent_with_parse(self):
+        """
+        GIVEN:
+            - A parser whose thumbnail does not depend on the parsed result
+        WHEN:
+            - A document is consumed
+        THEN:
+            - The thumbnail is generated while the document is parsed
+        """
+        document, parser = self._consume_with_concurrent_parser()
+
+        self.assertTrue(parser.thumbnail_during_parse)
+        self.assertIsFile(document.thumbnail_path)
+
+    @override_settings(CONSUMER_PARALLEL_STAGES=False)
+    def test_thumbnail_concurrent_disabled(self):
+        """
+        GIVEN:
+            - A parser whose thumbnail does not depend on the parsed result
+            - Parallel consumer stages are disabled
+        WHEN:
+            - A document is consumed
+        THEN:
+            - The thumbnail is generated after parsing
+        """
+        document, parser = self._consume_with_concurrent_parser()
+
+        self.assertFalse(parser.thumbnail_during_parse)
+        self.assertIsFile(document.thumbnail_path)
+
+    def test_concurrent_stages_finish_on_parse_error(self):
+        """
+        GIVEN:
+            - A parser which fails while the thumbnail is generated
+        WHEN:
+            - A document is consumed
+        THEN:
+            - Consumption fails only after the thumbnail stage has finished
+        """
+        document, parser = self._consume_with_concurrent_parser(fail_parse=True)
+
+        self.assertIsNone(document)
+        self.assertTrue(parser.thumbnail_finished)
+        self.assertEqual(Document.objects.count(), 0)
+
+    @mock.patch("documents.consumer.parse_date", wraps=parse_date)
+    def test_date_from_text_layer(self, m):
+        """
+        GIVEN:
+            - A parser providing a text layer which is equal to the parsed text
+        WHEN:
+            - A document is consumed
+        THEN:
+            - The date found in the text layer is used without parsing it again
+        """
+        document, _ = self._consume_with_concurrent_parser()
+
+        self.assertEqual(document.created.date(), datetime.date(2021, 3, 12))
+        m.assert_called_once()
+
+    @mock.patch("documents.consumer.parse_date", wraps=parse_date)
+    def test_date_from_changed_text(self, m):
+        """
+        GIVEN:
+            - A parser providing a text layer which differs from the parsed text
+        WHEN:
+            - A document is consumed
+        THEN:
+            - The date is taken from the parsed text
+        """
+        document, _ = self._consume_with_concurrent_parser(
+            parsed_text="Dated 14.05.2022",
+        )
+
+        self.assertEqual(document.created.date(), datetime.date(2022, 5, 14))
+        self.assertEqual(m.call_count, 2)
+
     @mock.patch("documents.consumer.Consumer._write")
     def testPostSaveError(self, m):
         filename = self.get_test_file()
@@ -724,6 +909,56 @@ class TestConsumer(DirectoriesMixin, FileSystemAssertsMixin, TestCase):
 
         self._assert_first_last_send_progress()
 
+    def test_duplicate_removes_working_copy(self):
+        """
+        GIVEN:
+            - A document which was already consumed
+        WHEN:
+            - The same file is consumed again
+        THEN:
+            - The consumption fails
+            - The working copy made for checksumming is removed again
+        """
+        self.consumer.try_consume_file(self.get_test_file())
+        scratch_contents = set(self.dirs.scratch_dir.iterdir())
+
+        self.assertRaises(
+            ConsumerError,
+            self.consumer.try_consume_file,
+            self.get_test_file(),
+        )
+
+        self.assertEqual(
+            set(self.dirs.scratch_dir.iterdir()) - scratch_contents,
+            {self.dirs.scratch_dir / "sample.pdf"},
+        )
+
+    def test_checksum_after_pre_consume_script(self):
+        """
+        GIVEN:
+            - A pre-consume script which modifies the working copy
+        WHEN:
+            - A file is consumed
+        THEN:
+            - The document checksum is the checksum of the modified file
+        """
+        with tempfile.NamedTemporaryFile(mode="w", delete=False) as script:
+            script.write("#!/usr/bin/env bash\n")
+            script.write('echo "modified" >> "${DOCUMENT_WORKING_PATH}"\n')
+        self.addCleanup(os.unlink, script.name)
+        os.chmod(script.name, os.stat(script.name).st_mode | stat.S_IEXEC)
+
+        filename = self.get_test_file()
+        with open(filename, "rb") as f:
+            expected = hashlib.md5(f.read() + b"modified\n").hexdigest()
+
+        with override_settings(PRE_CONSUME_SCRIPT=script.name):
+            document = self.consumer.try_consume_file(filename)
+
+        self.assertEqual(document.checksum, expected)
+        with open(document.source_path, "rb") as f:
+            self.assertEqual(hashlib.md5(f.read()).hexdigest(), expected)
+
     @override_settings(CONSUMER_DELETE_DUPLICATES=True)
     def test_delete_duplicate(self):
         dst = self.get_test_file()
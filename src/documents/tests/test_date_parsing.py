@@ -1,5 +1,7 @@
 import datetime
+from unittest import mock
 
+import dateparser
 from dateutil import tz
 from django.conf import settings
 from django.test import TestCase
@@ -330,3 +332,99 @@ class TestDate(TestCase):
             parse_date("", text),
             datetime.datetime(2018, 2, 13, 0, 0, tzinfo=tz.gettz(settings.TIME_ZONE)),
         )
+
+    @mock.patch("dateparser.parse")
+    def test_numeric_dates_without_dateparser(self, m):
+        """
+        GIVEN:
+            - Numeric dates with a 4 digit year
+        WHEN:
+            - The dates are parsed with different date orders
+        THEN:
+            - The dates are parsed according to the date order
+            - An impossible month is swapped with the day, except for DMY
+            - dateparser is not used
+        """
+        for date_order, text, expected in [
+            ("DMY", "12.04.2022", datetime.date(2022, 4, 12)),
+            ("DMY", "1/4/2022", datetime.date(2022, 4, 1)),
+            ("DMY", "4.13.2022", None),
+            ("MDY", "04-12-2022", datetime.date(2022, 4, 12)),
+            ("MDY", "13/4/2022", datetime.date(2022, 4, 13)),
+            ("MDY", "2022-04-12", datetime.date(2022, 4, 12)),
+            ("YMD", "2022/04/12", datetime.date(2022, 4, 12)),
+            ("YMD", "2022.13.04", datetime.date(2022, 4, 13)),
+            ("DMY", "31.02.2022", None),
+        ]:
+            with self.subTest(text=text), override_settings(DATE_ORDER=date_order):
+                date = parse_date("", text)
+                self.assertEqual(
+                    date.date() if date is not None else None,
+                    expected,
+                )
+
+        m.assert_not_called()
+
+    @mock.patch("dateparser.parse", wraps=dateparser.parse)
+    def test_textual_dates_with_dateparser(self, m):
+        """
+        GIVEN:
+            - Dates with a month name or a 2 digit year
+        WHEN:
+            - The dates are parsed
+        THEN:
+            - dateparser parses the dates
+        """
+        self.assertEqual(
+            parse_date("", "Invoice of 12. April 2022"),
+            datetime.datetime(2022, 4, 12, 0, 0, tzinfo=tz.gettz(settings.TIME_ZONE)),
+        )
+        self.assertEqual(
+            parse_date("", "Invoice of 12.04.22"),
+            datetime.datetime(2022, 4, 12, 0, 0, tzinfo=tz.gettz(settings.TIME_ZONE)),
+        )
+        self.assertEqual(m.call_count, 2)
+
+    @mock.patch("dateparser.parse", wraps=dateparser.parse)
+    def test_numeric_dates_other_orders(self, m):
+        """
+        GIVEN:
+            - Numeric dates with a 4 digit year
+        WHEN:
+            - The dates are parsed with the date orders YDM and DYM
+        THEN:
+            - dateparser parses the dates
+        """
+        for date_order, text, expected in [
+            ("YDM", "Paid 17.9.1927 ok", None),
+            ("YDM", "2022.12.04", datetime.date(2022, 4, 12)),
+            ("DYM", "2012/1/23", None),
+            ("DYM", "2022.12.04", datetime.date(2022, 4, 12)),
+        ]:
+            with self.subTest(text=text, date_order=date_order), override_settings(
+                DATE_ORDER=date_order,
+            ):
+                m.reset_mock()
+                date = parse_date("", text)
+                self.assertEqual(
+                    date.date() if date is not None else None,
+                    expected,
+                )
+                m.assert_called()
+
+    @override_settings(DATE_PARSER_SCAN_LIMIT=30)
+    def test_scan_limit(self):
+        """
+        GIVEN:
+            - The content is searched for dates up to 30 characters
+        WHEN:
+            - The content has dates before and after the limit
+        THEN:
+            - Only the date before the limit is found
+        """
+        text = "Invoice of 12.04.2022, " + "x" * 20 + " paid on 14.05.2022"
+
+        self.assertEqual(
+            [date.date() for date in parse_date_generator("", text)],
+            [datetime.date(2022, 4, 12)],
+        )
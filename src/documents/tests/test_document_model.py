@@ -41,10 +41,10 @@ class TestDocument(TestCase):
         Path(file_path).touch()
         Path(thumb_path).touch()
 
-        with mock.patch("documents.signals.handlers.os.unlink") as mock_unlink:
+        with mock.patch("documents.file_handling.os.unlink") as mock_unlink:
             document.delete()
-            mock_unlink.assert_any_call(file_path)
-            mock_unlink.assert_any_call(thumb_path)
+            mock_unlink.assert_any_call(str(file_path))
+            mock_unlink.assert_any_call(str(thumb_path))
             self.assertEqual(mock_unlink.call_count, 2)
 
     def test_file_name(self):
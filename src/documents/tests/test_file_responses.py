@@ -0,0 +1,241 @@
+import warnings
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from documents.file_responses import RangeNotSatisfiableError
+from documents.file_responses import SyncStreamingHttpResponse
+from documents.file_responses import parse_range
+from documents.models import Document
+from documents.tests.utils import DirectoriesMixin
+
+
+class TestParseRange(TestCase):
+    def test_parse_range(self):
+        """
+        GIVEN:
+            - Range headers
+        WHEN:
+            - The range of a 100 byte file is parsed
+        THEN:
+            - The first and the last byte are returned
+            - The whole file is sent for invalid headers and several ranges
+        """
+        for header, expected in [
+            ("bytes=0-9", (0, 9)),
+            ("bytes=90-", (90, 99)),
+            ("bytes=90-200", (90, 99)),
+            ("bytes=-10", (90, 99)),
+            ("bytes=-200", (0, 99)),
+            ("bytes=10-5", None),
+            ("bytes=0-9,20-29", None),
+            ("bytes=-", None),
+            ("items=0-9", None),
+        ]:
+            with self.subTest(header=header):
+                self.assertEqual(parse_range(header, 100), expected)
+
+    def test_range_not_satisfiable(self):
+        """
+        GIVEN:
+            - Ranges beyond the end of the file
+        WHEN:
+            - The range is parsed
+        THEN:
+            - An error is raised
+        """
+        for header, size in [("bytes=100-", 100), ("bytes=-0", 100), ("bytes=-5", 0)]:
+            with self.subTest(header=header), self.assertRaises(
+                RangeNotSatisfiableError,
+            ):
+                parse_range(header, size)
+
+
+async def _read_async(response, limit=None) -> list[bytes]:
+    parts = []
+    async for part in response:
+        parts.append(part)
+        if limit is not None and len(parts) >= limit:
+            break
+    return parts
+
+
+class TestSyncStreamingHttpResponse(TestCase):
+    def test_async_iteration(self):
+        """
+        GIVEN:
+            - A response streaming a synchronous iterator
+        WHEN:
+            - The response is served asynchronously
+        THEN:
+            - The chunks are pulled one at a time, not collected first
+            - Django doesn't warn about consuming the iterator
+        """
+        pulled = []
+
+        def chunks():
+            for i in range(3):
+                pulled.append(i)
+                yield str(i).encode()
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            parts = async_to_sync(_read_async)(
+                SyncStreamingHttpResponse(chunks()),
+                limit=1,
+            )
+            self.assertEqual(parts, [b"0"])
+            self.assertEqual(pulled, [0])
+
+            parts = async_to_sync(_read_async)(SyncStreamingHttpResponse(chunks()))
+            self.assertEqual(parts, [b"0", b"1", b"2"])
+
+
+class TestFileResponses(DirectoriesMixin, APITestCase):
+    CONTENT = b"0123456789" * 10
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_superuser(username="temp_admin")
+        self.client.force_authenticate(user=self.user)
+
+        self.doc = Document.objects.create(
+            title="none",
+            checksum="abc",
+            filename="document.pdf",
+            mime_type="application/pdf",
+        )
+        self.doc.source_path.write_bytes(self.CONTENT)
+        self.url = f"/api/documents/{self.doc.pk}/preview/"
+
+    def test_range(self):
+        """
+        GIVEN:
+            - A document
+        WHEN:
+            - Byte ranges of the document are requested
+        THEN:
+            - Only the requested bytes are sent
+            - Ranges beyond the end of the file are rejected
+        """
+        response = self.client.get(self.url, HTTP_RANGE="bytes=10-19")
+
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response.getvalue(), self.CONTENT[10:20])
+        self.assertEqual(response["Content-Range"], "bytes 10-19/100")
+        self.assertEqual(response["Content-Length"], "10")
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=-5")
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response.getvalue(), self.CONTENT[-5:])
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=100-")
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+        )
+        self.assertEqual(response["Content-Range"], "bytes */100")
+
+    @mock.patch("documents.file_responses.FILE_CHUNK_SIZE", 10)
+    def test_async_stream(self):
+        """
+        GIVEN:
+            - A document
+        WHEN:
+            - The document is served asynchronously
+        THEN:
+            - The document is sent in chunks
+        """
+        response = self.client.get(self.url)
+
+        parts = async_to_sync(_read_async)(response)
+        self.assertEqual(len(parts), 10)
+        self.assertEqual(b"".join(parts), self.CONTENT)
+
+    def test_if_range(self):
+        """
+        GIVEN:
+            - A document
+        WHEN:
+            - A byte range is requested only if the ETag matches
+        THEN:
+            - The range is sent if the ETag matches
+            - The whole document is sent otherwise
+        """
+        response = self.client.get(
+            self.url,
+            HTTP_RANGE="bytes=0-9",
+            HTTP_IF_RANGE='"abc"',
+        )
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+
+        response = self.client.get(
+            self.url,
+            HTTP_RANGE="bytes=0-9",
+            HTTP_IF_RANGE='"changed"',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.getvalue(), self.CONTENT)
+
+    def test_etag(self):
+        """
+        GIVEN:
+            - A document
+        WHEN:
+            - The document is downloaded, then downloaded again with its ETag
+        THEN:
+            - The ETag is the checksum
+            - The document isn't sent again
+            - The response isn't compressed, it supports ranges
+        """
+        url = f"/api/documents/{self.doc.pk}/download/"
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(response["ETag"], '"abc"')
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='"abc"')
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @override_settings(SENDFILE_HEADER="x-accel-redirect")
+    def test_x_accel_redirect(self):
+        """
+        GIVEN:
+            - Sending files is left to nginx
+        WHEN:
+            - A document is downloaded
+        THEN:
+            - The internal location of the file is returned instead of the file
+        """
+        response = self.client.get(f"/api/documents/{self.doc.pk}/download/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response["X-Accel-Redirect"],
+            "/media-internal/documents/originals/document.pdf",
+        )
+        self.assertEqual(response.content, b"")
+        self.assertIn("attachment", response["Content-Disposition"])
+
+    @override_settings(SENDFILE_HEADER="x-sendfile")
+    def test_x_sendfile(self):
+        """
+        GIVEN:
+            - Sending files is left to the web server
+        WHEN:
+            - A thumbnail is requested
+        THEN:
+            - The path of the file is returned instead of the file
+        """
+        self.doc.thumbnail_path.write_bytes(b"thumbnail")
+
+        response = self.client.get(f"/api/documents/{self.doc.pk}/thumb/")
+
+        self.assertEqual(response["X-Sendfile"], str(self.doc.thumbnail_path))
+        self.assertEqual(response.content, b"")
@@ -90,3 +90,36 @@ class TestAutoComplete(DirectoriesMixin, TestCase):
             _, kwargs = mocked_update_doc.call_args
 
             self.assertIsNone(kwargs["asn"])
+
+
+class TestDeferredUpdates(DirectoriesMixin, TestCase):
+    @mock.patch("documents.index.open_index_writer")
+    def test_deferred_updates(self, m_writer):
+        """
+        GIVEN:
+            - Index updates are deferred
+        WHEN:
+            - Documents are added, one of them twice, and one is deleted again
+        THEN:
+            - The index is written once after the context
+            - Every remaining document is updated once
+        """
+        doc1 = Document.objects.create(title="doc1", checksum="A", content="a")
+        doc2 = Document.objects.create(title="doc2", checksum="B", content="b")
+        doc3 = Document.objects.create(title="doc3", checksum="C", content="c")
+
+        with mock.patch("documents.index.update_document") as m_update:
+            with index.deferred_updates():
+                index.add_or_update_document(doc1)
+                index.add_or_update_document(doc2)
+                index.add_or_update_document(doc1)
+                index.add_or_update_document(doc3)
+                doc3.delete()
+
+                m_writer.assert_not_called()
+
+        m_writer.assert_called_once()
+        self.assertCountEqual(
+            [call.args[1] for call in m_update.call_args_list],
+            [doc1, doc2],
+        )
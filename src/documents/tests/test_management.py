@@ -1,17 +1,21 @@
 import filecmp
 import hashlib
+import json
 import os
 import shutil
 import tempfile
 from pathlib import Path
 from unittest import mock
 
+from django.conf import settings
+from django.core.management import CommandError
 from django.core.management import call_command
 from django.test import TestCase
 from django.test import override_settings
 
 from documents.file_handling import generate_filename
 from documents.models import Document
+from documents.parsers import ParseError
 from documents.tasks import update_document_archive_file
 from documents.tests.utils import DirectoriesMixin
 from documents.tests.utils import FileSystemAssertsMixin
@@ -181,6 +185,197 @@ class TestMakeIndex(TestCase):
         m.assert_called_once()
 
 
+class TestDateBenchmark(DirectoriesMixin, TestCase):
+    def test_benchmark(self):
+        """
+        GIVEN:
+            - Synthetic documents with many date-like numbers
+        WHEN:
+            - The date benchmark is run
+        THEN:
+            - Both date parsers are timed for every document
+            - Both date parsers find the same dates
+        """
+        output = Path(self.dirs.scratch_dir) / "benchmark.json"
+
+        call_command(
+            "document_date_benchmark",
+            "--documents",
+            "3",
+            "--words-per-document",
+            "200",
+            "--output",
+            str(output),
+        )
+
+        results = json.loads(output.read_text())
+        self.assertEqual(results["current"]["count"], 3)
+        self.assertEqual(results["reference"]["count"], 3)
+        self.assertEqual(results["documents_with_different_dates"], 0)
+
+
+class TestSearchBenchmark(DirectoriesMixin, TestCase):
+    def test_benchmark(self):
+        """
+        GIVEN:
+            - An existing document
+        WHEN:
+            - The search benchmark is run for two corpus sizes, looking up
+              fewer documents at once than are generated
+        THEN:
+            - Results are written for each size
+            - The generated documents are removed again
+            - The real index is not touched
+        """
+        Document.objects.create(checksum="A", title="A", content="existing")
+        output = Path(self.dirs.scratch_dir) / "benchmark.json"
+        index_dir = settings.INDEX_DIR
+
+        with mock.patch(
+            "documents.management.commands.document_search_benchmark.QUERY_BATCH_SIZE",
+            4,
+        ):
+            call_command(
+                "document_search_benchmark",
+                "--sizes",
+                "5",
+                "10",
+                "--words-per-document",
+                "50",
+                "--queries",
+                "2",
+                "--output",
+                str(output),
+                "--no-progress-bar",
+            )
+
+        self.assertEqual(settings.INDEX_DIR, index_dir)
+        results = json.loads(output.read_text())
+        self.assertEqual([run["documents"] for run in results["runs"]], [5, 10])
+        self.assertEqual(
+            [run["indexed_documents"] for run in results["runs"]],
+            [6, 11],
+        )
+        for run in results["runs"]:
+            self.assertGreater(run["index_size_bytes"], 0)
+            # 2 queries with 3 pages each
+            self.assertEqual(run["full_text_query"]["count"], 6)
+            self.assertEqual(run["autocomplete"]["count"], 2)
+            self.assertEqual(run["more_like_this"]["count"], 2)
+            self.assertLessEqual(
+                run["full_text_query"]["p50_ms"],
+                run["full_text_query"]["p95_ms"],
+            )
+
+        self.assertEqual(Document.objects.count(), 1)
+        self.assertEqual(list(self.dirs.index_dir.iterdir()), [])
+
+
+class TestThumbnailBenchmark(DirectoriesMixin, TestCase):
+    def test_benchmark(self):
+        """
+        GIVEN:
+            - A PDF file
+        WHEN:
+            - The thumbnail benchmark is run
+        THEN:
+            - Both renderers are timed for every repetition
+            - Failed renderings are counted
+        """
+        output = Path(self.dirs.scratch_dir) / "benchmark.json"
+
+        def render(path, temp_dir):
+            thumbnail = Path(temp_dir) / "thumbnail.webp"
+            thumbnail.write_bytes(b"thumbnail")
+            return thumbnail
+
+        with mock.patch.dict(
+            "documents.management.commands.document_thumbnail_benchmark.RENDERERS",
+            {
+                "convert": mock.Mock(side_effect=ParseError("Convert failed")),
+                "ghostscript": render,
+            },
+        ):
+            call_command(
+                "document_thumbnail_benchmark",
+                sample_file,
+                "--repeat",
+                "2",
+                "--output",
+                str(output),
+            )
+
+        results = json.loads(output.read_text())
+        self.assertEqual(results["parameters"]["files"], 1)
+        self.assertEqual(
+            results["convert"],
+            {"count": 0, "failures": 2, "mean_bytes": None},
+        )
+        self.assertEqual(results["ghostscript"]["count"], 2)
+        self.assertEqual(results["ghostscript"]["mean_bytes"], 9)
+        self.assertNotIn("speedup_p50", results)
+
+
+class TestStartupProfile(DirectoriesMixin, TestCase):
+    def test_startup_within_budget(self):
+        """
+        GIVEN:
+            - A generous budget for starting up
+        WHEN:
+            - Starting management commands and workers is profiled
+        THEN:
+            - Both start within the budget
+            - The slowest modules are reported
+            - No heavy library except magic is imported before there is work
+        """
+        output = Path(self.dirs.scratch_dir) / "startup.json"
+
+        call_command(
+            "document_startup_profile",
+            "--targets",
+            "manage",
+            "worker",
+            "--repeat",
+            "1",
+            "--top",
+            "5",
+            "--budget",
+            "10",
+            "--output",
+            str(output),
+        )
+
+        results = json.loads(output.read_text())["targets"]
+        self.assertCountEqual(results.keys(), ["manage", "worker"])
+        for result in results.values():
+            self.assertLess(result["wall_seconds"], 10)
+            self.assertEqual(len(result["top_cumulative"]), 5)
+            self.assertEqual(len(result["top_self"]), 5)
+            self.assertLessEqual(set(result["heavy_packages"]), {"magic"})
+
+    def test_startup_over_budget(self):
+        """
+        GIVEN:
+            - A budget no process can start within
+        WHEN:
+            - Starting management commands is profiled
+        THEN:
+            - The command fails
+        """
+        with self.assertRaisesMessage(CommandError, "took longer than"):
+            call_command(
+                "document_startup_profile",
+                "--targets",
+                "manage",
+                "--repeat",
+                "1",
+                "--budget",
+                "0",
+                "--output",
+                str(Path(self.dirs.scratch_dir) / "startup.json"),
+            )
+
+
 class TestRenamer(DirectoriesMixin, FileSystemAssertsMixin, TestCase):
     @override_settings(FILENAME_FORMAT="")
     def test_rename(self):
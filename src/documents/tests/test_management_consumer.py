@@ -340,6 +340,39 @@ class TestConsumer(DirectoriesMixin, ConsumerThreadMixin, TransactionTestCase):
         self.consume_file_mock.assert_not_called()
 
 
+class TestConsumerBatches(DirectoriesMixin, TransactionTestCase):
+    sample_file = ConsumerThreadMixin.sample_file
+
+    @override_settings(CONSUMER_BATCH_SIZE=2)
+    @mock.patch("documents.management.commands.document_consumer.consume_file")
+    @mock.patch("documents.management.commands.document_consumer.consume_file_batch")
+    def test_consume_existing_files_in_batches(self, m_batch, m_single):
+        """
+        GIVEN:
+            - A batch size of 2
+            - 3 files in the consumption directory
+        WHEN:
+            - The consumer runs once
+        THEN:
+            - 2 files are queued as a batch, each with its own task id
+            - The remaining file is queued on its own
+        """
+        for name in ["a.pdf", "b.pdf", "c.pdf"]:
+            shutil.copy(self.sample_file, self.dirs.consumption_dir / name)
+
+        call_command("document_consumer", "--oneshot")
+
+        m_batch.delay.assert_called_once()
+        (batch,) = m_batch.delay.call_args.args
+        self.assertEqual(len(batch), 2)
+        self.assertNotEqual(batch[0][0], batch[1][0])
+
+        m_single.apply_async.assert_called_once()
+        ((input_doc, _),), kwargs = m_single.apply_async.call_args
+        self.assertNotIn(input_doc, [file[1] for file in batch])
+        self.assertIn("task_id", kwargs)
+
+
 @override_settings(
     CONSUMER_POLLING=1,
     # please leave the delay here and down below
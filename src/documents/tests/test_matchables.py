@@ -383,6 +383,30 @@ class TestCaseSensitiveMatching(_TestMatchingBase):
 
 
 @override_settings(POST_CONSUME_SCRIPT=None)
+class TestSharedMatchingModels(TestCase):
+    def test_models_loaded_once(self):
+        """
+        GIVEN:
+            - Matching models are shared
+        WHEN:
+            - Several documents are matched
+        THEN:
+            - The tags are only loaded from the database for the first document
+            - Outside of the context, they are loaded every time
+        """
+        Tag.objects.create(name="invoice", match="invoice")
+        doc1 = Document(content="an invoice")
+        doc2 = Document(content="another invoice")
+
+        with matching.shared_matching_models():
+            self.assertEqual(len(matching.match_tags(doc1, None)), 1)
+            with self.assertNumQueries(0):
+                self.assertEqual(len(matching.match_tags(doc2, None)), 1)
+
+        with self.assertNumQueries(1):
+            matching.match_tags(doc2, None)
+
+
 class TestDocumentConsumptionFinishedSignal(TestCase):
     """
     We make use of document_consumption_finished, so we should test that it's
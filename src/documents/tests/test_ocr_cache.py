@@ -0,0 +1,166 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from documents.ocr_cache import OcrCache
+from documents.ocr_cache import get_ocr_cache_key
+from documents.ocr_cache import get_ocr_cache_statistics
+
+
+class TestOcrCache(TestCase):
+    SAMPLE_FILE = Path(__file__).parent / "samples" / "simple.pdf"
+
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.ocr_cache = OcrCache(self.tmp_dir / "cache", 1024 * 1024)
+
+        self.sidecar = self.tmp_dir / "sidecar.txt"
+        self.sidecar.write_text("The text")
+        self.archive = self.tmp_dir / "archive.pdf"
+        shutil.copy(self.SAMPLE_FILE, self.archive)
+
+        self.restored_sidecar = self.tmp_dir / "restored-sidecar.txt"
+        self.restored_archive = self.tmp_dir / "restored-archive.pdf"
+
+    def test_cache_key(self):
+        """
+        GIVEN:
+            - OCR parameters
+        WHEN:
+            - Cache keys are computed
+        THEN:
+            - Locations of files and the number of threads don't change the key
+            - Parameters affecting the result do
+        """
+        parameters = {"input_file": "a.pdf", "language": "eng", "jobs": 4}
+
+        key = get_ocr_cache_key(self.SAMPLE_FILE, parameters)
+
+        self.assertEqual(
+            key,
+            get_ocr_cache_key(
+                self.SAMPLE_FILE,
+                {"input_file": "b.pdf", "language": "eng", "jobs": 1},
+            ),
+        )
+        self.assertNotEqual(
+            key,
+            get_ocr_cache_key(self.SAMPLE_FILE, {**parameters, "language": "deu"}),
+        )
+        self.assertNotEqual(
+            key,
+            get_ocr_cache_key(self.SAMPLE_FILE, parameters, checksum="other"),
+        )
+
+    def test_store_and_restore(self):
+        """
+        GIVEN:
+            - An OCR result is stored
+        WHEN:
+            - The result is restored
+        THEN:
+            - The sidecar text and archive file are restored
+            - Hits and misses are counted
+        """
+        self.assertFalse(
+            self.ocr_cache.restore(
+                "abcd",
+                self.restored_sidecar,
+                self.restored_archive,
+                require_archive=True,
+            ),
+        )
+
+        self.ocr_cache.store("abcd", self.sidecar, self.archive)
+
+        self.assertTrue(
+            self.ocr_cache.restore(
+                "abcd",
+                self.restored_sidecar,
+                self.restored_archive,
+                require_archive=True,
+            ),
+        )
+        self.assertEqual(self.restored_sidecar.read_text(), "The text")
+        self.assertEqual(
+            self.restored_archive.read_bytes(),
+            self.SAMPLE_FILE.read_bytes(),
+        )
+        self.assertEqual(get_ocr_cache_statistics(), {"hits": 1, "misses": 1})
+
+    def test_restore_without_archive(self):
+        """
+        GIVEN:
+            - An OCR result is stored without its archive file
+        WHEN:
+            - The result is restored
+        THEN:
+            - It is only used if the archive file is not required
+        """
+        self.ocr_cache.store("abcd", self.sidecar, None)
+
+        self.assertFalse(
+            self.ocr_cache.restore(
+                "abcd",
+                self.restored_sidecar,
+                self.restored_archive,
+                require_archive=True,
+            ),
+        )
+        self.assertTrue(
+            self.ocr_cache.restore(
+                "abcd",
+                self.restored_sidecar,
+                self.restored_archive,
+                require_archive=False,
+            ),
+        )
+        self.assertFalse(self.restored_archive.exists())
+
+    @mock.patch("documents.ocr_cache.OCR_CACHE_EVICT_INTERVAL", 2)
+    @mock.patch("documents.ocr_cache.OcrCache.evict")
+    def test_evict_interval(self, m_evict):
+        """
+        GIVEN:
+            - A cache evicting entries every 2 new entries
+        WHEN:
+            - 3 results are stored
+        THEN:
+            - Entries are evicted once
+        """
+        for key in ["aaaa", "bbbb", "cccc"]:
+            self.ocr_cache.store(key, self.sidecar, self.archive)
+
+        m_evict.assert_called_once()
+
+    @mock.patch("documents.ocr_cache.OCR_CACHE_EVICT_INTERVAL", 1)
+    def test_evict_least_recently_used(self):
+        """
+        GIVEN:
+            - A cache which fits 2 results
+        WHEN:
+            - A third result is stored
+        THEN:
+            - The least recently used result is removed
+        """
+        entry_size = self.sidecar.stat().st_size + self.archive.stat().st_size
+        self.ocr_cache.max_size = 2 * entry_size
+
+        self.ocr_cache.store("aaaa", self.sidecar, self.archive)
+        self.ocr_cache.store("bbbb", self.sidecar, self.archive)
+        # Make aaaa the most recently used one
+        os.utime(self.ocr_cache._entry_dir("bbbb"), (0, 0))
+
+        self.ocr_cache.store("cccc", self.sidecar, self.archive)
+
+        self.assertTrue(self.ocr_cache._entry_dir("aaaa").is_dir())
+        self.assertFalse(self.ocr_cache._entry_dir("bbbb").exists())
+        self.assertTrue(self.ocr_cache._entry_dir("cccc").is_dir())
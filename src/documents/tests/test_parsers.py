@@ -1,14 +1,18 @@
+from pathlib import Path
 from tempfile import TemporaryDirectory
 from unittest import mock
 
+import pikepdf
 from django.apps import apps
 from django.test import TestCase
 from django.test import override_settings
+from PIL import Image
 
 from documents.parsers import get_default_file_extension
 from documents.parsers import get_parser_class_for_mime_type
 from documents.parsers import get_supported_file_extensions
 from documents.parsers import is_file_ext_supported
+from documents.parsers import make_thumbnail_from_pdf
 from paperless_tesseract.parsers import RasterisedDocumentParser
 from paperless_text.parsers import TextDocumentParser
 from paperless_tika.parsers import TikaDocumentParser
@@ -226,3 +230,132 @@ class TestParserAvailability(TestCase):
         self.assertTrue(is_file_ext_supported(".pdf"))
         self.assertFalse(is_file_ext_supported(".hsdfh"))
         self.assertFalse(is_file_ext_supported(""))
+
+
+@override_settings(THUMBNAIL_RENDERER="ghostscript")
+@mock.patch("documents.parsers.subprocess")
+class TestPdfThumbnail(TestCase):
+    SAMPLE_FILE = Path(__file__).parent / "samples" / "simple.pdf"
+
+    def setUp(self) -> None:
+        super().setUp()
+        temp_dir = TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_dir = temp_dir.name
+
+    @staticmethod
+    def fake_gs(size):
+        def run(cmd):
+            Image.new("RGB", size, "white").save(cmd[cmd.index("-o") + 1])
+            return mock.Mock(returncode=0)
+
+        return run
+
+    def test_thumbnail_at_target_resolution(self, m_subprocess):
+        """
+        GIVEN:
+            - The ghostscript thumbnail renderer
+        WHEN:
+            - The thumbnail of a letter sized PDF is made
+        THEN:
+            - Only the first page is rendered, at the resolution for 500px
+            - A 500px wide WebP thumbnail is returned
+        """
+        m_subprocess.run.side_effect = self.fake_gs((501, 648))
+
+        thumbnail = make_thumbnail_from_pdf(self.SAMPLE_FILE, self.temp_dir)
+
+        cmd = m_subprocess.run.call_args.args[0]
+        self.assertIn("-dFirstPage=1", cmd)
+        self.assertIn("-dLastPage=1", cmd)
+        # 500px for 612pt
+        self.assertIn("-r58.824", cmd)
+        with Image.open(thumbnail) as image:
+            self.assertEqual(image.format, "WEBP")
+            self.assertEqual(image.width, 500)
+
+    def test_thumbnail_rotated_small_page(self, m_subprocess):
+        """
+        GIVEN:
+            - A small page which is rotated
+        WHEN:
+            - The thumbnail is made
+        THEN:
+            - The rotated width is used and the resolution is at most 300 DPI
+        """
+        small_pdf = Path(self.temp_dir) / "small.pdf"
+        with pikepdf.Pdf.new() as pdf:
+            pdf.add_blank_page(page_size=(200, 100))
+            pdf.pages[0].obj.Rotate = 90
+            pdf.save(small_pdf)
+        m_subprocess.run.side_effect = self.fake_gs((417, 834))
+
+        thumbnail = make_thumbnail_from_pdf(small_pdf, self.temp_dir)
+
+        self.assertIn("-r300.000", m_subprocess.run.call_args.args[0])
+        with Image.open(thumbnail) as image:
+            self.assertEqual(image.size, (417, 834))
+
+    def test_thumbnail_inherited_rotation(self, m_subprocess):
+        """
+        GIVEN:
+            - A small page which inherits its rotation from the page tree
+        WHEN:
+            - The thumbnail is made
+        THEN:
+            - The rotated width is used
+        """
+        small_pdf = Path(self.temp_dir) / "small.pdf"
+        small_pdf.write_bytes(
+            b"%PDF-1.4\n"
+            b"1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n"
+            b"2 0 obj << /Type /Pages /Kids [3 0 R] /Count 1 "
+            b"/MediaBox [0 0 200 100] /Rotate 90 >> endobj\n"
+            b"3 0 obj << /Type /Page /Parent 2 0 R >> endobj\n"
+            b"trailer << /Root 1 0 R >>\n"
+            b"%%EOF\n",
+        )
+        m_subprocess.run.side_effect = self.fake_gs((417, 834))
+
+        make_thumbnail_from_pdf(small_pdf, self.temp_dir)
+
+        self.assertIn("-r300.000", m_subprocess.run.call_args.args[0])
+
+    @mock.patch("documents.parsers.run_convert")
+    def test_thumbnail_page_without_size(self, m_convert, m_subprocess):
+        """
+        GIVEN:
+            - A page with a zero width crop box
+        WHEN:
+            - The thumbnail is made
+        THEN:
+            - Ghostscript isn't run and the thumbnail is made with convert
+        """
+        empty_pdf = Path(self.temp_dir) / "empty.pdf"
+        with pikepdf.Pdf.new() as pdf:
+            pdf.add_blank_page(page_size=(200, 100))
+            pdf.pages[0].obj.CropBox = pikepdf.Array([0, 0, 0, 100])
+            pdf.save(empty_pdf)
+
+        thumbnail = make_thumbnail_from_pdf(empty_pdf, self.temp_dir)
+
+        m_subprocess.run.assert_not_called()
+        m_convert.assert_called_once()
+        self.assertEqual(Path(thumbnail).name, "convert.webp")
+
+    @mock.patch("documents.parsers.run_convert")
+    def test_thumbnail_falls_back_to_convert(self, m_convert, m_subprocess):
+        """
+        GIVEN:
+            - The ghostscript thumbnail renderer
+        WHEN:
+            - Ghostscript fails
+        THEN:
+            - The thumbnail is made with convert
+        """
+        m_subprocess.run.return_value = mock.Mock(returncode=1)
+
+        thumbnail = make_thumbnail_from_pdf(self.SAMPLE_FILE, self.temp_dir)
+
+        m_convert.assert_called_once()
+        self.assertEqual(Path(thumbnail).name, "convert.webp")
@@ -0,0 +1,124 @@
+import asyncio
+from unittest import mock
+
+from django.test import TestCase
+
+from documents.plugins.helpers import ProgressManager
+from documents.plugins.helpers import ProgressStatusOptions
+
+
+class TestProgressManager(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.loops = []
+        self.sent = []
+
+        async def group_send(group, payload):
+            self.loops.append(asyncio.get_running_loop())
+            self.sent.append(payload["data"])
+
+        self.channel = mock.Mock()
+        self.channel.group_send = group_send
+        self.channel.flush = mock.AsyncMock()
+
+        patcher = mock.patch(
+            "documents.plugins.helpers.get_channel_layer",
+            return_value=self.channel,
+        )
+        self.get_channel_layer = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_progress_throttled(self):
+        """
+        GIVEN:
+            - A progress manager
+        WHEN:
+            - Progress is reported for every percent
+        THEN:
+            - Only every 5th percent is sent
+            - All updates are sent in the same event loop
+        """
+        with ProgressManager("test.pdf", "task") as status_mgr:
+            for current in range(101):
+                status_mgr.send_progress(
+                    ProgressStatusOptions.WORKING,
+                    "Working",
+                    current,
+                    100,
+                )
+
+        self.assertEqual(
+            [data["current_progress"] for data in self.sent],
+            list(range(0, 101, 5)),
+        )
+        self.assertEqual(len(set(self.loops)), 1)
+        self.get_channel_layer.assert_called_once()
+        self.channel.flush.assert_awaited_once()
+
+    def test_status_change_sent(self):
+        """
+        GIVEN:
+            - A progress manager which just sent an update
+        WHEN:
+            - The status or the message changes with little progress
+        THEN:
+            - The updates are sent anyway
+        """
+        with ProgressManager("test.pdf", "task") as status_mgr:
+            status_mgr.send_progress(ProgressStatusOptions.STARTED, "New", 0, 100)
+            status_mgr.send_progress(ProgressStatusOptions.WORKING, "New", 1, 100)
+            status_mgr.send_progress(ProgressStatusOptions.WORKING, "OCR", 2, 100)
+            status_mgr.send_progress(ProgressStatusOptions.FAILED, "OCR", 2, 100)
+
+        self.assertEqual(
+            [(data["status"], data["message"]) for data in self.sent],
+            [
+                (ProgressStatusOptions.STARTED, "New"),
+                (ProgressStatusOptions.WORKING, "New"),
+                (ProgressStatusOptions.WORKING, "OCR"),
+                (ProgressStatusOptions.FAILED, "OCR"),
+            ],
+        )
+
+    def test_pending_progress_sent_on_close(self):
+        """
+        GIVEN:
+            - A progress manager
+        WHEN:
+            - Small progress updates are reported and the manager is closed
+        THEN:
+            - Only the latest of the held back updates is sent on close
+        """
+        with ProgressManager("test.pdf", "task") as status_mgr:
+            for current in range(4):
+                status_mgr.send_progress(
+                    ProgressStatusOptions.WORKING,
+                    "Working",
+                    current,
+                    100,
+                )
+            self.assertEqual(len(self.sent), 1)
+
+        self.assertEqual([data["current_progress"] for data in self.sent], [0, 3])
+
+    @mock.patch("documents.plugins.helpers.time.monotonic")
+    def test_progress_sent_after_interval(self, m_monotonic):
+        """
+        GIVEN:
+            - A progress manager which sent an update
+        WHEN:
+            - A small progress update is reported after more than a second
+        THEN:
+            - The update is sent
+        """
+        m_monotonic.return_value = 100.0
+        with ProgressManager("test.pdf", "task") as status_mgr:
+            status_mgr.send_progress(ProgressStatusOptions.WORKING, "OCR", 1, 100)
+            status_mgr.send_progress(ProgressStatusOptions.WORKING, "OCR", 2, 100)
+            m_monotonic.return_value = 101.5
+            status_mgr.send_progress(ProgressStatusOptions.WORKING, "OCR", 3, 100)
+
+            self.assertEqual(
+                [data["current_progress"] for data in self.sent],
+                [1, 3],
+            )
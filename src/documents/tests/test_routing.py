@@ -0,0 +1,166 @@
+from pathlib import Path
+from unittest import mock
+
+from celery.exceptions import Retry
+from django.core.cache import cache
+from django.test import TestCase
+from django.test import override_settings
+
+from documents.data_models import ConsumableDocument
+from documents.data_models import DocumentSource
+from documents.routing import acquire_queue_slot
+from documents.routing import release_queue_slot
+from documents.routing import route_task
+from documents.tasks import bulk_update_documents
+from documents.tests.utils import DirectoriesMixin
+
+
+class TestRouting(TestCase):
+    def test_route_consumption_by_source(self):
+        """
+        GIVEN:
+            - Documents from different sources
+        WHEN:
+            - Their consumption is routed
+        THEN:
+            - Uploads go to the interactive queue with the highest priority
+            - Consume folder and mail documents go to their own queues
+            - Batches go to the queue of their documents
+        """
+        for source, queue, priority in [
+            (DocumentSource.ApiUpload, "interactive", 0),
+            (DocumentSource.ConsumeFolder, "consume", 3),
+            (DocumentSource.MailFetch, "mail", 3),
+        ]:
+            input_doc = ConsumableDocument(
+                source=source,
+                original_file=Path(__file__).parent / "samples" / "simple.pdf",
+            )
+            self.assertEqual(
+                route_task("documents.tasks.consume_file", (input_doc, None), {}, {}),
+                {"queue": queue, "priority": priority},
+            )
+            self.assertEqual(
+                route_task(
+                    "documents.tasks.consume_file",
+                    (),
+                    {"input_doc": input_doc},
+                    {},
+                )["queue"],
+                queue,
+            )
+            self.assertEqual(
+                route_task(
+                    "documents.tasks.consume_file_batch",
+                    ([("task-id", input_doc, None)],),
+                    {},
+                    {},
+                )["queue"],
+                queue,
+            )
+
+    def test_route_by_task_name(self):
+        self.assertEqual(
+            route_task("documents.tasks.update_document_archive_file", (1,), {}, {}),
+            {"queue": "bulk", "priority": 9},
+        )
+        self.assertEqual(
+            route_task("documents.tasks.bulk_update_documents", (), {}, {}),
+            {"queue": "bulk", "priority": 9},
+        )
+        self.assertEqual(
+            route_task("documents.tasks.train_classifier", (), {}, {}),
+            {"queue": "celery", "priority": 6},
+        )
+
+
+class TestQueueConcurrency(DirectoriesMixin, TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+
+    def test_queue_slots(self):
+        """
+        GIVEN:
+            - A queue limited to 2 concurrent tasks
+        WHEN:
+            - Slots are taken and released
+        THEN:
+            - No more than 2 slots can be taken at the same time
+        """
+        self.assertTrue(acquire_queue_slot("bulk", 2))
+        self.assertTrue(acquire_queue_slot("bulk", 2))
+        self.assertFalse(acquire_queue_slot("bulk", 2))
+        self.assertTrue(acquire_queue_slot("mail", 2))
+
+        release_queue_slot("bulk")
+
+        self.assertTrue(acquire_queue_slot("bulk", 2))
+
+    @override_settings(CELERY_TASK_TIME_LIMIT=60)
+    def test_queue_slots_expire(self):
+        """
+        GIVEN:
+            - A queue limited to 2 concurrent tasks
+        WHEN:
+            - The slot counter expires while a task is running
+        THEN:
+            - The slot counter expires no earlier than a task may run after
+              the last task started
+            - Releasing the slot of the running task doesn't free a slot of
+              later tasks
+        """
+        with mock.patch("documents.routing.cache.touch") as m_touch:
+            acquire_queue_slot("bulk", 2)
+            m_touch.assert_called_once_with("task_queue_slots_bulk", timeout=60)
+
+        cache.delete("task_queue_slots_bulk")
+        release_queue_slot("bulk")
+
+        self.assertTrue(acquire_queue_slot("bulk", 2))
+        release_queue_slot("bulk")
+        release_queue_slot("bulk")
+        self.assertEqual(cache.get("task_queue_slots_bulk"), 0)
+
+        self.assertTrue(acquire_queue_slot("bulk", 2))
+        self.assertTrue(acquire_queue_slot("bulk", 2))
+        self.assertFalse(acquire_queue_slot("bulk", 2))
+
+    @override_settings(TASK_QUEUE_CONCURRENCY={"bulk": 1})
+    @mock.patch("documents.tasks.bulk_update_documents._queue")
+    @mock.patch("documents.tasks.bulk_update_documents.retry")
+    @mock.patch("documents.tasks.Document.objects.filter")
+    def test_task_retried_without_slot(self, m_filter, m_retry, m_queue):
+        """
+        GIVEN:
+            - A queue limited to 1 concurrent task, which is running
+        WHEN:
+            - Another task from the queue starts
+        THEN:
+            - The task is retried later instead of running now
+        """
+        m_queue.return_value = "bulk"
+        m_retry.return_value = Retry()
+        acquire_queue_slot("bulk", 1)
+
+        bulk_update_documents.apply(args=([1],))
+
+        m_retry.assert_called_once()
+        m_filter.assert_not_called()
+
+    @override_settings(TASK_QUEUE_CONCURRENCY={"bulk": 1})
+    @mock.patch("documents.tasks.bulk_update_documents._queue")
+    def test_task_releases_slot(self, m_queue):
+        """
+        GIVEN:
+            - A queue limited to 1 concurrent task
+        WHEN:
+            - A task from the queue finishes
+        THEN:
+            - The slot is free again
+        """
+        m_queue.return_value = "bulk"
+
+        bulk_update_documents.apply(args=([],))
+
+        self.assertTrue(acquire_queue_slot("bulk", 1))
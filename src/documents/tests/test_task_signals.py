@@ -67,6 +67,94 @@ class TestTaskSignalHandler(DirectoriesMixin, TestCase):
         self.assertEqual("documents.tasks.consume_file", task.task_name)
         self.assertEqual(celery.states.PENDING, task.status)
 
+    def test_before_task_publish_handler_consume_batch(self):
+        """
+        GIVEN:
+            - A batch of documents is queued via the consume folder
+        WHEN:
+            - Task before publish handler is called
+        THEN:
+            - A pending task is created for every document of the batch
+        """
+        task_ids = [str(uuid.uuid4()), str(uuid.uuid4())]
+        headers = {
+            "id": str(uuid.uuid4()),
+            "task": "documents.tasks.consume_file_batch",
+        }
+        body = (
+            # args
+            (
+                [
+                    (
+                        task_id,
+                        ConsumableDocument(
+                            source=DocumentSource.ConsumeFolder,
+                            original_file=f"/consume/hello-{i}.pdf",
+                        ),
+                        None,
+                    )
+                    for i, task_id in enumerate(task_ids)
+                ],
+            ),
+            # kwargs
+            {},
+            # celery stuff
+            {"callbacks": None, "errbacks": None, "chain": None, "chord": None},
+        )
+
+        before_task_publish_handler(headers=headers, body=body)
+
+        self.assertCountEqual(
+            PaperlessTask.objects.values_list("task_id", "task_file_name"),
+            [(task_ids[0], "hello-0.pdf"), (task_ids[1], "hello-1.pdf")],
+        )
+        for task in PaperlessTask.objects.all():
+            self.assertEqual("documents.tasks.consume_file", task.task_name)
+            self.assertEqual(celery.states.PENDING, task.status)
+
+    def test_before_task_publish_handler_retry(self):
+        """
+        GIVEN:
+            - A consume task which ran and is retried later
+        WHEN:
+            - Task before publish handler is called again with the same id
+        THEN:
+            - The existing task is marked as pending again
+        """
+        headers = {
+            "id": str(uuid.uuid4()),
+            "task": "documents.tasks.consume_file",
+        }
+        body = (
+            # args
+            (
+                ConsumableDocument(
+                    source=DocumentSource.ConsumeFolder,
+                    original_file="/consume/hello-999.pdf",
+                ),
+                None,
+            ),
+            # kwargs
+            {},
+            # celery stuff
+            {"callbacks": None, "errbacks": None, "chain": None, "chord": None},
+        )
+        self.util_call_before_task_publish_handler(
+            headers_to_use=headers,
+            body_to_use=body,
+        )
+        task_prerun_handler(task_id=headers["id"])
+        task_postrun_handler(task_id=headers["id"], state=celery.states.RETRY)
+
+        before_task_publish_handler(headers=headers, body=body)
+
+        task = PaperlessTask.objects.get()
+        self.assertEqual(headers["id"], task.task_id)
+        self.assertEqual(celery.states.PENDING, task.status)
+        self.assertIsNone(task.result)
+        self.assertIsNone(task.date_started)
+        self.assertIsNone(task.date_done)
+
     def test_task_prerun_handler(self):
         """
         GIVEN:
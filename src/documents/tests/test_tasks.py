@@ -1,19 +1,35 @@
 import os
+import shutil
+import time
+import uuid
+from pathlib import Path
 from unittest import mock
 
+import celery
 from django.conf import settings
+from django.core.cache import cache
 from django.test import TestCase
+from django.test import override_settings
 from django.utils import timezone
 
 from documents import tasks
+from documents.caching import PENDING_UPDATE_QUEUE_WAIT
+from documents.caching import clear_pending_updates
+from documents.caching import get_pending_update_key
+from documents.caching import get_pending_update_timeout
+from documents.consumer import ConsumerError
+from documents.data_models import ConsumableDocument
+from documents.data_models import DocumentSource
 from documents.models import Correspondent
 from documents.models import Document
 from documents.models import DocumentType
+from documents.models import PaperlessTask
 from documents.models import Tag
 from documents.sanity_checker import SanityCheckFailedException
 from documents.sanity_checker import SanityCheckMessages
 from documents.tests.test_classifier import dummy_preprocess
 from documents.tests.utils import DirectoriesMixin
+from documents.tests.utils import DummyProgressManager
 from documents.tests.utils import FileSystemAssertsMixin
 
 
@@ -139,6 +155,10 @@ class TestSanityCheck(DirectoriesMixin, TestCase):
 
 
 class TestBulkUpdate(DirectoriesMixin, TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+
     def test_bulk_update_documents(self):
         doc1 = Document.objects.create(
             title="test",
@@ -149,4 +169,245 @@ class TestBulkUpdate(DirectoriesMixin, TestCase):
             modified=timezone.now(),
         )
 
+        manager = DummyProgressManager("bulk_update", None)
+        with mock.patch("documents.tasks.ProgressManager", return_value=manager):
+            tasks.bulk_update_documents([doc1.pk])
+
+        self.assertEqual(manager.payloads[-1]["data"]["status"], "SUCCESS")
+        self.assertEqual(manager.payloads[-1]["data"]["max_progress"], 1)
+        self.assertEqual(manager.payloads[-1]["data"]["operation"], "bulk_update")
+
+    @override_settings(BULK_UPDATE_CHUNK_SIZE=2)
+    @mock.patch("documents.tasks.group")
+    def test_bulk_update_documents_chunks(self, m_group):
+        """
+        GIVEN:
+            - A bulk update of more documents than fit into one chunk
+        WHEN:
+            - The documents are updated
+        THEN:
+            - The documents are updated by one task per chunk
+            - The progress of the whole update is reported
+        """
+        docs = [
+            Document.objects.create(title=str(i), checksum=str(i)) for i in range(3)
+        ]
+
+        tasks.bulk_update_documents([doc.pk for doc in docs])
+
+        signatures = list(m_group.call_args.args[0])
+        self.assertEqual(
+            [signature.args[0] for signature in signatures],
+            [[docs[0].pk, docs[1].pk], [docs[2].pk]],
+        )
+
+        manager = DummyProgressManager("bulk_update", None)
+        with mock.patch("documents.tasks.ProgressManager", return_value=manager):
+            for signature in signatures:
+                tasks.bulk_update_documents_chunk(*signature.args)
+
+        self.assertEqual(
+            [
+                (payload["data"]["status"], payload["data"]["current_progress"])
+                for payload in manager.payloads
+            ],
+            [("WORKING", 1), ("WORKING", 2), ("WORKING", 3), ("SUCCESS", 3)],
+        )
+        self.assertEqual(
+            {payload["data"]["max_progress"] for payload in manager.payloads},
+            {3},
+        )
+
+    @mock.patch("documents.tasks.bulk_update_documents_chunk")
+    def test_bulk_update_documents_coalesced(self, m_chunk):
+        """
+        GIVEN:
+            - A document waiting for a bulk update
+        WHEN:
+            - Another bulk update of the document and another document is queued
+        THEN:
+            - Only the other document is updated by the second update
+            - The document is updated again once its update started
+        """
+        doc1 = Document.objects.create(title="1", checksum="1")
+        doc2 = Document.objects.create(title="2", checksum="2")
+
         tasks.bulk_update_documents([doc1.pk])
+        tasks.bulk_update_documents([doc1.pk, doc2.pk])
+
+        self.assertEqual(m_chunk.call_args_list[0].args[0], [doc1.pk])
+        self.assertEqual(m_chunk.call_args_list[1].args[0], [doc2.pk])
+
+        clear_pending_updates([doc1.pk])
+        tasks.bulk_update_documents([doc1.pk])
+        self.assertEqual(m_chunk.call_args_list[2].args[0], [doc1.pk])
+
+    @override_settings(CELERY_TASK_TIME_LIMIT=60)
+    @mock.patch("documents.tasks.bulk_update_documents_chunk")
+    def test_bulk_update_documents_lost(self, m_chunk):
+        """
+        GIVEN:
+            - Documents marked as waiting for a bulk update which was lost
+        WHEN:
+            - Another bulk update of the documents is queued
+        THEN:
+            - The marks don't outlive the task time limit and the queue wait
+            - Documents with a mark older than that are updated again
+        """
+        doc1 = Document.objects.create(title="1", checksum="1")
+        doc2 = Document.objects.create(title="2", checksum="2")
+        timeout = get_pending_update_timeout()
+        self.assertEqual(timeout, 60 + PENDING_UPDATE_QUEUE_WAIT)
+
+        with mock.patch("documents.caching.cache.set_many") as m_set_many:
+            tasks.bulk_update_documents([doc1.pk])
+            self.assertEqual(m_set_many.call_args_list[0].args[1], timeout)
+
+        cache.set(get_pending_update_key(doc1.pk), time.time() - timeout)
+        cache.set(get_pending_update_key(doc2.pk), time.time())
+        with self.assertLogs("paperless.caching", level="WARNING"):
+            tasks.bulk_update_documents([doc1.pk, doc2.pk])
+
+        self.assertEqual(m_chunk.call_args.args[0], [doc1.pk])
+
+
+class TestConsumeFileBatch(DirectoriesMixin, TestCase):
+    SAMPLE_FILE = Path(__file__).parent / "samples" / "simple.pdf"
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.batch = []
+        for name in ["good.pdf", "bad.pdf"]:
+            task_id = str(uuid.uuid4())
+            PaperlessTask.objects.create(
+                task_id=task_id,
+                task_file_name=name,
+                task_name="documents.tasks.consume_file",
+                status=celery.states.PENDING,
+            )
+            original_file = self.dirs.consumption_dir / name
+            shutil.copy(self.SAMPLE_FILE, original_file)
+            input_doc = ConsumableDocument(
+                source=DocumentSource.ConsumeFolder,
+                original_file=original_file,
+            )
+            self.batch.append((task_id, input_doc, None))
+
+    @mock.patch("documents.tasks.get_classifier")
+    @mock.patch("documents.tasks.Consumer")
+    def test_consume_file_batch(self, m_consumer, m_get_classifier):
+        """
+        GIVEN:
+            - A batch of 2 documents, the second of which fails to consume
+        WHEN:
+            - The batch is consumed
+        THEN:
+            - The classifier is loaded once and shared by both consumers
+            - The task of every document records its own result and timings
+        """
+        document = Document.objects.create(title="good", checksum="A")
+
+        def try_consume_file(path, **kwargs):
+            if path.name == "bad.pdf":
+                raise ConsumerError("bad.pdf: Cannot consume")
+            return document
+
+        m_consumer.return_value.try_consume_file.side_effect = try_consume_file
+
+        results = tasks.consume_file_batch(self.batch)
+
+        m_get_classifier.assert_called_once()
+        for call in m_consumer.call_args_list:
+            self.assertEqual(
+                call.kwargs["classifier"],
+                m_get_classifier.return_value,
+            )
+
+        good = PaperlessTask.objects.get(task_id=self.batch[0][0])
+        self.assertEqual(good.status, celery.states.SUCCESS)
+        self.assertEqual(good.result, f"Success. New document id {document.pk} created")
+        self.assertIsNotNone(good.date_started)
+        self.assertIsNotNone(good.date_done)
+
+        bad = PaperlessTask.objects.get(task_id=self.batch[1][0])
+        self.assertEqual(bad.status, celery.states.FAILURE)
+        self.assertEqual(bad.result, "bad.pdf: Cannot consume")
+
+        self.assertEqual(results, [good.result, bad.result])
+        self.assertIsNotNone(good.stage_timings)
+        self.assertIsNotNone(bad.stage_timings)
+
+    @mock.patch("documents.tasks.get_classifier")
+    @mock.patch("documents.tasks.Consumer")
+    def test_consume_file_batch_out_of_time(self, m_consumer, m_get_classifier):
+        """
+        GIVEN:
+            - A batch of 2 documents
+        WHEN:
+            - The batch hits its soft time limit while consuming the first one
+        THEN:
+            - The task of both documents is marked as failed
+        """
+        m_consumer.return_value.try_consume_file.side_effect = (
+            celery.exceptions.SoftTimeLimitExceeded()
+        )
+
+        with self.assertLogs("paperless.tasks", level="ERROR"):
+            results = tasks.consume_file_batch(self.batch)
+
+        m_consumer.return_value.try_consume_file.assert_called_once()
+        self.assertEqual(len(results), 2)
+        for task_id, _, _ in self.batch:
+            task = PaperlessTask.objects.get(task_id=task_id)
+            self.assertEqual(task.status, celery.states.FAILURE)
+            self.assertEqual(
+                task.result,
+                "The batch ran out of time before consuming this document",
+            )
+            self.assertIsNotNone(task.date_done)
+
+    @mock.patch("documents.tasks.CONSUMER_BATCH_INDEX_INTERVAL", 1)
+    @mock.patch("documents.index.flush_deferred_updates")
+    @mock.patch("documents.tasks.get_classifier")
+    @mock.patch("documents.tasks.Consumer")
+    def test_consume_file_batch_flushes_index(
+        self,
+        m_consumer,
+        m_get_classifier,
+        m_flush,
+    ):
+        """
+        GIVEN:
+            - A batch of 2 documents, writing the index after every document
+        WHEN:
+            - The batch is consumed
+        THEN:
+            - The index updates are written after each document
+        """
+        m_consumer.return_value.try_consume_file.return_value = Document.objects.create(
+            title="good",
+            checksum="A",
+        )
+
+        tasks.consume_file_batch(self.batch)
+
+        # once per document, and once more when the batch ends
+        self.assertEqual(m_flush.call_count, 3)
+
+    @override_settings(CONSUMER_BATCH_SIZE=50, CELERY_TASK_TIME_LIMIT=600)
+    def test_consumer_batch_size(self):
+        """
+        GIVEN:
+            - A batch size too large to be consumed within the time limit
+        WHEN:
+            - The batch size is determined
+        THEN:
+            - The batch size is capped by the time limit
+        """
+        self.assertEqual(tasks.get_consumer_batch_size(), 10)
+
+        with override_settings(CONSUMER_BATCH_SIZE=5):
+            self.assertEqual(tasks.get_consumer_batch_size(), 5)
+
+        with override_settings(CELERY_TASK_TIME_LIMIT=30):
+            self.assertEqual(tasks.get_consumer_batch_size(), 1)
@@ -0,0 +1,190 @@
+import os
+import shutil
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.test import override_settings
+from PIL import Image
+
+from documents.models import Document
+from documents.parsers import ParseError
+from documents.tests.utils import DirectoriesMixin
+from documents.thumbnails import ThumbnailCache
+from documents.thumbnails import get_thumbnail_path
+
+
+class TestThumbnailCache(DirectoriesMixin, TestCase):
+    SAMPLE_DIR = Path(__file__).parent / "samples"
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.doc = Document.objects.create(
+            title="A",
+            checksum="abcdef",
+            mime_type="application/pdf",
+            filename="a.pdf",
+        )
+        Image.new("RGB", (500, 700), "white").save(self.doc.thumbnail_path)
+        self.cache_dir = self.dirs.data_dir / "thumbnail-cache"
+        cache.clear()
+
+    def test_small_thumbnail(self):
+        """
+        GIVEN:
+            - A document with a stored thumbnail
+        WHEN:
+            - The small thumbnail is requested twice
+        THEN:
+            - The stored thumbnail is scaled down once and cached
+            - Without a size, the stored thumbnail is returned
+        """
+        path = get_thumbnail_path(self.doc, "small")
+
+        self.assertTrue(path.is_relative_to(self.cache_dir))
+        with Image.open(path) as image:
+            self.assertEqual(image.format, "WEBP")
+            self.assertEqual(image.size, (150, 210))
+
+        with mock.patch("documents.thumbnails._scale_image") as m_scale:
+            self.assertEqual(get_thumbnail_path(self.doc, "small"), path)
+            m_scale.assert_not_called()
+
+        self.assertEqual(get_thumbnail_path(self.doc), self.doc.thumbnail_path)
+
+    def test_thumbnail_recreated(self):
+        """
+        GIVEN:
+            - A cached small thumbnail
+        WHEN:
+            - The stored thumbnail is re-created
+        THEN:
+            - The small thumbnail is made again
+        """
+        path = get_thumbnail_path(self.doc, "small")
+
+        stat = self.doc.thumbnail_path.stat()
+        os.utime(self.doc.thumbnail_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+        self.assertNotEqual(get_thumbnail_path(self.doc, "small"), path)
+
+    @mock.patch("documents.thumbnails.make_thumbnail_from_pdf_gs")
+    def test_large_thumbnail(self, m_render):
+        """
+        GIVEN:
+            - A PDF document
+        WHEN:
+            - The large thumbnail is requested
+        THEN:
+            - The first page is rendered at the width of the size class
+        """
+
+        def render(pdf_path, temp_dir, width):
+            rendered = Path(temp_dir) / "gs.webp"
+            Image.new("RGB", (width, 1400), "white").save(rendered)
+            return str(rendered)
+
+        m_render.side_effect = render
+
+        path = get_thumbnail_path(self.doc, "large")
+
+        self.assertEqual(m_render.call_args.args[0], self.doc.source_path)
+        with Image.open(path) as image:
+            self.assertEqual(image.width, 1000)
+
+    @mock.patch("documents.thumbnails.make_thumbnail_from_pdf_gs")
+    def test_large_thumbnail_failed(self, m_render):
+        """
+        GIVEN:
+            - A PDF document which can't be rendered
+        WHEN:
+            - The large thumbnail is requested
+        THEN:
+            - The stored thumbnail is used and cached
+        """
+        m_render.side_effect = ParseError("Thumbnail (gs) failed")
+
+        path = get_thumbnail_path(self.doc, "large")
+
+        self.assertEqual(path.read_bytes(), self.doc.thumbnail_path.read_bytes())
+        get_thumbnail_path(self.doc, "large")
+        m_render.assert_called_once()
+
+    def test_large_thumbnail_of_image(self):
+        """
+        GIVEN:
+            - An image document
+        WHEN:
+            - The large thumbnail is requested
+        THEN:
+            - The original is scaled down, but not scaled up
+        """
+        self.doc.mime_type = "image/png"
+        self.doc.filename = "simple.png"
+        self.doc.save()
+        shutil.copy(self.SAMPLE_DIR / "simple.png", self.doc.source_path)
+
+        path = get_thumbnail_path(self.doc, "large")
+
+        with Image.open(path) as image, Image.open(self.doc.source_path) as original:
+            self.assertEqual(image.width, min(1000, original.width))
+
+    def test_evict(self):
+        """
+        GIVEN:
+            - Two cached thumbnails
+        WHEN:
+            - The cache only fits the larger one
+        THEN:
+            - The least recently used thumbnail is removed
+        """
+        thumbnail_cache = ThumbnailCache(self.cache_dir, 1024 * 1024)
+        small = thumbnail_cache.get(self.doc, "small")
+        medium = thumbnail_cache.get(self.doc, "medium")
+        os.utime(small, (0, 0))
+
+        thumbnail_cache.max_size = max(
+            small.stat().st_size,
+            medium.stat().st_size,
+        )
+        thumbnail_cache.evict()
+
+        self.assertFalse(small.exists())
+        self.assertTrue(medium.exists())
+
+    @mock.patch("documents.thumbnails.THUMBNAIL_EVICT_INTERVAL", 2)
+    @mock.patch("documents.thumbnails.ThumbnailCache.evict")
+    def test_evict_interval(self, m_evict):
+        """
+        GIVEN:
+            - The size of the cache is checked every 2 new entries
+        WHEN:
+            - 3 thumbnails are made and one is used again
+        THEN:
+            - The cache is checked once
+        """
+        get_thumbnail_path(self.doc, "small")
+        get_thumbnail_path(self.doc, "small")
+        m_evict.assert_not_called()
+
+        get_thumbnail_path(self.doc, "medium")
+        m_evict.assert_called_once()
+
+        get_thumbnail_path(self.doc, "large")
+        m_evict.assert_called_once()
+
+    @override_settings(THUMBNAIL_CACHE_SIZE=0)
+    def test_cache_disabled(self):
+        """
+        GIVEN:
+            - The thumbnail cache is disabled
+        WHEN:
+            - The small thumbnail is requested
+        THEN:
+            - The stored thumbnail is returned
+        """
+        self.assertEqual(
+            get_thumbnail_path(self.doc, "small"),
+            self.doc.thumbnail_path,
+        )
@@ -0,0 +1,191 @@
+import errno
+import os
+import shutil
+import stat
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import TestCase
+
+from documents import utils
+from documents.utils import compute_checksum
+from documents.utils import copy_file_with_basic_stats
+from documents.utils import place_file
+
+
+class TestPlaceFile(TestCase):
+    SAMPLE_FILE = Path(__file__).parent / "samples" / "simple.pdf"
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.source = self.tmp_dir / "source.pdf"
+        shutil.copy(self.SAMPLE_FILE, self.source)
+        self.dest = self.tmp_dir / "dest.pdf"
+        self.checksum = compute_checksum(self.source)
+
+    def test_copy_keeps_source(self):
+        """
+        GIVEN:
+            - A source file
+        WHEN:
+            - The file is placed without moving it
+        THEN:
+            - Source and destination have the same contents
+            - The source still exists
+        """
+        strategy = place_file(self.source, self.dest)
+
+        self.assertNotEqual(strategy, "rename")
+        self.assertTrue(self.source.is_file())
+        self.assertEqual(compute_checksum(self.dest), self.checksum)
+
+    def test_move_renames(self):
+        """
+        GIVEN:
+            - A source file on the same filesystem as the destination
+        WHEN:
+            - The file is placed and may be moved
+        THEN:
+            - The file is renamed
+            - The placement is counted
+        """
+        before = utils.FILE_PLACEMENT_COUNTS["rename"]
+
+        strategy = place_file(self.source, self.dest, move=True)
+
+        self.assertEqual(strategy, "rename")
+        self.assertFalse(self.source.exists())
+        self.assertEqual(compute_checksum(self.dest), self.checksum)
+        self.assertEqual(utils.FILE_PLACEMENT_COUNTS["rename"], before + 1)
+
+    @mock.patch("documents.utils.os.rename")
+    def test_move_across_filesystems(self, m_rename):
+        """
+        GIVEN:
+            - A source file on a different filesystem than the destination
+        WHEN:
+            - The file is placed and may be moved
+        THEN:
+            - The file is copied and the source removed
+        """
+        m_rename.side_effect = OSError(errno.EXDEV, "Invalid cross-device link")
+
+        strategy = place_file(self.source, self.dest, move=True)
+
+        self.assertNotEqual(strategy, "rename")
+        self.assertFalse(self.source.exists())
+        self.assertEqual(compute_checksum(self.dest), self.checksum)
+
+    @mock.patch("documents.utils.os.rename")
+    def test_move_other_error(self, m_rename):
+        """
+        GIVEN:
+            - A rename which fails for other reasons than crossing filesystems
+        WHEN:
+            - The file is placed and may be moved
+        THEN:
+            - The error is raised and the source kept
+        """
+        m_rename.side_effect = OSError(errno.EACCES, "Permission denied")
+
+        with self.assertRaises(OSError):
+            place_file(self.source, self.dest, move=True)
+
+        self.assertTrue(self.source.is_file())
+
+    @mock.patch("documents.utils._sendfile")
+    @mock.patch("documents.utils._copy_file_range")
+    @mock.patch("documents.utils._reflink")
+    def test_fallback_to_userspace_copy(self, m_reflink, m_range, m_sendfile):
+        """
+        GIVEN:
+            - A platform which supports none of the in-kernel copies
+        WHEN:
+            - The file is placed
+        THEN:
+            - The file is copied through userspace with the correct contents
+        """
+        m_reflink.side_effect = OSError(errno.EOPNOTSUPP, "Not supported")
+        m_range.side_effect = OSError(errno.EXDEV, "Invalid cross-device link")
+        m_sendfile.side_effect = OSError(errno.EINVAL, "Invalid argument")
+
+        strategy = place_file(self.source, self.dest)
+
+        self.assertEqual(strategy, "copy")
+        self.assertEqual(compute_checksum(self.dest), self.checksum)
+
+    @mock.patch("documents.utils._reflink")
+    def test_partial_copy_is_discarded(self, m_reflink):
+        """
+        GIVEN:
+            - A strategy which fails after writing some data
+        WHEN:
+            - The file is placed
+        THEN:
+            - The destination only contains the data of the next strategy
+        """
+
+        def partial_reflink(read_file, write_file, size):
+            write_file.write(b"garbage")
+            raise OSError(errno.EOPNOTSUPP, "Not supported")
+
+        m_reflink.side_effect = partial_reflink
+
+        place_file(self.source, self.dest)
+
+        self.assertEqual(compute_checksum(self.dest), self.checksum)
+
+    @mock.patch("documents.utils._reflink")
+    def test_short_copy_falls_back_to_userspace_copy(self, m_reflink):
+        """
+        GIVEN:
+            - A filesystem where copy_file_range copies nothing
+        WHEN:
+            - The file is placed
+        THEN:
+            - The file is copied through userspace with the correct contents
+        """
+        if not hasattr(os, "copy_file_range"):  # pragma: no cover
+            self.skipTest("copy_file_range is not available")
+        m_reflink.side_effect = OSError(errno.EOPNOTSUPP, "Not supported")
+
+        with mock.patch("documents.utils.os.copy_file_range", return_value=0):
+            strategy = place_file(self.source, self.dest)
+
+        self.assertEqual(strategy, "copy")
+        self.assertEqual(compute_checksum(self.dest), self.checksum)
+
+    def test_moved_file_mode(self):
+        """
+        GIVEN:
+            - A temporary file, only accessible by its owner
+        WHEN:
+            - The file is moved into place
+        THEN:
+            - The file has the mode of a new file
+        """
+        self.source.chmod(0o600)
+        umask = os.umask(0o022)
+        os.umask(umask)
+
+        place_file(self.source, self.dest, move=True)
+
+        self.assertEqual(stat.S_IMODE(self.dest.stat().st_mode), 0o666 & ~umask)
+
+    def test_copy_with_basic_stats_keeps_mode(self):
+        """
+        GIVEN:
+            - A source file with a specific mode
+        WHEN:
+            - The file is copied with its basic stats
+        THEN:
+            - The copy has the same mode, like with shutil.copy
+        """
+        self.source.chmod(0o640)
+
+        copy_file_with_basic_stats(self.source, self.dest)
+
+        self.assertEqual(stat.S_IMODE(self.dest.stat().st_mode), 0o640)
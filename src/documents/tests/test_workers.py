@@ -0,0 +1,188 @@
+import shutil
+import time
+import uuid
+from pathlib import Path
+from unittest import mock
+
+import celery
+from django.conf import settings
+from django.test import TestCase
+from django.test import override_settings
+
+from documents import tasks
+from documents import workers
+from documents.data_models import ConsumableDocument
+from documents.data_models import DocumentSource
+from documents.models import Document
+from documents.models import PaperlessTask
+from documents.signals.handlers import worker_process_init_handler
+from documents.tests.utils import DirectoriesMixin
+
+
+@mock.patch("documents.workers.load_classifier")
+class TestGetClassifier(DirectoriesMixin, TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        workers._classifier = None
+        self.addCleanup(setattr, workers, "_classifier", None)
+
+    @override_settings(WORKER_WARM=True)
+    def test_classifier_loaded_once(self, m_load):
+        """
+        GIVEN:
+            - A warm worker and a classifier model file
+        WHEN:
+            - The classifier is requested several times
+        THEN:
+            - The classifier is loaded once
+            - The classifier is loaded again after the model file changed
+            - No classifier is returned once the model file is removed
+        """
+        settings.MODEL_FILE.write_bytes(b"model")
+
+        self.assertEqual(workers.get_classifier(), m_load.return_value)
+        self.assertEqual(workers.get_classifier(), m_load.return_value)
+        m_load.assert_called_once()
+
+        settings.MODEL_FILE.write_bytes(b"retrained model")
+
+        workers.get_classifier()
+        self.assertEqual(m_load.call_count, 2)
+
+        settings.MODEL_FILE.unlink()
+
+        self.assertIsNone(workers.get_classifier())
+
+    def test_classifier_loaded_every_time(self, m_load):
+        """
+        GIVEN:
+            - A worker which isn't warm
+        WHEN:
+            - The classifier is requested twice
+        THEN:
+            - The classifier is loaded twice
+        """
+        settings.MODEL_FILE.write_bytes(b"model")
+
+        workers.get_classifier()
+        workers.get_classifier()
+
+        self.assertEqual(m_load.call_count, 2)
+
+
+class TestWarmWorker(DirectoriesMixin, TestCase):
+    @mock.patch("documents.signals.handlers.warm_up")
+    def test_process_init(self, m_warm_up):
+        """
+        GIVEN:
+            - Warm workers enabled or disabled
+        WHEN:
+            - A worker process starts
+        THEN:
+            - Only a warm worker process prepares itself
+        """
+        m_warm_up.return_value = 1.5
+
+        worker_process_init_handler()
+        m_warm_up.assert_not_called()
+
+        with override_settings(WORKER_WARM=True):
+            worker_process_init_handler()
+        m_warm_up.assert_called_once()
+
+    @override_settings(WORKER_WARM=True)
+    @mock.patch("documents.tasks.get_classifier")
+    @mock.patch("documents.tasks.Consumer")
+    def test_consume_with_warm_classifier(self, m_consumer, m_get_classifier):
+        """
+        GIVEN:
+            - A warm worker
+        WHEN:
+            - A document is consumed
+        THEN:
+            - The consumer uses the classifier of the worker process
+            - The time spent preparing is recorded as a stage
+        """
+        task_id = str(uuid.uuid4())
+        PaperlessTask.objects.create(
+            task_id=task_id,
+            task_file_name="simple.pdf",
+            task_name="documents.tasks.consume_file",
+            status=celery.states.STARTED,
+        )
+        original_file = self.dirs.consumption_dir / "simple.pdf"
+        shutil.copy(Path(__file__).parent / "samples" / "simple.pdf", original_file)
+        document = Document.objects.create(title="simple", checksum="A")
+        m_consumer.return_value.try_consume_file.return_value = document
+
+        tasks._consume_document(
+            ConsumableDocument(
+                source=DocumentSource.ConsumeFolder,
+                original_file=original_file,
+            ),
+            None,
+            task_id,
+        )
+
+        self.assertEqual(
+            m_consumer.call_args.kwargs["classifier"],
+            m_get_classifier.return_value,
+        )
+        self.assertIn(
+            "worker_startup",
+            PaperlessTask.objects.get(task_id=task_id).stage_timings,
+        )
+
+    @override_settings(WORKER_WARM=False)
+    @mock.patch("documents.tasks.import_heavy_modules")
+    @mock.patch("documents.tasks.get_classifier")
+    @mock.patch("documents.tasks.Consumer")
+    def test_consume_with_cold_worker(
+        self,
+        m_consumer,
+        m_get_classifier,
+        m_import_heavy_modules,
+    ):
+        """
+        GIVEN:
+            - A cold worker
+        WHEN:
+            - A document is consumed
+        THEN:
+            - The heavy libraries are not imported up front
+            - The time spent loading the classifier is recorded as a stage
+        """
+
+        def load_classifier():
+            time.sleep(0.05)
+
+        m_get_classifier.side_effect = load_classifier
+        task_id = str(uuid.uuid4())
+        PaperlessTask.objects.create(
+            task_id=task_id,
+            task_file_name="simple.pdf",
+            task_name="documents.tasks.consume_file",
+            status=celery.states.STARTED,
+        )
+        original_file = self.dirs.consumption_dir / "simple.pdf"
+        shutil.copy(Path(__file__).parent / "samples" / "simple.pdf", original_file)
+        document = Document.objects.create(title="simple", checksum="A")
+        m_consumer.return_value.try_consume_file.return_value = document
+
+        tasks._consume_document(
+            ConsumableDocument(
+                source=DocumentSource.ConsumeFolder,
+                original_file=original_file,
+            ),
+            None,
+            task_id,
+        )
+
+        m_import_heavy_modules.assert_not_called()
+        m_get_classifier.assert_called_once()
+        self.assertGreaterEqual(
+            PaperlessTask.objects.get(task_id=task_id).stage_timings["worker_startup"][
+                "duration"
+            ],
+            0.05,
+        )
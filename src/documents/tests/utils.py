@@ -60,6 +60,8 @@ def setup_directories():
         STATIC_ROOT=dirs.static_dir,
         MODEL_FILE=dirs.data_dir / "classification_model.pickle",
         MEDIA_LOCK=dirs.media_dir / "media.lock",
+        THUMBNAIL_CACHE_DIR=dirs.data_dir / "thumbnail-cache",
+        BULK_DOWNLOAD_CACHE_DIR=dirs.data_dir / "bulk-downloads",
     )
     dirs.settings_override.enable()
 
@@ -0,0 +1,210 @@
+"""
+Thumbnails in several sizes.
+
+Every document has one stored thumbnail, 500px wide.  Other sizes are made
+on the first request and kept in a cache below THUMBNAIL_CACHE_DIR.  An entry
+is found by the checksum of the document and the modification time of the
+stored thumbnail, so it is not used anymore once the thumbnail is re-created.
+Smaller sizes are scaled down from the stored thumbnail, larger ones are
+rendered from the archive file or the original.  Using an entry updates its
+modification time.  Every THUMBNAIL_EVICT_INTERVAL new entries, the least
+recently used entries are removed if the cache grew beyond
+THUMBNAIL_CACHE_SIZE.
+"""
+
+import logging
+import os
+import secrets
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Final
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from documents.models import Document
+from documents.parsers import THUMBNAIL_MAX_HEIGHT
+from documents.parsers import THUMBNAIL_WIDTH
+from documents.parsers import ParseError
+from documents.parsers import make_thumbnail_from_pdf_gs
+from documents.utils import maybe_override_pixel_limit
+
+logger = logging.getLogger("paperless.thumbnails")
+
+# The width of the thumbnails in each size class, besides the stored one
+THUMBNAIL_SIZES: Final[dict[str, int]] = {
+    "small": 150,
+    "medium": 300,
+    "large": 1000,
+}
+
+# Maximum number of thumbnails requested at once
+THUMBNAIL_BATCH_SIZE: Final[int] = 100
+
+# Size classes which can be requested at once, the others are rendered
+THUMBNAIL_BATCH_SIZES: Final[tuple[str, ...]] = ("small", "medium")
+
+# Number of new entries after which the size of the cache is checked, instead
+# of scanning the whole cache for each of them
+THUMBNAIL_EVICT_INTERVAL: Final[int] = 100
+THUMBNAIL_NEW_ENTRIES_KEY: Final[str] = "thumbnail_cache_new_entries"
+
+
+def _scale_image(source: Path, target: Path, width: int) -> None:
+    """
+    Scales the first frame of an image down to the given width and saves it
+    as WebP.  Images are never scaled up
+    """
+    from PIL import Image
+
+    maybe_override_pixel_limit()
+    with Image.open(source) as image:
+        image = image.convert("RGB")
+        image.thumbnail((width, width * THUMBNAIL_MAX_HEIGHT // THUMBNAIL_WIDTH))
+        image.save(target, "WEBP")
+
+
+class ThumbnailCache:
+    def __init__(self, directory: Path, max_size: int) -> None:
+        self.directory = Path(directory)
+        self.max_size = max_size
+
+    def entry_path(self, doc: Document, size: str) -> Path:
+        modified = doc.thumbnail_path.stat().st_mtime_ns
+        return (
+            self.directory / doc.checksum[:2] / f"{doc.checksum}-{modified}-{size}.webp"
+        )
+
+    def get(self, doc: Document, size: str) -> Path:
+        """
+        Returns the thumbnail of the document in the given size class, making
+        it if it isn't cached yet
+        """
+        path = self.entry_path(doc, size)
+        try:
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            pass
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Entries appear completely or not at all, for concurrent requests
+        with tempfile.TemporaryDirectory(dir=path.parent, prefix=".new-") as temp_dir:
+            new_path = Path(temp_dir) / path.name
+            self._make(doc, THUMBNAIL_SIZES[size], new_path)
+            new_path.replace(path)
+
+        self.count_new_entry()
+        return path
+
+    def _make(self, doc: Document, width: int, target: Path) -> None:
+        if width <= THUMBNAIL_WIDTH:
+            _scale_image(doc.thumbnail_path, target, width)
+            return
+
+        try:
+            if doc.has_archive_version or doc.mime_type == "application/pdf":
+                pdf_path = doc.archive_path or doc.source_path
+                rendered = make_thumbnail_from_pdf_gs(
+                    pdf_path,
+                    target.parent,
+                    width=width,
+                )
+                Path(rendered).replace(target)
+            elif doc.mime_type.startswith("image/"):
+                _scale_image(doc.source_path, target, width)
+            else:
+                shutil.copy(doc.thumbnail_path, target)
+        except (ParseError, OSError) as e:
+            # Keep the stored thumbnail, instead of trying again every time
+            logger.warning(
+                f"Unable to make a {width}px thumbnail of document {doc.pk}: {e}",
+            )
+            shutil.copy(doc.thumbnail_path, target)
+
+    def count_new_entry(self) -> None:
+        """
+        Counts a new entry, and evicts entries once every
+        THUMBNAIL_EVICT_INTERVAL new entries
+        """
+        cache.add(THUMBNAIL_NEW_ENTRIES_KEY, 0, None)
+        try:
+            new_entries = cache.incr(THUMBNAIL_NEW_ENTRIES_KEY)
+        except ValueError:
+            # The counter was removed in the meantime
+            new_entries = 0
+        if new_entries >= THUMBNAIL_EVICT_INTERVAL:
+            cache.set(THUMBNAIL_NEW_ENTRIES_KEY, 0, None)
+            self.evict()
+
+    def evict(self) -> None:
+        """
+        Removes the least recently used entries until the cache fits into
+        its maximum size
+        """
+        entries = []
+        total_size = 0
+        for path in self.directory.glob("*/*.webp"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            logger.debug(f"Removing thumbnail cache entry {path.name}")
+            path.unlink(missing_ok=True)
+            total_size -= size
+
+
+def get_thumbnail_cache() -> Optional[ThumbnailCache]:
+    """
+    Returns the thumbnail cache, if it is enabled
+    """
+    if settings.THUMBNAIL_CACHE_SIZE <= 0:
+        return None
+    return ThumbnailCache(
+        settings.THUMBNAIL_CACHE_DIR,
+        settings.THUMBNAIL_CACHE_SIZE * 1024 * 1024,
+    )
+
+
+def get_thumbnail_path(doc: Document, size: Optional[str] = None) -> Path:
+    """
+    Returns the thumbnail of the document in the given size class.  Without a
+    size class, for encrypted documents and without the cache, this is the
+    stored thumbnail
+    """
+    thumbnail_cache = get_thumbnail_cache()
+    if (
+        size is None
+        or thumbnail_cache is None
+        or doc.storage_type == Document.STORAGE_TYPE_GPG
+    ):
+        return doc.thumbnail_path
+    return thumbnail_cache.get(doc, size)
+
+
+def build_multipart(parts: list[tuple[str, bytes]]) -> tuple[bytes, str]:
+    """
+    Builds a multipart/form-data body of WebP images, with the part names
+    given.  Returns the body and its content type including the boundary
+    """
+    boundary = secrets.token_hex(16)
+    body = bytearray()
+    for name, content in parts:
+        body += (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{name}"; filename="{name}.webp"\r\n'
+            "Content-Type: image/webp\r\n"
+            f"Content-Length: {len(content)}\r\n\r\n"
+        ).encode()
+        body += content
+        body += b"\r\n"
+    body += f"--{boundary}--\r\n".encode()
+    return bytes(body), f"multipart/form-data; boundary={boundary}"
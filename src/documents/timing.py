@@ -0,0 +1,130 @@
+"""
+Durations and sizes of the stages of consuming a document.
+
+The stages are recorded into the StageTimings of the current consumption,
+if there is one, so instrumented code doesn't need to know whether it runs
+as part of a consumption.  Stages may be nested and a stage which runs
+several times, like matching for each document handler, adds up.
+"""
+
+import math
+from collections.abc import Iterable
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+from typing import Optional
+
+# How many recent consumptions the aggregated metrics are computed from
+METRICS_TASK_COUNT = 1000
+
+
+class StageTimings:
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._stages: dict[str, dict[str, float]] = {}
+
+    def add(
+        self,
+        name: str,
+        duration: Optional[float] = None,
+        size: Optional[int] = None,
+    ) -> None:
+        # Stages running in background threads report at the same time
+        with self._lock:
+            stage = self._stages.setdefault(name, {})
+            if duration is not None:
+                stage["duration"] = stage.get("duration", 0.0) + duration
+            if size is not None:
+                stage["bytes"] = stage.get("bytes", 0) + size
+
+    def as_dict(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {
+                name: {
+                    key: round(value, 6) if key == "duration" else value
+                    for key, value in stage.items()
+                }
+                for name, stage in self._stages.items()
+            }
+
+
+_current: ContextVar[Optional[StageTimings]] = ContextVar(
+    "stage_timings",
+    default=None,
+)
+
+
+@contextmanager
+def recording(timings: StageTimings):
+    """
+    Records all stages within the context into the given timings
+    """
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def record_stage(name: str):
+    """
+    Records the duration of the stage, also when it fails.  Can be used as a
+    decorator as well
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, duration=perf_counter() - start)
+
+
+def record_size(name: str, size: int) -> None:
+    """
+    Records the number of bytes a stage processed
+    """
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, size=size)
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    # Nearest rank, the values must be sorted
+    return values[max(0, math.ceil(percentile * len(values)) - 1)]
+
+
+def summarize(
+    all_timings: Iterable[dict[str, dict[str, float]]],
+) -> dict[str, dict[str, float]]:
+    """
+    Aggregates the timings of many consumptions into the number of
+    consumptions which ran each stage, and the median and 95th percentile of
+    its duration and size
+    """
+    durations: dict[str, list[float]] = {}
+    sizes: dict[str, list[int]] = {}
+    for timings in all_timings:
+        for name, stage in timings.items():
+            if "duration" in stage:
+                durations.setdefault(name, []).append(stage["duration"])
+            if "bytes" in stage:
+                sizes.setdefault(name, []).append(stage["bytes"])
+
+    summary = {}
+    for name in sorted(durations.keys() | sizes.keys()):
+        stage_durations = sorted(durations.get(name, []))
+        stage_sizes = sorted(sizes.get(name, []))
+        summary[name] = {"count": max(len(stage_durations), len(stage_sizes))}
+        if stage_durations:
+            summary[name]["p50"] = _percentile(stage_durations, 0.5)
+            summary[name]["p95"] = _percentile(stage_durations, 0.95)
+        if stage_sizes:
+            summary[name]["bytes_p50"] = _percentile(stage_sizes, 0.5)
+            summary[name]["bytes_p95"] = _percentile(stage_sizes, 0.95)
+    return summary
@@ -1,11 +1,19 @@
+import errno
+import functools
+import hashlib
+import logging
+import os
 import shutil
+from collections import Counter
 from os import utime
 from pathlib import Path
+from typing import Final
 from typing import Optional
 from typing import Union
 
 from django.conf import settings
-from PIL import Image
+
+logger = logging.getLogger("paperless.utils")
 
 
 def _coerce_to_path(
@@ -40,16 +48,188 @@ def copy_file_with_basic_stats(
     The extended attribute copy does weird things with SELinux and files
     copied from temporary directories.
     """
-    source, dest = _coerce_to_path(source, dest)
+    place_file(source, dest)
+    # Like shutil.copy, keep the permission bits
+    shutil.copymode(source, dest)
+
+
+CHECKSUM_CHUNK_SIZE: Final[int] = 1024 * 1024
+
+
+def compute_checksum(path: Union[Path, str]) -> str:
+    """
+    Returns the MD5 checksum of the given file.  The file is read in chunks,
+    so it is never held in memory completely
+    """
+    checksum = hashlib.md5()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHECKSUM_CHUNK_SIZE):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+def copy_file_with_checksum(
+    source: Union[Path, str],
+    dest: Union[Path, str],
+) -> str:
+    """
+    Copies the contents of source to dest in chunks and returns the MD5
+    checksum of the copied data, so the file only needs to be read once
+    to both copy and hash it.
+
+    File stats are not copied, see copy_basic_file_stats
+    """
+    checksum = hashlib.md5()
+    with open(source, "rb") as read_file, open(dest, "wb") as write_file:
+        while chunk := read_file.read(CHECKSUM_CHUNK_SIZE):
+            checksum.update(chunk)
+            write_file.write(chunk)
+    return checksum.hexdigest()
+
+
+# From linux/fs.h, clones the extents of a file on copy-on-write filesystems
+FICLONE: Final[int] = 0x40049409
+
+# How often each strategy was used to place files, per process
+FILE_PLACEMENT_COUNTS: Counter = Counter()
+
+
+class ShortCopyError(OSError):
+    """
+    An in-kernel copy copied less than the whole file, which happens on some
+    filesystems instead of an error
+    """
+
+
+def _reflink(read_file, write_file, size: int) -> None:
+    import fcntl
+
+    fcntl.ioctl(write_file.fileno(), FICLONE, read_file.fileno())
 
-    shutil.copy(source, dest)
-    copy_basic_file_stats(source, dest)
+
+def _copy_file_range(read_file, write_file, size: int) -> None:
+    copied = 0
+    while copied < size:
+        count = os.copy_file_range(
+            read_file.fileno(),
+            write_file.fileno(),
+            min(size - copied, 2**30),
+        )
+        if count == 0:
+            raise ShortCopyError(f"Copied {copied} of {size} bytes")
+        copied += count
+
+
+def _sendfile(read_file, write_file, size: int) -> None:
+    offset = 0
+    while offset < size:
+        sent = os.sendfile(
+            write_file.fileno(),
+            read_file.fileno(),
+            offset,
+            min(size - offset, 2**30),
+        )
+        if sent == 0:
+            raise ShortCopyError(f"Sent {offset} of {size} bytes")
+        offset += sent
+
+
+def _userspace_copy(read_file, write_file, size: int) -> None:
+    shutil.copyfileobj(read_file, write_file, CHECKSUM_CHUNK_SIZE)
+
+
+@functools.lru_cache(maxsize=1)
+def _new_file_mode() -> int:
+    """
+    The mode of files created by this process, as set by its umask
+    """
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def place_file(
+    source: Union[Path, str],
+    dest: Union[Path, str],
+    *,
+    move: bool = False,
+) -> str:
+    """
+    Places the contents of source at dest, using the cheapest strategy the
+    platform and filesystems support:
+
+    - an atomic rename, if the source may be moved
+    - a reflink, sharing the data on copy-on-write filesystems
+    - copy_file_range or sendfile, copying the data within the kernel
+    - a copy through userspace
+
+    If move is set, the source no longer exists afterwards.  The access and
+    modified times are kept, see copy_basic_file_stats.  The mode of dest is
+    the one of a new file, also if it was renamed.  Returns the used strategy
+    """
+    if move:
+        try:
+            os.rename(source, dest)
+        except OSError as e:
+            # Different filesystems, fall back to copying
+            if e.errno != errno.EXDEV:
+                raise
+        else:
+            # Temporary files are only accessible by their owner
+            os.chmod(dest, _new_file_mode())
+            return _file_placed("rename", source, dest)
+
+    strategies = [("reflink", _reflink)]
+    if hasattr(os, "copy_file_range"):
+        strategies.append(("copy_file_range", _copy_file_range))
+    if hasattr(os, "sendfile"):
+        strategies.append(("sendfile", _sendfile))
+    strategies.append(("copy", _userspace_copy))
+
+    with open(source, "rb") as read_file, open(dest, "wb") as write_file:
+        size = os.fstat(read_file.fileno()).st_size
+        short_copy = False
+        for name, strategy in strategies:
+            if short_copy and name != "copy":
+                continue
+            try:
+                strategy(read_file, write_file, size)
+                break
+            except OSError as e:
+                if name == "copy":
+                    raise
+                logger.debug(f"Unable to place {dest} using {name}: {e}")
+                # Don't trust the other in-kernel copies after a short one
+                short_copy = isinstance(e, ShortCopyError)
+                # Start over with the next strategy
+                read_file.seek(0)
+                write_file.seek(0)
+                write_file.truncate()
+
+    # Attempt to copy file's original stats, but it's ok if we can't
+    try:
+        copy_basic_file_stats(source, dest)
+    except Exception as e:  # pragma: no cover
+        logger.debug(f"Unable to copy file stats of {source} to {dest}: {e}")
+
+    if move:
+        os.unlink(source)
+
+    return _file_placed(name, source, dest)
+
+
+def _file_placed(strategy: str, source, dest) -> str:
+    FILE_PLACEMENT_COUNTS[strategy] += 1
+    logger.debug(f"Placed {source} at {dest} using {strategy}")
+    return strategy
 
 
 def maybe_override_pixel_limit() -> None:
     """
     Maybe overrides the PIL limit on pixel count, if configured to allow it
     """
+    from PIL import Image
+
     limit: Optional[Union[float, int]] = settings.MAX_IMAGE_PIXELS
     if limit is not None and limit >= 0:
         pixel_count = limit
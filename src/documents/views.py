@@ -1,3 +1,4 @@
+import hashlib
 import itertools
 import json
 import logging
@@ -6,7 +7,7 @@ import platform
 import re
 import tempfile
 import urllib
-import zipfile
+import uuid
 from datetime import datetime
 from pathlib import Path
 from time import mktime
@@ -18,7 +19,9 @@ import pathvalidate
 from django.apps import apps
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.db import connections
+from django.db import transaction
 from django.db.migrations.loader import MigrationLoader
 from django.db.migrations.recorder import MigrationRecorder
 from django.db.models import Case
@@ -37,19 +40,23 @@ from django.http import HttpResponseForbidden
 from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from django.utils.decorators import method_decorator
+from django.utils.http import http_date
+from django.utils.http import quote_etag
 from django.utils.timezone import make_aware
 from django.utils.translation import get_language
 from django.views import View
 from django.views.decorators.cache import cache_control
 from django.views.decorators.http import condition
-from django.views.decorators.http import last_modified
 from django.views.generic import TemplateView
 from django_filters.rest_framework import DjangoFilterBackend
+from guardian.core import ObjectPermissionChecker
 from langdetect import detect
 from packaging import version as packaging_version
 from redis import Redis
 from rest_framework import parsers
+from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.exceptions import NotFound
 from rest_framework.filters import OrderingFilter
@@ -63,6 +70,7 @@ from rest_framework.mixins import UpdateModelMixin
 from rest_framework.permissions import DjangoModelPermissions
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.serializers import ListSerializer
 from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
 from rest_framework.viewsets import ModelViewSet
@@ -71,14 +79,20 @@ from rest_framework.viewsets import ViewSet
 
 from documents import bulk_edit
 from documents import index
-from documents.bulk_download import ArchiveOnlyStrategy
-from documents.bulk_download import OriginalAndArchiveStrategy
-from documents.bulk_download import OriginalsOnlyStrategy
+from documents.bulk_download import BULK_DOWNLOAD_BUILD_TIMEOUT
+from documents.bulk_download import BULK_DOWNLOAD_FILENAME
+from documents.bulk_download import STRATEGIES
+from documents.bulk_download import archive_key
+from documents.bulk_download import get_archive_path
+from documents.bulk_download import get_build_cache_key
+from documents.bulk_download import stream_archive
 from documents.caching import CACHE_50_MINUTES
+from documents.caching import get_date_suggestions_cache
 from documents.caching import get_metadata_cache
 from documents.caching import get_suggestion_cache
 from documents.caching import refresh_metadata_cache
 from documents.caching import refresh_suggestions_cache
+from documents.caching import set_date_suggestions_cache
 from documents.caching import set_metadata_cache
 from documents.caching import set_suggestions_cache
 from documents.classifier import load_classifier
@@ -88,10 +102,13 @@ from documents.conditionals import preview_etag
 from documents.conditionals import preview_last_modified
 from documents.conditionals import suggestions_etag
 from documents.conditionals import suggestions_last_modified
+from documents.conditionals import thumbnail_etag
 from documents.conditionals import thumbnail_last_modified
 from documents.data_models import ConsumableDocument
 from documents.data_models import DocumentMetadataOverrides
 from documents.data_models import DocumentSource
+from documents.file_responses import SyncStreamingHttpResponse
+from documents.file_responses import file_response
 from documents.filters import CorrespondentFilterSet
 from documents.filters import CustomFieldFilterSet
 from documents.filters import DocumentFilterSet
@@ -118,13 +135,15 @@ from documents.models import UiSettings
 from documents.models import Workflow
 from documents.models import WorkflowAction
 from documents.models import WorkflowTrigger
+from documents.ocr_cache import get_ocr_cache_statistics
 from documents.parsers import get_parser_class_for_mime_type
 from documents.parsers import parse_date_generator
 from documents.permissions import PaperlessAdminPermissions
 from documents.permissions import PaperlessObjectPermissions
 from documents.permissions import get_objects_for_user_owner_aware
 from documents.permissions import has_perms_owner_aware
-from documents.permissions import set_permissions_for_object
+from documents.permissions import set_permissions_for_objects
+from documents.routing import get_queue_depths
 from documents.serialisers import AcknowledgeTasksViewSerializer
 from documents.serialisers import BulkDownloadSerializer
 from documents.serialisers import BulkEditObjectsSerializer
@@ -146,7 +165,15 @@ from documents.serialisers import WorkflowActionSerializer
 from documents.serialisers import WorkflowSerializer
 from documents.serialisers import WorkflowTriggerSerializer
 from documents.signals import document_updated
+from documents.tasks import build_bulk_download
 from documents.tasks import consume_file
+from documents.thumbnails import THUMBNAIL_BATCH_SIZE
+from documents.thumbnails import THUMBNAIL_BATCH_SIZES
+from documents.thumbnails import THUMBNAIL_SIZES
+from documents.thumbnails import build_multipart
+from documents.thumbnails import get_thumbnail_path
+from documents.timing import METRICS_TASK_COUNT
+from documents.timing import summarize
 from paperless import version
 from paperless.celery import app as celery_app
 from paperless.config import GeneralConfig
@@ -380,10 +407,8 @@ class DocumentViewSet(
         return response
 
     def destroy(self, request, *args, **kwargs):
-        from documents import index
-
-        index.remove_document_from_index(self.get_object())
-        return super().destroy(request, *args, **kwargs)
+        bulk_edit.delete([self.get_object().pk])
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     @staticmethod
     def original_requested(request):
@@ -405,6 +430,7 @@ class DocumentViewSet(
             use_archive=not self.original_requested(request)
             and doc.has_archive_version,
             disposition=disposition,
+            request=request,
         )
 
     def get_metadata(self, file, mime_type):
@@ -513,12 +539,22 @@ class DocumentViewSet(
 
         classifier = load_classifier()
 
-        dates = []
-        if settings.NUMBER_OF_SUGGESTED_DATES > 0:
-            gen = parse_date_generator(doc.filename, doc.content)
-            dates = sorted(
-                {i for i in itertools.islice(gen, settings.NUMBER_OF_SUGGESTED_DATES)},
-            )
+        dates = get_date_suggestions_cache(doc)
+        if dates is None:
+            dates = []
+            if settings.NUMBER_OF_SUGGESTED_DATES > 0:
+                gen = parse_date_generator(doc.filename, doc.content)
+                dates = [
+                    date.strftime("%Y-%m-%d")
+                    for date in sorted(
+                        set(
+                            itertools.islice(gen, settings.NUMBER_OF_SUGGESTED_DATES),
+                        ),
+                    )
+                ]
+            # Cached separately, the suggestions are only cached with a
+            # classifier and invalidated whenever it is trained again
+            set_date_suggestions_cache(doc, dates)
 
         resp_data = {
             "correspondents": [
@@ -531,7 +567,7 @@ class DocumentViewSet(
             "storage_paths": [
                 dt.id for dt in match_storage_paths(doc, classifier, request.user)
             ],
-            "dates": [date.strftime("%Y-%m-%d") for date in dates if date is not None],
+            "dates": dates,
         }
 
         # Cache the suggestions and the classifier hash for later
@@ -553,8 +589,18 @@ class DocumentViewSet(
 
     @action(methods=["get"], detail=True)
     @method_decorator(cache_control(public=False, max_age=CACHE_50_MINUTES))
-    @method_decorator(last_modified(thumbnail_last_modified))
+    @method_decorator(
+        condition(
+            etag_func=thumbnail_etag,
+            last_modified_func=thumbnail_last_modified,
+        ),
+    )
     def thumb(self, request, pk=None):
+        size = request.query_params.get("size")
+        if size is not None and size not in THUMBNAIL_SIZES:
+            return HttpResponseBadRequest(
+                f"Unknown size, use one of {', '.join(THUMBNAIL_SIZES)}",
+            )
         try:
             doc = Document.objects.get(id=pk)
             if request.user is not None and not has_perms_owner_aware(
@@ -564,14 +610,102 @@ class DocumentViewSet(
             ):
                 return HttpResponseForbidden("Insufficient permissions")
             if doc.storage_type == Document.STORAGE_TYPE_GPG:
-                handle = GnuPG.decrypted(doc.thumbnail_file)
+                with doc.thumbnail_file as handle:
+                    thumbnail = GnuPG.decrypted(handle)
             else:
-                handle = doc.thumbnail_file
+                thumbnail = get_thumbnail_path(doc, size)
 
-            return HttpResponse(handle, content_type="image/webp")
+            return file_response(request, thumbnail, "image/webp")
         except (FileNotFoundError, Document.DoesNotExist):
             raise Http404
 
+    @action(methods=["get"], detail=False)
+    @method_decorator(cache_control(private=True, no_cache=True))
+    def thumbs(self, request):
+        """
+        The thumbnails of several documents as multipart/form-data, with one
+        part named by the id of each document.  Documents which don't exist,
+        which the user may not view or without a thumbnail are left out.
+        Clients revalidate the response, which is cheap, as its validators
+        only depend on the stored thumbnails
+        """
+        size = request.query_params.get("size")
+        if size is not None and size not in THUMBNAIL_BATCH_SIZES:
+            return HttpResponseBadRequest(
+                f"Unknown size, use one of {', '.join(THUMBNAIL_BATCH_SIZES)}",
+            )
+        try:
+            ids = [
+                int(doc_id)
+                for doc_id in request.query_params.get("ids", "").split(",")
+                if doc_id
+            ]
+        except ValueError:
+            return HttpResponseBadRequest("ids must be a list of document ids")
+        if not ids or len(ids) > THUMBNAIL_BATCH_SIZE:
+            return HttpResponseBadRequest(
+                f"Between 1 and {THUMBNAIL_BATCH_SIZE} ids are required",
+            )
+
+        documents = get_objects_for_user_owner_aware(
+            request.user,
+            "documents.view_document",
+            Document,
+        ).filter(id__in=ids)
+
+        thumbnails = []
+        for doc in documents.order_by("id").only(
+            "id",
+            "checksum",
+            "mime_type",
+            "storage_type",
+            "filename",
+            "archive_filename",
+        ):
+            try:
+                modified = doc.thumbnail_path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            thumbnails.append((doc, modified))
+
+        etag = quote_etag(
+            hashlib.sha256(
+                ";".join(
+                    [size or "default"]
+                    + [
+                        f"{doc.pk}:{doc.checksum}:{modified}"
+                        for doc, modified in thumbnails
+                    ],
+                ).encode(),
+            ).hexdigest(),
+        )
+        last_modified = int(max((modified for _, modified in thumbnails), default=0))
+        not_modified = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified,
+        )
+        if not_modified is not None:
+            return not_modified
+
+        parts = []
+        for doc, _ in thumbnails:
+            try:
+                if doc.storage_type == Document.STORAGE_TYPE_GPG:
+                    with doc.thumbnail_file as handle:
+                        content = GnuPG.decrypted(handle)
+                else:
+                    content = get_thumbnail_path(doc, size).read_bytes()
+            except FileNotFoundError:
+                continue
+            parts.append((str(doc.pk), content))
+
+        body, content_type = build_multipart(parts)
+        response = HttpResponse(body, content_type=content_type)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        return response
+
     @action(methods=["get"], detail=True)
     def download(self, request, pk=None):
         try:
@@ -731,9 +865,48 @@ class DocumentViewSet(
             return Response(links)
 
 
+class SearchResultListSerializer(ListSerializer):
+    """
+    Hydrates a whole page of search hits with a single bulk query instead of
+    loading each hit's document separately, keeping the Whoosh rank order.
+    """
+
+    def to_representation(self, data):
+        hits = list(data)
+        documents = self.child.get_documents([hit["id"] for hit in hits])
+        if self.child.user is not None and len(documents) > 0:
+            self.child.permission_checker = ObjectPermissionChecker(self.child.user)
+            self.child.permission_checker.prefetch_perms(documents.values())
+
+        highlight_terms = (
+            index.get_highlight_terms(hits[0].results, "content")
+            if len(hits) > 0 and self.child.include_highlights
+            else None
+        )
+
+        # Hits for documents which were removed but are still in the index
+        # are skipped
+        return [
+            self.child.hit_to_representation(
+                hit,
+                documents[hit["id"]],
+                highlight_terms,
+            )
+            for hit in hits
+            if hit["id"] in documents
+        ]
+
+
 class SearchResultSerializer(DocumentSerializer, PassUserMixin):
-    def to_representation(self, instance):
-        doc = (
+    def __init__(self, *args, **kwargs):
+        # Highlights can be loaded separately, see UnifiedSearchViewSet.highlights
+        self.include_highlights = kwargs.pop("include_highlights", True)
+        super().__init__(*args, **kwargs)
+        self.permission_checker = None
+
+    @staticmethod
+    def get_documents(document_ids) -> dict[int, Document]:
+        return (
             Document.objects.select_related(
                 "correspondent",
                 "storage_path",
@@ -741,23 +914,40 @@ class SearchResultSerializer(DocumentSerializer, PassUserMixin):
                 "owner",
             )
             .prefetch_related("tags", "custom_fields", "notes")
-            .get(id=instance["id"])
+            .in_bulk(document_ids)
         )
-        notes = ",".join(
-            [str(c.note) for c in doc.notes.all()],
+
+    def get_user_can_change(self, obj):
+        if self.permission_checker is None:
+            return super().get_user_can_change(obj)
+        return (
+            obj.owner is None
+            or obj.owner == self.user
+            or self.permission_checker.has_perm("change_document", obj)
         )
+
+    def hit_to_representation(self, hit, doc: Document, highlight_terms=None):
         r = super().to_representation(doc)
         r["__search_hit__"] = {
-            "score": instance.score,
-            "highlights": instance.highlights("content", text=doc.content),
-            "note_highlights": (
-                instance.highlights("notes", text=notes) if doc else None
-            ),
-            "rank": instance.rank,
+            "score": hit.score,
+            "highlights": None,
+            "note_highlights": None,
+            "rank": hit.rank,
         }
+        if self.include_highlights:
+            r["__search_hit__"].update(
+                index.get_hit_highlights(hit, doc, highlight_terms),
+            )
 
         return r
 
+    def to_representation(self, instance):
+        doc = self.get_documents([instance["id"]])[instance["id"]]
+        return self.hit_to_representation(instance, doc)
+
+    class Meta(DocumentSerializer.Meta):
+        list_serializer_class = SearchResultListSerializer
+
 
 class UnifiedSearchViewSet(DocumentViewSet):
     def __init__(self, *args, **kwargs):
@@ -770,6 +960,12 @@ class UnifiedSearchViewSet(DocumentViewSet):
         else:
             return DocumentSerializer
 
+    def get_serializer(self, *args, **kwargs):
+        if self._is_search_request():
+            highlights = self.request.query_params.get("highlights", "true")
+            kwargs.setdefault("include_highlights", highlights.lower() in ["true", "1"])
+        return super().get_serializer(*args, **kwargs)
+
     def _is_search_request(self):
         return (
             "query" in self.request.query_params
@@ -814,6 +1010,40 @@ class UnifiedSearchViewSet(DocumentViewSet):
         else:
             return super().list(request)
 
+    @action(methods=["get"], detail=True)
+    def highlights(self, request, pk=None):
+        if "query" not in request.query_params:
+            return HttpResponseBadRequest("Query required")
+
+        doc = get_object_or_404(
+            Document.objects.prefetch_related("notes"),
+            pk=pk,
+        )
+        if request.user is not None and not has_perms_owner_aware(
+            request.user,
+            "view_document",
+            doc,
+        ):
+            return HttpResponseForbidden("Insufficient permissions")
+
+        try:
+            with index.open_index_searcher() as s:
+                highlights = index.get_document_highlights(
+                    s,
+                    doc,
+                    request.query_params,
+                    request.user,
+                )
+        except Exception as e:
+            logger.warning(f"An error occurred building search highlights: {e!s}")
+            return HttpResponseBadRequest(
+                "Error building search highlights, check logs for more detail.",
+            )
+
+        if highlights is None:
+            raise Http404
+        return Response(highlights)
+
     @action(detail=False, methods=["GET"], name="Get Next ASN")
     def next_asn(self, request, *args, **kwargs):
         max_asn = Document.objects.aggregate(
@@ -905,6 +1135,13 @@ class BulkEditView(GenericAPIView, PassUserMixin):
         try:
             # TODO: parameter validation
             result = method(documents, **parameters)
+            if method == bulk_edit.rotate:
+                # Runs in several tasks, the result is the id sent with their
+                # progress
+                return Response({"result": "OK", "operation_id": result})
+            if method in [bulk_edit.merge, bulk_edit.split]:
+                # These run in the background, the result is the id of the task
+                return Response({"result": "OK", "task_id": result})
             return Response({"result": result})
         except Exception as e:
             logger.warning(f"An error occurred performing bulk edit: {e!s}")
@@ -1164,35 +1401,82 @@ class BulkDownloadView(GenericAPIView):
         compression = serializer.validated_data.get("compression")
         content = serializer.validated_data.get("content")
         follow_filename_format = serializer.validated_data.get("follow_formatting")
+        mode = serializer.validated_data.get("mode")
 
-        settings.SCRATCH_DIR.mkdir(parents=True, exist_ok=True)
-        temp = tempfile.NamedTemporaryFile(
-            dir=settings.SCRATCH_DIR,
-            suffix="-compressed-archive",
-            delete=False,
-        )
+        documents = Document.objects.in_bulk(ids)
+        documents = [documents[id] for id in ids if id in documents]
 
-        if content == "both":
-            strategy_class = OriginalAndArchiveStrategy
-        elif content == "originals":
-            strategy_class = OriginalsOnlyStrategy
+        # A zip file built before is served, while its documents didn't change
+        key = archive_key(documents, content, compression, follow_filename_format)
+        archive_path = get_archive_path(key)
+        try:
+            # Keeps the zip file until it wasn't used for a while
+            os.utime(archive_path)
+        except FileNotFoundError:
+            if mode == "async":
+                task_id = self._build_archive(
+                    key,
+                    documents,
+                    content,
+                    compression,
+                    follow_filename_format,
+                )
+                return Response(
+                    {"task_id": task_id, "bulk_download": key},
+                    status=status.HTTP_202_ACCEPTED,
+                )
+            response = SyncStreamingHttpResponse(
+                stream_archive(
+                    documents,
+                    STRATEGIES[content],
+                    compression,
+                    follow_filename_format,
+                ),
+                content_type="application/zip",
+            )
         else:
-            strategy_class = ArchiveOnlyStrategy
-
-        with zipfile.ZipFile(temp.name, "w", compression) as zipf:
-            strategy = strategy_class(zipf, follow_filename_format)
-            for id in ids:
-                doc = Document.objects.get(id=id)
-                strategy.add_document(doc)
-
-        with open(temp.name, "rb") as f:
-            response = HttpResponse(f, content_type="application/zip")
-            response["Content-Disposition"] = '{}; filename="{}"'.format(
-                "attachment",
-                "documents.zip",
+            response = file_response(
+                request,
+                archive_path,
+                "application/zip",
+                etag=key,
             )
 
-            return response
+        response["Content-Disposition"] = '{}; filename="{}"'.format(
+            "attachment",
+            BULK_DOWNLOAD_FILENAME,
+        )
+
+        return response
+
+    def _build_archive(
+        self,
+        key: str,
+        documents: list[Document],
+        content: str,
+        compression: int,
+        follow_formatting: bool,
+    ) -> str:
+        """
+        Queues building the zip file in the background, unless it is built
+        already.  Returns the id of the task building it
+        """
+        task_id = str(uuid.uuid4())
+        build_cache_key = get_build_cache_key(key)
+        if not cache.add(build_cache_key, task_id, BULK_DOWNLOAD_BUILD_TIMEOUT):
+            return cache.get(build_cache_key, task_id)
+
+        build_bulk_download.apply_async(
+            kwargs={
+                "document_ids": [doc.pk for doc in documents],
+                "content": content,
+                "compression": compression,
+                "follow_formatting": follow_formatting,
+                "owner_id": self.request.user.id,
+            },
+            task_id=task_id,
+        )
+        return task_id
 
 
 class StoragePathViewSet(ModelViewSet, PermissionsAwareDocumentCountMixin):
@@ -1359,6 +1643,20 @@ class TasksViewSet(ReadOnlyModelViewSet):
             queryset = PaperlessTask.objects.filter(task_id=task_id)
         return queryset
 
+    @action(methods=["get"], detail=False)
+    def metrics(self, request):
+        """
+        Median and 95th percentile duration of every stage of consumption,
+        over the most recent consumptions
+        """
+        timings = (
+            PaperlessTask.objects.filter(stage_timings__isnull=False)
+            .order_by("-date_created")
+            .values_list("stage_timings", flat=True)[:METRICS_TASK_COUNT]
+        )
+        timings = list(timings)
+        return Response({"count": len(timings), "stages": summarize(timings)})
+
 
 class AcknowledgeTasksView(GenericAPIView):
     permission_classes = (IsAuthenticated,)
@@ -1410,26 +1708,37 @@ class SharedLinkView(View):
             doc=share_link.document,
             use_archive=share_link.file_version == "archive",
             disposition="inline",
+            request=request,
         )
 
 
-def serve_file(doc: Document, use_archive: bool, disposition: str):
+def serve_file(doc: Document, use_archive: bool, disposition: str, request):
     if use_archive:
-        file_handle = doc.archive_file
+        file_path = doc.archive_path
+        checksum = doc.archive_checksum
         filename = doc.get_public_filename(archive=True)
         mime_type = "application/pdf"
     else:
-        file_handle = doc.source_file
+        file_path = doc.source_path
+        checksum = doc.checksum
         filename = doc.get_public_filename()
         mime_type = doc.mime_type
         # Support browser previewing csv files by using text mime type
         if mime_type in {"application/csv", "text/csv"} and disposition == "inline":
             mime_type = "text/plain"
 
+    if checksum:
+        not_modified = get_conditional_response(request, etag=quote_etag(checksum))
+        if not_modified is not None:
+            return not_modified
+
     if doc.storage_type == Document.STORAGE_TYPE_GPG:
-        file_handle = GnuPG.decrypted(file_handle)
+        with open(file_path, "rb") as file_handle:
+            file = GnuPG.decrypted(file_handle)
+    else:
+        file = file_path
 
-    response = HttpResponse(file_handle, content_type=mime_type)
+    response = file_response(request, file, mime_type, etag=checksum)
     # Firefox is not able to handle unicode characters in filename field
     # RFC 5987 addresses this issue
     # see https://datatracker.ietf.org/doc/html/rfc5987#section-4.2
@@ -1487,19 +1796,19 @@ class BulkEditObjectsView(GenericAPIView, PassUserMixin):
             try:
                 qs = object_class.objects.filter(id__in=object_ids)
 
-                # if merge is true, we dont want to remove the owner
-                if "owner" in serializer.validated_data and (
-                    not merge or (merge and owner is not None)
-                ):
-                    # if merge is true, we dont want to overwrite the owner
-                    qs_owner_update = qs.filter(owner__isnull=True) if merge else qs
-                    qs_owner_update.update(owner=owner)
-
-                if "permissions" in serializer.validated_data:
-                    for obj in qs:
-                        set_permissions_for_object(
+                with transaction.atomic():
+                    # if merge is true, we dont want to remove the owner
+                    if "owner" in serializer.validated_data and (
+                        not merge or (merge and owner is not None)
+                    ):
+                        # if merge is true, we dont want to overwrite the owner
+                        qs_owner_update = qs.filter(owner__isnull=True) if merge else qs
+                        qs_owner_update.update(owner=owner)
+
+                    if "permissions" in serializer.validated_data:
+                        set_permissions_for_objects(
                             permissions=permissions,
-                            object=obj,
+                            objects=qs.only("pk"),
                             merge=merge,
                         )
 
@@ -1635,6 +1944,18 @@ class SystemStatusView(GenericAPIView, PassUserMixin):
                 )
                 redis_error = "Error connecting to redis, check logs for more detail."
 
+        try:
+            queue_depths = get_queue_depths()
+        except Exception as e:
+            queue_depths = None
+            logger.debug(f"Unable to get the task queue depths: {e}")
+
+        try:
+            ocr_cache_statistics = get_ocr_cache_statistics()
+        except Exception as e:
+            ocr_cache_statistics = None
+            logger.debug(f"Unable to get the OCR cache statistics: {e}")
+
         try:
             celery_ping = celery_app.control.inspect().ping()
             first_worker_ping = celery_ping[next(iter(celery_ping.keys()))]
@@ -1738,6 +2059,8 @@ class SystemStatusView(GenericAPIView, PassUserMixin):
                     "redis_status": redis_status,
                     "redis_error": redis_error,
                     "celery_status": celery_active,
+                    "queue_depths": queue_depths,
+                    "ocr_cache": ocr_cache_statistics,
                     "index_status": index_status,
                     "index_last_modified": index_last_modified,
                     "index_error": index_error,
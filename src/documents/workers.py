@@ -0,0 +1,85 @@
+"""
+Preparation of the worker processes running the background tasks.
+
+By default, every task runs in a new process, which imports the heavy
+libraries and loads the classifier while running the task.  Warm workers
+(WORKER_WARM) import the libraries once in the main worker process, which the
+task processes are forked from, and load the classifier once per process.
+The classifier is loaded again when the model file changes.
+"""
+
+import importlib
+import logging
+import time
+from typing import TYPE_CHECKING
+from typing import Final
+from typing import Optional
+
+from django.conf import settings
+
+from documents.classifier import load_classifier
+
+if TYPE_CHECKING:
+    from documents.classifier import DocumentClassifier
+
+logger = logging.getLogger("paperless.workers")
+
+# Libraries which take a while to import, used by consumption, classification
+# and the search index
+HEAVY_MODULES: Final[tuple[str, ...]] = (
+    "ocrmypdf",
+    "pikepdf",
+    "PIL.Image",
+    "magic",
+    "dateparser",
+    "nltk",
+    "sklearn.feature_extraction.text",
+    "sklearn.neural_network",
+    "sklearn.preprocessing",
+    "whoosh.index",
+)
+
+# The classifier and the modification time and size of the model file it
+# was loaded from
+_classifier: Optional[tuple[tuple[int, int], Optional["DocumentClassifier"]]] = None
+
+
+def get_classifier() -> Optional["DocumentClassifier"]:
+    """
+    Returns the classifier.  In warm workers, it is only loaded again if the
+    model file changed since this process last loaded it
+    """
+    global _classifier
+
+    if not settings.WORKER_WARM:
+        return load_classifier()
+
+    try:
+        stat = settings.MODEL_FILE.stat()
+    except FileNotFoundError:
+        _classifier = None
+        return None
+
+    key = (stat.st_mtime_ns, stat.st_size)
+    if _classifier is None or _classifier[0] != key:
+        _classifier = (key, load_classifier())
+    return _classifier[1]
+
+
+def import_heavy_modules() -> None:
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:  # pragma: no cover
+            logger.debug(f"Not preloading {name}, it is not installed")
+
+
+def warm_up() -> float:
+    """
+    Imports the heavy libraries and loads the classifier, unless this process
+    did so already.  Returns how many seconds this took
+    """
+    start = time.perf_counter()
+    import_heavy_modules()
+    get_classifier()
+    return time.perf_counter() - start
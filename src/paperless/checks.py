@@ -191,11 +191,23 @@ def settings_values_check(app_configs, **kwargs):
             )
         return msgs
 
+    def _sendfile_header_validate():
+        msgs = []
+        if settings.SENDFILE_HEADER is not None and settings.SENDFILE_HEADER not in {
+            "x-accel-redirect",
+            "x-sendfile",
+        }:
+            msgs.append(
+                Error(f'Sendfile header "{settings.SENDFILE_HEADER}" is not valid'),
+            )
+        return msgs
+
     return (
         _ocrmypdf_settings_check()
         + _timezone_validate()
         + _barcode_scanner_validate()
         + _email_certificate_validate()
+        + _sendfile_header_validate()
     )
 
 
@@ -1,3 +1,6 @@
+from compression_middleware.middleware import (
+    CompressionMiddleware as BaseCompressionMiddleware,
+)
 from django.conf import settings
 
 from paperless import version
@@ -15,3 +18,19 @@ class ApiVersionMiddleware:
             response["X-Version"] = version.__full_version_str__
 
         return response
+
+
+class CompressionMiddleware(BaseCompressionMiddleware):
+    """
+    Compresses responses, except for files which support byte ranges, as the
+    ranges refer to the uncompressed file, and zip files, which are compressed
+    already
+    """
+
+    def process_response(self, request, response):
+        if (
+            response.has_header("Accept-Ranges")
+            or response.get("Content-Type") == "application/zip"
+        ):
+            return response
+        return super().process_response(request, response)
@@ -17,6 +17,7 @@ from celery.schedules import crontab
 from concurrent_log_handler.queue import setup_logging_queues
 from django.utils.translation import gettext_lazy as _
 from dotenv import load_dotenv
+from kombu import Queue
 
 # Tap paperless.conf if it's available
 configuration_path = os.getenv("PAPERLESS_CONFIGURATION_PATH")
@@ -213,6 +214,18 @@ def _parse_beat_schedule() -> dict:
                 * 60.0,
             },
         },
+        {
+            "name": "Remove expired bulk downloads",
+            "env_key": "PAPERLESS_BULK_DOWNLOAD_CLEANUP_TASK_CRON",
+            # Default hourly at 35 minutes past the hour
+            "env_default": "35 */1 * * *",
+            "task": "documents.tasks.remove_expired_bulk_downloads",
+            "options": {
+                # 1 minute before default schedule sends again
+                "expires": 59.0
+                * 60.0,
+            },
+        },
     ]
     for task in tasks:
         # Either get the environment setting or use the default
@@ -347,7 +360,7 @@ MIDDLEWARE = [
 
 # Optional to enable compression
 if __get_boolean("PAPERLESS_ENABLE_COMPRESSION", "yes"):  # pragma: no cover
-    MIDDLEWARE.insert(0, "compression_middleware.middleware.CompressionMiddleware")
+    MIDDLEWARE.insert(0, "paperless.middleware.CompressionMiddleware")
 
 ROOT_URLCONF = "paperless.urls"
 
@@ -781,7 +794,18 @@ CELERY_TIMEZONE = TIME_ZONE
 CELERY_WORKER_HIJACK_ROOT_LOGGER = False
 CELERY_WORKER_CONCURRENCY: Final[int] = __get_int("PAPERLESS_TASK_WORKERS", 1)
 TASK_WORKERS = CELERY_WORKER_CONCURRENCY
-CELERY_WORKER_MAX_TASKS_PER_CHILD = 1
+# Warm workers keep their process, with the heavy libraries and the classifier
+# loaded, for many tasks.  The process is replaced after a number of tasks or
+# once its resident memory grew beyond the limit
+WORKER_WARM: Final[bool] = __get_boolean("PAPERLESS_WORKER_WARM")
+if WORKER_WARM:
+    CELERY_WORKER_MAX_TASKS_PER_CHILD = __get_int("PAPERLESS_WORKER_MAX_TASKS", 100)
+    # Celery expects KiB
+    CELERY_WORKER_MAX_MEMORY_PER_CHILD = (
+        __get_int("PAPERLESS_WORKER_MAX_MEMORY", 1024) * 1024
+    )
+else:
+    CELERY_WORKER_MAX_TASKS_PER_CHILD = 1
 CELERY_WORKER_SEND_TASK_EVENTS = True
 CELERY_TASK_SEND_SENT_EVENT = True
 CELERY_SEND_TASK_SENT_EVENT = True
@@ -791,6 +815,27 @@ CELERY_BROKER_TRANSPORT_OPTIONS = {
     "global_keyprefix": os.getenv("PAPERLESS_REDIS_PREFIX", ""),
 }
 
+# https://docs.celeryq.dev/en/stable/userguide/routing.html
+CELERY_TASK_DEFAULT_QUEUE = "celery"
+CELERY_TASK_QUEUES = [
+    Queue(name)
+    for name in ("interactive", "consume", "mail", CELERY_TASK_DEFAULT_QUEUE, "bulk")
+]
+CELERY_TASK_ROUTES = ("documents.routing.route_task",)
+# Don't let a worker reserve tasks it can't start yet, so priorities hold
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# The maximum number of tasks running at the same time from a queue.  By default,
+# bulk edits leave one worker free for new documents
+TASK_QUEUE_CONCURRENCY: Final[dict[str, int]] = {
+    "bulk": max(1, CELERY_WORKER_CONCURRENCY - 1),
+    **json.loads(os.getenv("PAPERLESS_TASK_QUEUE_CONCURRENCY", "{}")),
+}
+
+# Number of documents updated by one task after a bulk edit, the chunks of a
+# bulk edit are updated in parallel
+BULK_UPDATE_CHUNK_SIZE: Final[int] = __get_int("PAPERLESS_BULK_UPDATE_CHUNK_SIZE", 500)
+
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT: Final[int] = __get_int("PAPERLESS_WORKER_TIMEOUT", 1800)
 
@@ -862,6 +907,13 @@ CONSUMER_DELETE_DUPLICATES = __get_boolean("PAPERLESS_CONSUMER_DELETE_DUPLICATES
 
 CONSUMER_RECURSIVE = __get_boolean("PAPERLESS_CONSUMER_RECURSIVE")
 
+CONSUMER_PARALLEL_STAGES: Final[bool] = __get_boolean(
+    "PAPERLESS_CONSUMER_PARALLEL_STAGES",
+    "true",
+)
+
+CONSUMER_BATCH_SIZE: Final[int] = __get_int("PAPERLESS_CONSUMER_BATCH_SIZE", 1)
+
 # Ignore glob patterns, relative to PAPERLESS_CONSUMPTION_DIR
 CONSUMER_IGNORE_PATTERNS = list(
     json.loads(
@@ -972,6 +1024,54 @@ OCR_COLOR_CONVERSION_STRATEGY = os.getenv(
 
 OCR_USER_ARGS = os.getenv("PAPERLESS_OCR_USER_ARGS")
 
+# PDFs with more pages are OCR'd in chunks, by multiple workers in parallel
+OCR_SPLIT_PAGE_THRESHOLD: Final[int] = __get_int(
+    "PAPERLESS_OCR_SPLIT_PAGE_THRESHOLD",
+    0,
+)
+
+OCR_SPLIT_CHUNK_PAGES: Final[int] = max(
+    1,
+    __get_int("PAPERLESS_OCR_SPLIT_CHUNK_PAGES", 50),
+)
+
+# Maximum size of the OCR result cache in MiB, 0 disables it
+OCR_CACHE_SIZE: Final[int] = __get_int("PAPERLESS_OCR_CACHE_SIZE", 0)
+
+OCR_CACHE_ARCHIVE: Final[bool] = __get_boolean("PAPERLESS_OCR_CACHE_ARCHIVE", "true")
+
+OCR_CACHE_DIR: Final[Path] = __get_path(
+    "PAPERLESS_OCR_CACHE_DIR",
+    DATA_DIR / "ocr-cache",
+)
+
+# Leave sending files to the front proxy, "x-accel-redirect" or "x-sendfile"
+SENDFILE_HEADER: Final[Optional[str]] = (
+    os.getenv("PAPERLESS_SENDFILE_HEADER", "").lower() or None
+)
+
+# The internal location of nginx serving the media directory
+SENDFILE_ACCEL_PREFIX: Final[str] = os.getenv(
+    "PAPERLESS_SENDFILE_ACCEL_PREFIX",
+    "/media-internal/",
+)
+
+# Maximum size of the cache of thumbnails in other sizes in MiB, 0 disables it
+THUMBNAIL_CACHE_SIZE: Final[int] = __get_int("PAPERLESS_THUMBNAIL_CACHE_SIZE", 256)
+
+THUMBNAIL_CACHE_DIR: Final[Path] = __get_path(
+    "PAPERLESS_THUMBNAIL_CACHE_DIR",
+    DATA_DIR / "thumbnail-cache",
+)
+
+# Number of hours a zip file of a bulk download is kept after it was last used
+BULK_DOWNLOAD_CACHE_TTL: Final[int] = __get_int("PAPERLESS_BULK_DOWNLOAD_CACHE_TTL", 24)
+
+BULK_DOWNLOAD_CACHE_DIR: Final[Path] = __get_path(
+    "PAPERLESS_BULK_DOWNLOAD_CACHE_DIR",
+    DATA_DIR / "bulk-downloads",
+)
+
 MAX_IMAGE_PIXELS: Final[Optional[int]] = __get_optional_int(
     "PAPERLESS_MAX_IMAGE_PIXELS",
 )
@@ -986,6 +1086,12 @@ CONVERT_MEMORY_LIMIT = os.getenv("PAPERLESS_CONVERT_MEMORY_LIMIT")
 
 GS_BINARY = os.getenv("PAPERLESS_GS_BINARY", "gs")
 
+# How the thumbnails of PDFs are rendered, "convert" or "ghostscript"
+THUMBNAIL_RENDERER: Final[str] = os.getenv(
+    "PAPERLESS_THUMBNAIL_RENDERER",
+    "convert",
+).lower()
+
 
 # Pre-2.x versions of Paperless stored your documents locally with GPG
 # encryption, but that is no longer the default.  This behaviour is still
@@ -1013,6 +1119,13 @@ FILENAME_DATE_ORDER = os.getenv("PAPERLESS_FILENAME_DATE_ORDER")
 # fewer dates shown.
 NUMBER_OF_SUGGESTED_DATES = __get_int("PAPERLESS_NUMBER_OF_SUGGESTED_DATES", 3)
 
+# Number of characters from the start of the content which are searched for
+# dates, 0 searches the whole content
+DATE_PARSER_SCAN_LIMIT: Final[int] = __get_int(
+    "PAPERLESS_DATE_PARSER_SCAN_LIMIT",
+    100_000,
+)
+
 # Transformations applied before filename parsing
 FILENAME_PARSE_TRANSFORMS = []
 for t in json.loads(os.getenv("PAPERLESS_FILENAME_PARSE_TRANSFORMS", "[]")):
@@ -1136,6 +1249,13 @@ NLTK_ENABLED: Final[bool] = __get_boolean("PAPERLESS_ENABLE_NLTK", "yes")
 
 NLTK_LANGUAGE: Optional[str] = _get_nltk_language_setting(OCR_LANGUAGE)
 
+# Number of characters of a document's content, around the first match, which
+# are used to build search result highlights.  0 or less uses the full content
+SEARCH_HIGHLIGHT_WINDOW: Final[int] = __get_int(
+    "PAPERLESS_SEARCH_HIGHLIGHT_WINDOW",
+    10000,
+)
+
 ###############################################################################
 # Email (SMTP) Backend                                                        #
 ###############################################################################
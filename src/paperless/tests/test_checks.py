@@ -212,6 +212,22 @@ class TestBarcodeSettingsChecks(DirectoriesMixin, TestCase):
         self.assertEqual(len(msgs), 0)
 
 
+class TestSendfileSettingsChecks(DirectoriesMixin, TestCase):
+    @override_settings(SENDFILE_HEADER="x-accel-redirekt")
+    def test_sendfile_header_invalid(self):
+        msgs = settings_values_check(None)
+        self.assertEqual(len(msgs), 1)
+
+        msg = msgs[0]
+
+        self.assertIn('Sendfile header "x-accel-redirekt" is not valid', msg.msg)
+
+    @override_settings(SENDFILE_HEADER="x-sendfile")
+    def test_sendfile_header_valid(self):
+        msgs = settings_values_check(None)
+        self.assertEqual(len(msgs), 0)
+
+
 class TestEmailCertSettingsChecks(DirectoriesMixin, FileSystemAssertsMixin, TestCase):
     @override_settings(EMAIL_CERTIFICATE_FILE=Path("/tmp/not_actually_here.pem"))
     def test_not_valid_file(self):
@@ -156,6 +156,7 @@ class TestCeleryScheduleParsing(TestCase):
     CLASSIFIER_EXPIRE_TIME = 59.0 * 60.0
     INDEX_EXPIRE_TIME = 23.0 * 60.0 * 60.0
     SANITY_EXPIRE_TIME = ((7.0 * 24.0) - 1.0) * 60.0 * 60.0
+    BULK_DOWNLOAD_EXPIRE_TIME = 59.0 * 60.0
 
     def test_schedule_configuration_default(self):
         """
@@ -190,6 +191,11 @@ class TestCeleryScheduleParsing(TestCase):
                     "schedule": crontab(minute=30, hour=0, day_of_week="sun"),
                     "options": {"expires": self.SANITY_EXPIRE_TIME},
                 },
+                "Remove expired bulk downloads": {
+                    "task": "documents.tasks.remove_expired_bulk_downloads",
+                    "schedule": crontab(minute="35", hour="*/1"),
+                    "options": {"expires": self.BULK_DOWNLOAD_EXPIRE_TIME},
+                },
             },
             schedule,
         )
@@ -232,6 +238,11 @@ class TestCeleryScheduleParsing(TestCase):
                     "schedule": crontab(minute=30, hour=0, day_of_week="sun"),
                     "options": {"expires": self.SANITY_EXPIRE_TIME},
                 },
+                "Remove expired bulk downloads": {
+                    "task": "documents.tasks.remove_expired_bulk_downloads",
+                    "schedule": crontab(minute="35", hour="*/1"),
+                    "options": {"expires": self.BULK_DOWNLOAD_EXPIRE_TIME},
+                },
             },
             schedule,
         )
@@ -266,6 +277,11 @@ class TestCeleryScheduleParsing(TestCase):
                     "schedule": crontab(minute=30, hour=0, day_of_week="sun"),
                     "options": {"expires": self.SANITY_EXPIRE_TIME},
                 },
+                "Remove expired bulk downloads": {
+                    "task": "documents.tasks.remove_expired_bulk_downloads",
+                    "schedule": crontab(minute="35", hour="*/1"),
+                    "options": {"expires": self.BULK_DOWNLOAD_EXPIRE_TIME},
+                },
             },
             schedule,
         )
@@ -286,6 +302,7 @@ class TestCeleryScheduleParsing(TestCase):
                 "PAPERLESS_TRAIN_TASK_CRON": "disable",
                 "PAPERLESS_SANITY_TASK_CRON": "disable",
                 "PAPERLESS_INDEX_TASK_CRON": "disable",
+                "PAPERLESS_BULK_DOWNLOAD_CLEANUP_TASK_CRON": "disable",
             },
         ):
             schedule = _parse_beat_schedule()
@@ -0,0 +1,184 @@
+"""
+OCR of large PDF documents in page ranges.
+
+The document is split into chunks in a working directory below the scratch
+directory.  Every chunk can be OCR'd by whoever claims it first: the worker
+consuming the document, or one of the ocr_chunk tasks it dispatched to other
+workers.  Claiming is done by exclusively creating a marker file, so a chunk
+is never processed twice and the consuming worker never waits for a task
+which no worker is free to run.
+"""
+
+import logging
+import os
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Callable
+from typing import Optional
+
+from documents.parsers import ParseError
+
+logger = logging.getLogger("paperless.parsing.tesseract")
+
+CLAIMED = "claimed"
+DONE = "done"
+ERROR = "error"
+
+
+def chunk_path(chunk_dir: Path, index: int, name: str) -> Path:
+    return Path(chunk_dir) / f"chunk-{index:04}.{name}"
+
+
+def count_splittable_pages(pdf_path: Path) -> int:
+    """
+    Returns the number of pages of the PDF, or 0 if splitting it would lose
+    something OCRmyPDF must know about, like its encryption or signatures
+    """
+    import pikepdf
+
+    with pikepdf.open(pdf_path) as pdf:
+        if pdf.is_encrypted:
+            return 0
+        acro_form = pdf.Root.get("/AcroForm")
+        if acro_form is not None and acro_form.get("/SigFlags", 0) != 0:
+            return 0
+        return len(pdf.pages)
+
+
+def split_pdf(pdf_path: Path, chunk_dir: Path, chunk_pages: int) -> int:
+    """
+    Splits the PDF into chunks of at most chunk_pages pages and returns the
+    number of chunks
+    """
+    import pikepdf
+
+    chunk_dir.mkdir(parents=True, exist_ok=True)
+    with pikepdf.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+        for index, start in enumerate(range(0, page_count, chunk_pages)):
+            with pikepdf.new() as chunk:
+                chunk.pages.extend(pdf.pages[start : start + chunk_pages])
+                chunk.save(chunk_path(chunk_dir, index, "pdf"))
+    return (page_count + chunk_pages - 1) // chunk_pages
+
+
+def claim_chunk(chunk_dir: Path, index: int) -> bool:
+    """
+    Returns True if the chunk was claimed by the caller, which must process it
+    """
+    try:
+        fd = os.open(
+            chunk_path(chunk_dir, index, CLAIMED),
+            os.O_CREAT | os.O_EXCL | os.O_WRONLY,
+        )
+    except (FileExistsError, FileNotFoundError):
+        # Claimed by someone else, or the document is already done
+        return False
+    os.close(fd)
+    return True
+
+
+def process_chunk(chunk_dir: Path, index: int, ocrmypdf_args: dict) -> bool:
+    """
+    OCRs the chunk with the given OCRmyPDF arguments, if it can be claimed.
+    Failures are recorded for the consuming worker instead of being raised.
+    Returns whether the chunk was processed
+    """
+    if not claim_chunk(chunk_dir, index):
+        return False
+
+    import ocrmypdf
+
+    # This forces tesseract to use one core per page.
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    try:
+        logger.debug(f"Calling OCRmyPDF for chunk {index} with args: {ocrmypdf_args}")
+        ocrmypdf.ocr(**ocrmypdf_args)
+    except Exception as e:
+        chunk_path(chunk_dir, index, ERROR).write_text(
+            f"{e.__class__.__name__}: {e!s}",
+        )
+    else:
+        chunk_path(chunk_dir, index, DONE).touch()
+    return True
+
+
+def count_finished_chunks(chunk_dir: Path, chunk_count: int) -> int:
+    """
+    Returns the number of chunks which are done.  Raises a ParseError if any
+    chunk failed
+    """
+    finished = 0
+    for index in range(chunk_count):
+        error = chunk_path(chunk_dir, index, ERROR)
+        if error.exists():
+            raise ParseError(f"OCR of chunk {index} failed: {error.read_text()}")
+        if chunk_path(chunk_dir, index, DONE).exists():
+            finished += 1
+    return finished
+
+
+def wait_for_chunks(
+    chunk_dir: Path,
+    chunk_count: int,
+    *,
+    timeout: float,
+    progress: Optional[Callable[[int, int], None]] = None,
+    poll_interval: float = 1.0,
+) -> None:
+    """
+    Waits until all chunks are done, reporting the number of finished chunks.
+    Raises a ParseError if a chunk failed or the timeout passed
+    """
+    deadline = time.monotonic() + timeout
+    reported = -1
+    while True:
+        finished = count_finished_chunks(chunk_dir, chunk_count)
+        if finished != reported and progress is not None:
+            progress(finished, chunk_count)
+        reported = finished
+
+        if finished == chunk_count:
+            return
+        if time.monotonic() > deadline:
+            raise ParseError(
+                f"Timed out waiting for {chunk_count - finished} chunk(s) to be OCR'd",
+            )
+        time.sleep(poll_interval)
+
+
+def merge_chunks(
+    chunk_dir: Path,
+    chunk_count: int,
+    archive_path: Path,
+    sidecar_path: Path,
+) -> None:
+    """
+    Reassembles the OCR'd chunks into one archive file and one sidecar file.
+    The document metadata and output intents are kept from the first chunk
+    """
+    import pikepdf
+
+    with ExitStack() as stack:
+        # Copied pages read their data from the chunks until the archive is saved
+        archive = stack.enter_context(
+            pikepdf.open(chunk_path(chunk_dir, 0, "archive.pdf")),
+        )
+        for index in range(1, chunk_count):
+            chunk = stack.enter_context(
+                pikepdf.open(chunk_path(chunk_dir, index, "archive.pdf")),
+            )
+            archive.pages.extend(chunk.pages)
+        archive.save(archive_path)
+
+    with open(sidecar_path, "w", encoding="utf-8") as sidecar:
+        for index in range(chunk_count):
+            chunk_sidecar = chunk_path(chunk_dir, index, "sidecar.txt")
+            if not chunk_sidecar.is_file():
+                continue
+            text = chunk_sidecar.read_text(encoding="utf-8", errors="replace")
+            # OCRmyPDF separates the pages of the sidecar with form feeds
+            if text and not text.endswith("\f"):
+                text += "\f"
+            sidecar.write(text)
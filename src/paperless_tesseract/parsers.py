@@ -9,6 +9,9 @@ from typing import Optional
 from django.conf import settings
 from PIL import Image
 
+from documents.ocr_cache import OcrCache
+from documents.ocr_cache import get_ocr_cache
+from documents.ocr_cache import get_ocr_cache_key
 from documents.parsers import DocumentParser
 from documents.parsers import ParseError
 from documents.parsers import make_thumbnail_from_pdf
@@ -17,6 +20,13 @@ from paperless.config import OcrConfig
 from paperless.models import ArchiveFileChoices
 from paperless.models import CleanChoices
 from paperless.models import ModeChoices
+from paperless_tesseract.chunks import chunk_path
+from paperless_tesseract.chunks import count_finished_chunks
+from paperless_tesseract.chunks import count_splittable_pages
+from paperless_tesseract.chunks import merge_chunks
+from paperless_tesseract.chunks import process_chunk
+from paperless_tesseract.chunks import split_pdf
+from paperless_tesseract.chunks import wait_for_chunks
 
 
 class NoTextFoundException(Exception):
@@ -80,13 +90,31 @@ class RasterisedDocumentParser(DocumentParser):
                     )
         return result
 
+    def thumbnail_depends_on_parse(self, mime_type) -> bool:
+        # The archive file only looks different from the original if OCRmyPDF
+        # changes the orientation or the appearance of the pages
+        return (
+            self.settings.rotate
+            or self.settings.deskew
+            or self.settings.clean == CleanChoices.FINAL
+        )
+
     def get_thumbnail(self, document_path, mime_type, file_name=None):
+        if self.archive_path and self.thumbnail_depends_on_parse(mime_type):
+            in_path = self.archive_path
+        else:
+            in_path = document_path
         return make_thumbnail_from_pdf(
-            self.archive_path or document_path,
+            in_path,
             self.tempdir,
             self.logging_group,
         )
 
+    def get_text_layer(self, document_path, mime_type) -> Optional[str]:
+        if mime_type != "application/pdf":
+            return None
+        return self.extract_text(None, Path(document_path))
+
     def is_image(self, mime_type) -> bool:
         return mime_type in [
             "image/png",
@@ -136,27 +164,37 @@ class RasterisedDocumentParser(DocumentParser):
             self.log.warning(f"Error while calculating DPI for image {image}: {e}")
             return None
 
-    def extract_text(
-        self,
-        sidecar_file: Optional[Path],
-        pdf_file: Path,
-    ) -> Optional[str]:
+    def read_complete_sidecar(self, sidecar_file: Optional[Path]) -> Optional[str]:
+        """
+        Returns the text of the sidecar file, unless it lacks the text of
+        some pages
+        """
         # When re-doing OCR, the sidecar contains ONLY the new text, not
         # the whole text, so do not utilize it in that case
         if (
-            sidecar_file is not None
-            and os.path.isfile(sidecar_file)
-            and self.settings.mode != "redo"
+            sidecar_file is None
+            or not os.path.isfile(sidecar_file)
+            or self.settings.mode == "redo"
         ):
-            text = self.read_file_handle_unicode_errors(sidecar_file)
+            return None
 
-            if "[OCR skipped on page" not in text:
-                # This happens when there's already text in the input file.
-                # The sidecar file will only contain text for OCR'ed pages.
-                self.log.debug("Using text from sidecar file")
-                return post_process_text(text)
-            else:
-                self.log.debug("Incomplete sidecar file: discarding.")
+        text = self.read_file_handle_unicode_errors(sidecar_file)
+        if "[OCR skipped on page" in text:
+            # This happens when there's already text in the input file.
+            # The sidecar file will only contain text for OCR'ed pages.
+            self.log.debug("Incomplete sidecar file: discarding.")
+            return None
+        return text
+
+    def extract_text(
+        self,
+        sidecar_file: Optional[Path],
+        pdf_file: Path,
+    ) -> Optional[str]:
+        text = self.read_complete_sidecar(sidecar_file)
+        if text is not None:
+            self.log.debug("Using text from sidecar file")
+            return post_process_text(text)
 
         # no success with the sidecar file, try PDF
 
@@ -313,6 +351,143 @@ class RasterisedDocumentParser(DocumentParser):
 
         return ocrmypdf_args
 
+    def should_ocr_in_chunks(self, document_path: Path, mime_type) -> bool:
+        """
+        Large PDFs are split into chunks of pages, which are OCR'd in parallel
+        """
+        if (
+            settings.OCR_SPLIT_PAGE_THRESHOLD <= 0
+            or mime_type != "application/pdf"
+            or (self.settings.pages is not None and self.settings.pages > 0)
+        ):
+            return False
+        try:
+            page_count = count_splittable_pages(document_path)
+        except Exception as e:
+            # Let OCRmyPDF deal with files pikepdf can't open
+            self.log.debug(f"Unable to count the pages of {document_path}: {e}")
+            return False
+        return page_count > settings.OCR_SPLIT_PAGE_THRESHOLD
+
+    def ocr_in_chunks(
+        self,
+        document_path: Path,
+        mime_type,
+        archive_path: Path,
+        sidecar_file: Path,
+    ):
+        """
+        Splits the document into page ranges, which are OCR'd by this worker and
+        by ocr_chunk tasks on other workers, and merges the results into the
+        archive file and the sidecar file
+        """
+        chunk_dir = Path(self.tempdir) / "chunks"
+        chunk_count = split_pdf(
+            document_path,
+            chunk_dir,
+            settings.OCR_SPLIT_CHUNK_PAGES,
+        )
+        self.log.info(
+            f"Splitting {document_path} into {chunk_count} chunks of at most "
+            f"{settings.OCR_SPLIT_CHUNK_PAGES} pages for OCR",
+        )
+
+        chunk_args = [
+            self.construct_ocrmypdf_parameters(
+                chunk_path(chunk_dir, index, "pdf"),
+                mime_type,
+                chunk_path(chunk_dir, index, "archive.pdf"),
+                chunk_path(chunk_dir, index, "sidecar.txt"),
+            )
+            for index in range(chunk_count)
+        ]
+
+        # This worker starts with the last chunk, so it rarely competes with
+        # the other workers, which start with the first
+        self.dispatch_chunks(chunk_dir, chunk_args[:-1])
+        for index in reversed(range(chunk_count)):
+            if process_chunk(chunk_dir, index, chunk_args[index]):
+                self.progress(
+                    count_finished_chunks(chunk_dir, chunk_count),
+                    chunk_count,
+                )
+
+        wait_for_chunks(
+            chunk_dir,
+            chunk_count,
+            timeout=settings.CELERY_TASK_TIME_LIMIT,
+            progress=self.progress,
+        )
+        merge_chunks(chunk_dir, chunk_count, archive_path, sidecar_file)
+
+    def dispatch_chunks(self, chunk_dir: Path, chunk_args: list[dict]):
+        """
+        Offers the chunks to other workers.  If that fails, this worker
+        processes all of them
+        """
+        from celery import group
+
+        from paperless_tesseract.tasks import ocr_chunk
+
+        try:
+            group(
+                ocr_chunk.s(str(chunk_dir), index, args)
+                for index, args in enumerate(chunk_args)
+            ).delay()
+        except Exception as e:
+            self.log.warning(
+                f"Unable to offer OCR chunks to other workers, processing them "
+                f"here: {e}",
+            )
+
+    def restore_cached_ocr(
+        self,
+        ocr_cache: OcrCache,
+        cache_key: str,
+        archive_path: Path,
+        sidecar_file: Path,
+    ) -> bool:
+        """
+        Restores the OCR result from the cache, if there is one which includes
+        the archive file when it is kept
+        """
+        try:
+            return ocr_cache.restore(
+                cache_key,
+                sidecar_file,
+                archive_path,
+                require_archive=(
+                    self.settings.skip_archive_file != ArchiveFileChoices.ALWAYS
+                ),
+            )
+        except Exception as e:
+            self.log.warning(f"Unable to read the OCR cache: {e}")
+            return False
+
+    def store_cached_ocr(
+        self,
+        ocr_cache: OcrCache,
+        cache_key: str,
+        archive_path: Path,
+        sidecar_file: Path,
+    ) -> None:
+        """
+        Stores the OCR result in the cache.  Without the archive file, it is
+        only stored if the sidecar file holds the complete text, so restoring
+        it when no archive file is kept never needs OCR
+        """
+        cached_archive_path = archive_path if settings.OCR_CACHE_ARCHIVE else None
+        try:
+            if (
+                cached_archive_path is None
+                and self.read_complete_sidecar(sidecar_file) is None
+            ):
+                self.log.debug("Not caching the OCR result without its complete text")
+                return
+            ocr_cache.store(cache_key, sidecar_file, cached_archive_path)
+        except Exception as e:
+            self.log.warning(f"Unable to store the OCR result in the cache: {e}")
+
     def parse(self, document_path: Path, mime_type, file_name=None):
         # This forces tesseract to use one core per page.
         os.environ["OMP_THREAD_LIMIT"] = "1"
@@ -361,9 +536,38 @@ class RasterisedDocumentParser(DocumentParser):
             sidecar_file,
         )
 
+        ocr_cache = get_ocr_cache()
+        cache_key = None
+        if ocr_cache is not None:
+            cache_key = get_ocr_cache_key(document_path, args, self.checksum)
+
         try:
-            self.log.debug(f"Calling OCRmyPDF with args: {args}")
-            ocrmypdf.ocr(**args)
+            if ocr_cache is not None and self.restore_cached_ocr(
+                ocr_cache,
+                cache_key,
+                archive_path,
+                sidecar_file,
+            ):
+                self.log.debug("Using the cached OCR result, skipping OCRmyPDF")
+            else:
+                if self.should_ocr_in_chunks(document_path, mime_type):
+                    self.ocr_in_chunks(
+                        document_path,
+                        mime_type,
+                        archive_path,
+                        sidecar_file,
+                    )
+                else:
+                    self.log.debug(f"Calling OCRmyPDF with args: {args}")
+                    ocrmypdf.ocr(**args)
+
+                if ocr_cache is not None:
+                    self.store_cached_ocr(
+                        ocr_cache,
+                        cache_key,
+                        archive_path,
+                        sidecar_file,
+                    )
 
             if self.settings.skip_archive_file != ArchiveFileChoices.ALWAYS:
                 self.archive_path = archive_path
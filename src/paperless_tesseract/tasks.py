@@ -0,0 +1,13 @@
+from pathlib import Path
+
+from celery import shared_task
+
+from paperless_tesseract.chunks import process_chunk
+
+
+@shared_task
+def ocr_chunk(chunk_dir: str, index: int, ocrmypdf_args: dict) -> bool:
+    """
+    OCRs one chunk of a large document, unless another worker already did
+    """
+    return process_chunk(Path(chunk_dir), index, ocrmypdf_args)
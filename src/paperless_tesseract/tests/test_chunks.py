@@ -0,0 +1,179 @@
+import shutil
+import uuid
+from pathlib import Path
+from unittest import mock
+
+import pikepdf
+from django.test import TestCase
+from django.test import override_settings
+
+from documents.parsers import ParseError
+from documents.tests.utils import DirectoriesMixin
+from documents.tests.utils import FileSystemAssertsMixin
+from paperless_tesseract.chunks import chunk_path
+from paperless_tesseract.chunks import claim_chunk
+from paperless_tesseract.chunks import count_splittable_pages
+from paperless_tesseract.chunks import merge_chunks
+from paperless_tesseract.chunks import process_chunk
+from paperless_tesseract.chunks import split_pdf
+from paperless_tesseract.chunks import wait_for_chunks
+from paperless_tesseract.parsers import RasterisedDocumentParser
+from paperless_tesseract.tasks import ocr_chunk
+
+
+def fake_ocr(input_file, output_file, sidecar=None, **kwargs):
+    """
+    Stands in for OCRmyPDF, copying the input and writing its name as text
+    """
+    shutil.copy(input_file, output_file)
+    if sidecar is not None:
+        Path(sidecar).write_text(f"Text of {Path(input_file).name}\f")
+
+
+class TestChunks(DirectoriesMixin, FileSystemAssertsMixin, TestCase):
+    SAMPLE_FILES = Path(__file__).resolve().parent / "samples"
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.chunk_dir = self.dirs.scratch_dir / "chunks"
+
+    def test_count_splittable_pages(self):
+        self.assertEqual(
+            count_splittable_pages(self.SAMPLE_FILES / "multi-page-digital.pdf"),
+            3,
+        )
+        self.assertEqual(count_splittable_pages(self.SAMPLE_FILES / "signed.pdf"), 0)
+
+    def test_split_and_merge(self):
+        """
+        GIVEN:
+            - A document with 3 pages
+        WHEN:
+            - The document is split into chunks of 2 pages, which are merged
+        THEN:
+            - There are 2 chunks
+            - The merged archive has all pages, the sidecar the text of all chunks
+        """
+        chunk_count = split_pdf(
+            self.SAMPLE_FILES / "multi-page-digital.pdf",
+            self.chunk_dir,
+            2,
+        )
+        self.assertEqual(chunk_count, 2)
+
+        for index in range(chunk_count):
+            fake_ocr(
+                chunk_path(self.chunk_dir, index, "pdf"),
+                chunk_path(self.chunk_dir, index, "archive.pdf"),
+                sidecar=chunk_path(self.chunk_dir, index, "sidecar.txt"),
+            )
+
+        archive = self.dirs.scratch_dir / "archive.pdf"
+        sidecar = self.dirs.scratch_dir / "sidecar.txt"
+        merge_chunks(self.chunk_dir, chunk_count, archive, sidecar)
+
+        with pikepdf.open(archive) as pdf:
+            self.assertEqual(len(pdf.pages), 3)
+        self.assertEqual(
+            sidecar.read_text(),
+            "Text of chunk-0000.pdf\fText of chunk-0001.pdf\f",
+        )
+
+    def test_claim_chunk_once(self):
+        self.chunk_dir.mkdir()
+
+        self.assertTrue(claim_chunk(self.chunk_dir, 0))
+        self.assertFalse(claim_chunk(self.chunk_dir, 0))
+        self.assertTrue(claim_chunk(self.chunk_dir, 1))
+
+    @mock.patch("ocrmypdf.ocr")
+    def test_process_chunk_failure(self, m):
+        """
+        GIVEN:
+            - OCRmyPDF fails for a chunk
+        WHEN:
+            - The chunk is processed and waited for
+        THEN:
+            - The error is raised by the waiting worker
+        """
+        m.side_effect = ValueError("Does not compute")
+        self.chunk_dir.mkdir()
+
+        self.assertTrue(process_chunk(self.chunk_dir, 0, {}))
+        self.assertFalse(process_chunk(self.chunk_dir, 0, {}))
+
+        with self.assertRaisesMessage(ParseError, "ValueError: Does not compute"):
+            wait_for_chunks(self.chunk_dir, 1, timeout=0)
+
+    def test_wait_for_chunks_timeout(self):
+        self.chunk_dir.mkdir()
+        chunk_path(self.chunk_dir, 0, "done").touch()
+        progress = mock.Mock()
+
+        with self.assertRaisesMessage(ParseError, "1 chunk(s)"):
+            wait_for_chunks(self.chunk_dir, 2, timeout=0, progress=progress)
+
+        progress.assert_called_once_with(1, 2)
+
+    def test_task_without_document(self):
+        """
+        GIVEN:
+            - The consuming worker already finished the document
+        WHEN:
+            - A chunk task runs
+        THEN:
+            - Nothing is processed
+        """
+        self.assertFalse(ocr_chunk(str(self.chunk_dir), 0, {}))
+
+    @override_settings(OCR_SPLIT_PAGE_THRESHOLD=2, OCR_SPLIT_CHUNK_PAGES=2)
+    @mock.patch.object(RasterisedDocumentParser, "dispatch_chunks")
+    @mock.patch("ocrmypdf.ocr")
+    def test_parse_in_chunks(self, m_ocr, m_dispatch):
+        """
+        GIVEN:
+            - A document with more pages than the split threshold
+        WHEN:
+            - The document is parsed
+        THEN:
+            - The chunks except the last are offered to other workers
+            - Every chunk is OCR'd once and progress is reported per chunk
+            - The archive and text are merged from all chunks
+        """
+        m_ocr.side_effect = fake_ocr
+        progress = mock.Mock()
+        parser = RasterisedDocumentParser(uuid.uuid4(), progress_callback=progress)
+
+        parser.parse(
+            self.SAMPLE_FILES / "multi-page-digital.pdf",
+            "application/pdf",
+        )
+
+        self.assertEqual(m_ocr.call_count, 2)
+        chunk_dir, offered = m_dispatch.call_args.args
+        self.assertEqual(len(offered), 1)
+        self.assertEqual(offered[0]["input_file"], chunk_path(chunk_dir, 0, "pdf"))
+        progress.assert_any_call(1, 2)
+        progress.assert_called_with(2, 2)
+
+        self.assertIsFile(parser.archive_path)
+        with pikepdf.open(parser.archive_path) as pdf:
+            self.assertEqual(len(pdf.pages), 3)
+        self.assertEqual(
+            parser.get_text(),
+            "Text of chunk-0000.pdf Text of chunk-0001.pdf",
+        )
+
+    @override_settings(OCR_SPLIT_PAGE_THRESHOLD=5)
+    @mock.patch("ocrmypdf.ocr")
+    def test_parse_below_threshold(self, m_ocr):
+        m_ocr.side_effect = fake_ocr
+        parser = RasterisedDocumentParser(uuid.uuid4())
+
+        parser.parse(
+            self.SAMPLE_FILES / "multi-page-digital.pdf",
+            "application/pdf",
+        )
+
+        m_ocr.assert_called_once()
+        self.assertEqual(parser.get_text(), "Text of multi-page-digital.pdf")
@@ -15,6 +15,7 @@ from documents.tests.utils import DirectoriesMixin
 from documents.tests.utils import FileSystemAssertsMixin
 from paperless_tesseract.parsers import RasterisedDocumentParser
 from paperless_tesseract.parsers import post_process_text
+from paperless_tesseract.tests.test_chunks import fake_ocr
 
 
 class TestParser(DirectoriesMixin, FileSystemAssertsMixin, TestCase):
@@ -65,6 +66,65 @@ class TestParser(DirectoriesMixin, FileSystemAssertsMixin, TestCase):
         )
         self.assertIsFile(thumb)
 
+    @override_settings(OCR_ROTATE_PAGES=False, OCR_DESKEW=False, OCR_CLEAN="clean")
+    @mock.patch("paperless_tesseract.parsers.make_thumbnail_from_pdf")
+    def test_thumbnail_independent_of_parse(self, m):
+        """
+        GIVEN:
+            - OCRmyPDF does not change the appearance of the pages
+        WHEN:
+            - The thumbnail is generated after parsing
+        THEN:
+            - The thumbnail is generated from the original file
+        """
+        parser = RasterisedDocumentParser(uuid.uuid4())
+        parser.archive_path = "does-not-exist.pdf"
+
+        self.assertFalse(parser.thumbnail_depends_on_parse("application/pdf"))
+        parser.get_thumbnail(
+            self.SAMPLE_FILES / "simple-digital.pdf",
+            "application/pdf",
+        )
+        self.assertEqual(m.call_args.args[0], self.SAMPLE_FILES / "simple-digital.pdf")
+
+    def test_thumbnail_depends_on_parse(self):
+        """
+        GIVEN:
+            - OCRmyPDF rotates, deskews or cleans the pages
+        WHEN:
+            - Checking whether the thumbnail depends on the parsed result
+        THEN:
+            - It does
+        """
+        for overrides in [
+            {"OCR_ROTATE_PAGES": True},
+            {"OCR_DESKEW": True},
+            {"OCR_CLEAN": "clean-final"},
+        ]:
+            settings = {
+                "OCR_ROTATE_PAGES": False,
+                "OCR_DESKEW": False,
+                "OCR_CLEAN": "clean",
+                **overrides,
+            }
+            with override_settings(**settings):
+                parser = RasterisedDocumentParser(uuid.uuid4())
+                self.assertTrue(parser.thumbnail_depends_on_parse("image/png"))
+
+    def test_get_text_layer(self):
+        parser = RasterisedDocumentParser(uuid.uuid4())
+
+        self.assertContainsStrings(
+            parser.get_text_layer(
+                self.SAMPLE_FILES / "simple-digital.pdf",
+                "application/pdf",
+            ),
+            ["This is a test document."],
+        )
+        self.assertIsNone(
+            parser.get_text_layer(self.SAMPLE_FILES / "simple.png", "image/png"),
+        )
+
     @mock.patch("documents.parsers.run_convert")
     def test_thumbnail_fallback(self, m):
         def call_convert(input_file, output_file, **kwargs):
@@ -822,6 +882,84 @@ class TestParser(DirectoriesMixin, FileSystemAssertsMixin, TestCase):
             "application/pdf",
         )
 
+    @mock.patch("ocrmypdf.ocr")
+    def test_ocr_cache(self, m_ocr):
+        """
+        GIVEN:
+            - The OCR cache is enabled
+        WHEN:
+            - The same document is parsed twice with the same settings
+            - The document is parsed with different settings
+        THEN:
+            - OCRmyPDF runs once for the same settings
+            - The second parse restores the text and the archive file
+            - OCRmyPDF runs again for the different settings
+        """
+        m_ocr.side_effect = fake_ocr
+        cache_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, cache_dir)
+        document = self.SAMPLE_FILES / "multi-page-digital.pdf"
+
+        with override_settings(OCR_CACHE_SIZE=10, OCR_CACHE_DIR=cache_dir):
+            parser = RasterisedDocumentParser(None)
+            parser.parse(document, "application/pdf")
+            cached_parser = RasterisedDocumentParser(None)
+            cached_parser.parse(document, "application/pdf")
+
+            m_ocr.assert_called_once()
+            self.assertEqual(cached_parser.get_text(), parser.get_text())
+            self.assertIsFile(cached_parser.get_archive_path())
+
+            with override_settings(OCR_LANGUAGE="deu"):
+                RasterisedDocumentParser(None).parse(document, "application/pdf")
+
+            self.assertEqual(m_ocr.call_count, 2)
+
+    @mock.patch("documents.ocr_cache.compute_checksum")
+    @mock.patch("ocrmypdf.ocr")
+    def test_ocr_cache_without_archive(self, m_ocr, m_compute_checksum):
+        """
+        GIVEN:
+            - The OCR cache is enabled without archive files
+            - No archive files are kept
+        WHEN:
+            - The same document with a known checksum is parsed twice
+            - The same is done re-doing OCR, so the sidecar text is incomplete
+        THEN:
+            - The second parse restores the text without OCRmyPDF
+            - The known checksum is used for the cache key
+            - Incomplete sidecar text is not cached
+        """
+        m_ocr.side_effect = fake_ocr
+        cache_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, cache_dir)
+        document = self.SAMPLE_FILES / "simple.png"
+
+        def parse() -> RasterisedDocumentParser:
+            parser = RasterisedDocumentParser(None)
+            parser.checksum = "abcd"
+            parser.parse(document, "image/png")
+            return parser
+
+        with override_settings(
+            OCR_CACHE_SIZE=10,
+            OCR_CACHE_DIR=cache_dir,
+            OCR_CACHE_ARCHIVE=False,
+            OCR_SKIP_ARCHIVE_FILE="always",
+        ):
+            parser = parse()
+            cached_parser = parse()
+
+            m_ocr.assert_called_once()
+            m_compute_checksum.assert_not_called()
+            self.assertEqual(cached_parser.get_text(), parser.get_text())
+            self.assertIsNone(cached_parser.get_archive_path())
+
+            with override_settings(OCR_MODE="redo"):
+                parse()
+
+            self.assertEqual(len(list(cache_dir.glob("*/*"))), 1)
+
 
 class TestParserFileTypes(DirectoriesMixin, FileSystemAssertsMixin, TestCase):
     SAMPLE_FILES = os.path.join(os.path.dirname(__file__), "samples")
@@ -15,6 +15,9 @@ class TextDocumentParser(DocumentParser):
 
     logging_name = "paperless.parsing.text"
 
+    def thumbnail_depends_on_parse(self, mime_type) -> bool:
+        return False
+
     def get_thumbnail(self, document_path, mime_type, file_name=None):
         text = self.read_file_handle_unicode_errors(document_path)
 